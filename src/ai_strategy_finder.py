@@ -5,6 +5,12 @@ from typing import List, Tuple, Dict, Optional
 from datetime import datetime, timezone
 import httpx
 
+from gt_history import fetch_ohlcv_range, GT_LIMITER
+from signal_plan import FetchPlan
+import profiling
+import cache_manager
+from singleflight import HTTP, freeze
+
 # -------- Config (reads TB_* envs) --------
 SLIP = float(os.getenv("TB_SLIP", "0.0"))
 SLIP_MODE = os.getenv("TB_SLIP_MODE", "amount")      # "price" | "amount"
@@ -19,9 +25,15 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 
 # -------- HTTP / data fetch --------
 def http_get(url, params=None):
-    r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    def fetch():
+        GT_LIMITER.wait()   # only requests that really go out take a rate-limit slot
+        profiling.count("http_requests")
+        with profiling.span("http_get"):
+            r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
+        r.raise_for_status()
+        return r.json()
+    # identical concurrent page requests share one call (see singleflight)
+    return HTTP.do(("GET", url, freeze(params)), fetch)
 
 def detect_network_and_pool(mint: str) -> Tuple[str,str]:
     for net in NETWORKS:
@@ -36,41 +48,62 @@ def detect_network_and_pool(mint: str) -> Tuple[str,str]:
                 return net, addr
     raise RuntimeError(f"No pools found for {mint} across {NETWORKS}")
 
-def fetch_ohlcv_1m_last_7d(network: str, pool: str):
-    cache_path = os.path.join(CACHE_DIR, f"{network}_{pool}.json")
-    now = int(time.time())
+def _fetch_ohlcv_1m_lookback(network: str, pool: str, hours: int, cache_suffix: str = ""):
+    import candle_archive
+    cache_path = os.path.join(CACHE_DIR, f"{network}_{pool}{cache_suffix}{candle_archive.EXT}")
+    legacy_path = os.path.join(CACHE_DIR, f"{network}_{pool}{cache_suffix}.json")
+    now = int(time.time()) // 60 * 60   # minute-aligned, so page requests made within a minute coalesce
     if os.path.isfile(cache_path):
         try:
-            js = json.load(open(cache_path, "r", encoding="utf-8"))
+            # freshness comes from the archive index; blocks are only decoded on a hit
+            span = candle_archive.span(cache_path)
+            if span and (now - span[1]) < 600:
+                profiling.count("ohlcv_cache_hit")
+                cache_manager.touch(cache_path)
+                with profiling.span("ohlcv_cache_read"):
+                    return candle_archive.read_rows(cache_path)
+        except Exception:
+            pass
+    elif os.path.isfile(legacy_path):
+        try:
+            js = json.load(open(legacy_path, "r", encoding="utf-8"))
             if js and isinstance(js, list):
                 if js and (now - int(js[-1][0])) < 600:
+                    profiling.count("ohlcv_cache_hit")
+                    cache_manager.touch(legacy_path)
                     return js
         except Exception:
             pass
 
     url = f"{API_ROOT}/networks/{network}/pools/{pool}/ohlcv/minute"
-    out = []
-    cutoff = now - 48*60*60
-    before = now + 60
-    for _ in range(6):
-        resp = http_get(url, {"aggregate":1, "limit":500, "before_timestamp": before})
+    cutoff = now - hours*60*60
+
+    def get_page(before, limit):
+        resp = http_get(url, {"aggregate":1, "limit":limit, "before_timestamp": before})
         attrs = (resp.get("data") or {}).get("attributes", {})
-        lst = attrs.get("ohlcv_list") or []
-        if not lst: break
-        out.extend(lst)
-        oldest = int(lst[0][0])
-        before = oldest
-        if oldest <= cutoff: break
-        time.sleep(0.15)
-    out.sort(key=lambda r: int(r[0]))
-    out = [r for r in out if int(r[0]) >= cutoff]
+        return attrs.get("ohlcv_list") or []
+
+    # fixed windows fetched concurrently under the shared GT rate limiter, then stitched
+    profiling.count("ohlcv_cache_miss")
+    cache_manager.miss("ohlcv")
+    with profiling.span("ohlcv_fetch"):
+        out = fetch_ohlcv_range(get_page, cutoff, now)
 
     try:
-        json.dump(out, open(cache_path, "w", encoding="utf-8"))
+        if out:
+            # merged under the file lock: parallel finders fetching this pool extend one file
+            candle_archive.merge_archive(cache_path, out, keep_from=cutoff)
+            cache_manager.touch(cache_path, hit=False)
     except Exception:
         pass
     return out
 
+def fetch_ohlcv_1m_last_48h(network: str, pool: str):
+    return _fetch_ohlcv_1m_lookback(network, pool, 48)
+
+def fetch_ohlcv_1m_last_7d(network: str, pool: str):
+    return _fetch_ohlcv_1m_lookback(network, pool, 7*24, cache_suffix="_7d")
+
 # -------- Helpers --------
 def find_entry_minute(candles, hh: int, mm: int):
     """
@@ -145,6 +178,7 @@ class Strategy:
     mode: str = "realistic"
 
 def simulate_line(candles, hhmm: str, invest: float, mode: str, strat: Strategy):
+    """(pnl_usd, hold_min, ath_mult) of one line under one strategy, or None without an entry candle"""
     hh, mm = [int(x) for x in hhmm.split(":")]
     entry_ts = find_entry_minute(candles, hh, mm)
     if not entry_ts:
@@ -234,6 +268,7 @@ def clean_parts(line: str):
     return parts
 
 def run():
+    profiling.start_from_argv()
     batch_file = os.path.join("src","batch_lines.txt")
     try:
         raw = open(batch_file, "r", encoding="utf-8").read().splitlines()
@@ -243,7 +278,8 @@ def run():
     jobs = [p for p in jobs if p]
     if not jobs:
         print("no jobs in batch_lines.txt"); sys.exit(3)
-    lines, matched, total_jobs = build_lines_strict(jobs)
+    with profiling.span("build_lines"):
+        lines, matched, total_jobs = build_lines_strict(jobs)
     print(f"Matched {matched} of {total_jobs} lines (±1 min tolerance). Skipped {total_jobs - matched}.")
     if not lines:
         print("no valid lines to simulate"); sys.exit(3)
@@ -276,7 +312,8 @@ def run():
 
     for (mint, hhmm, invest, mode, candles) in lines:
         for s in strategies:
-            res = simulate_line(candles, hhmm, invest, mode, s)
+            with profiling.span("simulate"):
+                res = simulate_line(candles, hhmm, invest, mode, s)
             if res is None:
                 continue
             pnl_usd, hold_min, _ath = res
@@ -293,472 +330,16 @@ def run():
         avg_hold = (sum(holds[s])/len(holds[s])) if holds[s] else 0
         print(f"{i}. {kind}  TP[{tp_str}] sz[{sz_str}] stop={int(s.stop*100)}%  --> total ${total:,.2f} | avg_hold {avg_hold:.0f}m")
 
-    def extract_ts(c):
-        try:
-            if isinstance(c, dict):
-                for k in ("ts","timestamp","time","t","open_time","openTime"):
-                    if k in c:
-                        v = int(c[k])
-                        return v//1000 if v > 10_000_000_000 else v
-            if isinstance(c, (list, tuple)) and c:
-                for idx in range(min(4, len(c))):
-                    v = c[idx]
-                    if isinstance(v, (int, float)):
-                        iv = int(v)
-                        if iv > 10_000_000_000:
-                            return iv//1000
-                        if 1_000_000_000 <= iv <= 20_000_000_000:
-                            return iv
-        except Exception:
-            pass
-        return None
-
-    def to_utc_dt(ts):
-        return datetime.fromtimestamp(int(ts), timezone.utc)
-
-    def minute_map(candles):
-        m = {}
-        for c in candles:
-            ts = extract_ts(c)
-            if ts is None:
-                continue
-            dt = to_utc_dt(ts)
-            key = (dt.hour, dt.minute)
-            if key not in m:  # keep first seen (open) for that minute
-                m[key] = ts
-        return m
-
-    lines = []
-    matched = 0
-    total_jobs = len(jobs)
-
-    strict = _os.environ.get("TB_STRICT_EXACT", "0") == "1"
-    input_tz = _os.environ.get("TB_INPUT_TZ", "UTC").upper()
-
-    for parts in jobs:
-        if len(parts) == 9:
-            mint, hhmm, invest, *_ = parts
-        elif len(parts) >= 10:
-            mint, hhmm, mc, invest, *_ = parts
-        else:
-            continue
-
-        try:
-            net, pool = detect_network_and_pool(mint)
-            # you already swapped this to 7d in your file; keep it here too:
-            candles = fetch_ohlcv_1m_last_7d(net, pool)
-            if not candles:
-                continue
-
-            mm_map = minute_map(candles)
-
-            try:
-                hh, mmn = [int(x) for x in hhmm.split(":")]
-            except Exception:
-                continue
-
-            # configure input timezone → UTC hour
-            hh_input_utc = (hh - 5) % 24 if input_tz == "KHI" else hh
-
-            # try_match uses TB_STRICT_EXACT internally (0 => ±5, 1 => exact only)
-            found = try_match(mm_map, hh_input_utc, mmn)
-
-            # nearest-hour fallback only when NOT strict
-            if (not strict) and (found is None):
-                hours_present = sorted({h for (h, _m) in mm_map.keys()})
-                if hours_present:
-                    def hour_dist(a,b):
-                        d = abs(a-b) % 24
-                        return min(d, 24-d)
-                    best_hour = min(hours_present, key=lambda H: hour_dist(H, hh_input_utc))
-                    # try same minute at nearest hour (±5)
-                    found = try_match(mm_map, best_hour, mmn)
-                    if found is None:
-                        mins_at_hour = sorted({m for (H, m) in mm_map.keys() if H == best_hour})
-                        if mins_at_hour:
-                            fallback_min = mins_at_hour[0]
-                            found = mm_map.get((best_hour, fallback_min))
-                            print(f"[strict-match fallback] using {best_hour:02d}:{fallback_min:02d} UTC (nearest hour to {hh_input_utc:02d}:{mmn:02d})")
-
-            if found is None:
-                continue
-
-            dt_found = datetime.fromtimestamp(int(found), timezone.utc)
-            hhmm_use = f"{dt_found.hour:02d}:{dt_found.minute:02d}"
-            lines.append((mint, hhmm_use, float(invest), "realistic", candles))
-            matched += 1
-
-        except Exception:
-            continue
-
-    return lines, matched, total_jobs
-
-
-    def extract_ts(c):
-        try:
-            if isinstance(c, dict):
-                for k in ("ts","timestamp","time","t","open_time","openTime"):
-                    if k in c:
-                        v = int(c[k])
-                        return v//1000 if v > 10_000_000_000 else v
-            if isinstance(c, (list, tuple)) and c:
-                for idx in range(min(4, len(c))):
-                    v = c[idx]
-                    if isinstance(v, (int, float)):
-                        iv = int(v)
-                        if iv > 10_000_000_000:
-                            return iv//1000
-                        if 1_000_000_000 <= iv <= 20_000_000_000:
-                            return iv
-        except Exception:
-            pass
-        return None
-
-    def to_utc_dt(ts):
-        return datetime.fromtimestamp(int(ts), timezone.utc)
-
-    def minute_map(candles):
-        m = {}
-        for c in candles:
-            ts = extract_ts(c)
-            if ts is None:
-                continue
-            dt = to_utc_dt(ts)
-            key = (dt.hour, dt.minute)
-            if key not in m:
-                m[key] = ts
-        return m
-
-def hour_dist(a,b):
-        d = abs(a-b) % 24
-        return min(d, 24-d)
-
-    lines = []
-    matched = 0
-    total_jobs = len(jobs)
-
-    for parts in jobs:
-        if len(parts) == 9:
-            mint, hhmm, invest, *_ = parts
-        elif len(parts) >= 10:
-            mint, hhmm, mc, invest, *_ = parts
-        else:
-            continue
-
-        try:
-            net, pool = detect_network_and_pool(mint)
-            candles = fetch_ohlcv_1m_last_7d(net, pool)
-            if not candles:
-                continue
-
-            mm_map = minute_map(candles)
-
-            # one-time debug
-            try:
-                if '___mm_debug_printed' not in globals():
-                    globals()['___mm_debug_printed'] = True
-                    uniq_hours = sorted({h for (h, m) in mm_map.keys()})
-                    sample_minutes = {h: sorted({m for (hh, m) in mm_map.keys() if hh == h})[:10] for h in uniq_hours[:5]}
-                    print(f"[candles debug] candles_len={len(candles)} minute_map_size={len(mm_map)} hours_present={uniq_hours[:24]}")
-                    print(f"[candles debug] sample minutes per first hours: {sample_minutes}")
-                    raw_ts = []
-                    for c in candles[:3]:
-                        v = None
-                        if isinstance(c, dict):
-                            for k in ('ts','timestamp','time','t','open_time','openTime'):
-                                if k in c:
-                                    v = c[k]; break
-                        elif isinstance(c, (list, tuple)) and len(c) > 0:
-                            v = c[0]
-                        raw_ts.append(v)
-                    print(f"[candles debug] first3_raw_ts_fields={raw_ts}")
-            except Exception:
-                pass
-
-            try:
-                hh, mmn = [int(x) for x in hhmm.split(":")]
-            except Exception:
-                continue
-
-            # 1) Determine input timezone
-            import os as _os
-            _tz = _os.environ.get("TB_INPUT_TZ", "UTC").upper()
-            if _tz == "KHI":
-                # Karachi HH:MM -> convert to UTC
-                hh_input_utc = (hh - 5) % 24
-            else:
-                hh_input_utc = hh
-
-            # 2) Try to match using configured input timezone
-            found = try_match(mm_map, hh_input_utc, mmn)
-
-            # 3) Nearest-hour fallback (only if NOT strict)
-            _strict = _os.environ.get("TB_STRICT_EXACT", "0") == "1"
-            if (not _strict) and (found is None):
-                hours_present = sorted({h for (h, _m) in mm_map.keys()})
-                if hours_present:
-                    candidates = [hh_input_utc]
-                    def hour_dist(a,b):
-                        d = abs(a-b) % 24
-                        return min(d, 24-d)
-                    best_hour = min(hours_present, key=lambda H: min(hour_dist(H, c) for c in candidates))
-                    found = try_match(mm_map, best_hour, mmn)
-                    if found is None:
-                        mins_at_hour = sorted({m for (H, m) in mm_map.keys() if H == best_hour})
-                        if mins_at_hour:
-                            fallback_min = mins_at_hour[0]
-                            found = mm_map.get((best_hour, fallback_min))
-                            print(f"[strict-match fallback] using {best_hour:02d}:{fallback_min:02d} UTC (nearest hour to {hh_input_utc:02d}:{mmn:02d})")
-
-            if found is None:
-                hours_present = sorted({h for (h, _m) in mm_map.keys()})
-                if hours_present:
-                    candidates = [hh, (hh - 5) % 24]
-                    best_hour = min(
-                        hours_present,
-                        key=lambda H: min(hour_dist(H, candidates[0]), hour_dist(H, candidates[1]))
-                    )
-                    found = try_match(mm_map, best_hour, mmn)
-                    if found is None:
-                        mins_at_hour = sorted({m for (H, m) in mm_map.keys() if H == best_hour})
-                        if mins_at_hour:
-                            fallback_min = mins_at_hour[0]
-                            found = mm_map.get((best_hour, fallback_min))
-                            print(f"[strict-match fallback] using {best_hour:02d}:{fallback_min:02d} UTC (nearest hour to {hh:02d}:{mmn:02d})")
-
-            if found is None:
-                continue
-
-            dt_found = datetime.fromtimestamp(int(found), timezone.utc)
-            hhmm_use = f"{dt_found.hour:02d}:{dt_found.minute:02d}"
-            lines.append((mint, hhmm_use, float(invest), "realistic", candles))
-            matched += 1
-
-        except Exception:
-            continue
-
-    return lines, matched, total_jobs
-
-
-    def extract_ts(c):
-        # Return epoch seconds (int) or None
-        try:
-            # dict-like
-            if isinstance(c, dict):
-                for k in ("ts","timestamp","time","t","open_time","openTime"):
-                    if k in c:
-                        v = int(c[k])
-                        if v > 10_000_000_000:  # ms
-                            return v // 1000
-                        return v
-            # list/tuple-like
-            if isinstance(c, (list, tuple)):
-                # try first few fields to find a plausible epoch
-                for idx in range(min(4, len(c))):
-                    v = c[idx]
-                    if isinstance(v, (int, float)):
-                        iv = int(v)
-                        # seconds ~ 1.6e9, ms ~ 1.6e12 (2025)
-                        if iv > 10_000_000_000:       # looks like ms
-                            return iv // 1000
-                        if 1_000_000_000 <= iv <= 20_000_000_000:  # looks like seconds
-                            return iv
-        except Exception:
-            pass
-        return None
-
-    def to_utc_dt(ts):
-        # ts is epoch seconds
-        return datetime.fromtimestamp(int(ts), timezone.utc)
-
-    def minute_map(candles):
-        m = {}
-        for c in candles:
-            ts = extract_ts(c)
-            if ts is None: 
-                continue
-            dt = to_utc_dt(ts)
-            key = (dt.hour, dt.minute)
-            if key not in m:
-                m[key] = ts
-        return m
-
-
-    def to_utc_dt(ts):
-        # ts may be in seconds or milliseconds
-        if ts > 10_000_000_000:  # ms heuristic
-            ts = ts // 1000
-        # use timezone-aware UTC (avoid deprecation)
-        return datetime.fromtimestamp(int(ts), timezone.utc)
-
-    lines = []
-    matched = 0
-    total_jobs = len(jobs)
-
-    for parts in jobs:
-        if len(parts) == 9:
-            mint, hhmm, invest, *_ = parts
-        elif len(parts) >= 10:
-            mint, hhmm, mc, invest, *_ = parts
-        else:
-            continue
-
-        try:
-            net, pool = detect_network_and_pool(mint)
-            candles = fetch_ohlcv_1m_last_7d(net, pool)
-            if not candles:
-                continue
-
-            # Build a map of (HH,MM)->ts by scanning ALL candles (not just a small sample)
-            minute_to_ts = {}
-            for c in candles:
-                try:
-                    ts = c[0]
-                    dt = to_utc_dt(ts)
-                    key = (dt.hour, dt.minute)
-                    # keep the earliest ts we see for that minute (open time)
-                    if key not in minute_to_ts:
-                        minute_to_ts[key] = ts
-                except Exception:
-                    continue
-
-            try:
-                hh, mm = [int(x) for x in hhmm.split(":")]
-            except Exception:
-                # if bad hh:mm, skip
-                continue
-
-            # search exact + ±1..±5 min tolerance with hour wrap
-            found_ts = None
-            for delta in (0,1,2,3,4,5,-1,-2,-3,-4,-5):
-                hh2, mm2 = hh, mm + delta
-                # normalize minutes with hour wrap
-                while mm2 >= 60:
-                    mm2 -= 60
-                    hh2 = (hh2 + 1) % 24
-                while mm2 < 0:
-                    mm2 += 60
-                    hh2 = (hh2 - 1) % 24
-                if (hh2 % 24, mm2) in minute_to_ts:
-                    found_ts = minute_to_ts[(hh2 % 24, mm2)]
-                    break
-
-            if found_ts is None:
-                # richer debug: show a few minutes that exist at the target hour
-                try:
-                    avail = sorted({ m for (h, m) in minute_to_ts.keys() if h == hh })[:15]
-                    print(f"[strict-match debug] no HH:MM for {hh:02d}:{mm:02d} UTC; available minutes at hour {hh:02d}: {avail}")
-                except Exception:
-                    pass
-                continue
-
-            lines.append((mint, hhmm, float(invest), "realistic", candles))
-            matched += 1
-
-        except Exception:
-            continue
-
-    return lines, matched, total_jobs
-
-    def _extract_ts(c):
-        try:
-            if isinstance(c, dict):
-                for k in ("ts","timestamp","time","t","open_time","openTime"):
-                    if k in c:
-                        v = int(c[k])
-                        return v//1000 if v > 10_000_000_000 else v
-            if isinstance(c, (list, tuple)) and c:
-                for idx in range(min(4, len(c))):
-                    v = c[idx]
-                    if isinstance(v, (int, float)):
-                        iv = int(v)
-                        if iv > 10_000_000_000:
-                            return iv//1000
-                        if 1_000_000_000 <= iv <= 20_000_000_000:
-                            return iv
-        except Exception:
-            pass
-        return None
-
-    def _minute_map(candles):
-        m = {}
-        for c in candles:
-            ts = _extract_ts(c)
-            if ts is None:
-                continue
-            # store earliest ts for that minute (open)
-            dt = datetime.fromtimestamp(int(ts), timezone.utc)
-            key = (dt.hour, dt.minute)
-            if key not in m:
-                m[key] = ts
-        return m
-
-    lines = []
-    matched = 0
-    total_jobs = len(jobs)
-
-    input_tz = (_os.environ.get("TB_INPUT_TZ", "UTC") or "UTC").upper()
-    lookback = (_os.environ.get("TB_LOOKBACK", "48h") or "48h").lower()
-    use_7d = (lookback == "7d")
-
-    for parts in jobs:
-        if len(parts) == 9:
-            mint, hhmm, invest, *_ = parts
-        elif len(parts) >= 10:
-            mint, hhmm, mc, invest, *_ = parts
-        else:
-            continue
-
-        try:
-            net, pool = detect_network_and_pool(mint)
-            candles = fetch_ohlcv_1m_last_7d(net, pool) if use_7d else fetch_ohlcv_1m_last_48h(net, pool)
-            if not candles:
-                continue
-
-            mm_map = _minute_map(candles)
-
-            # parse HH:MM
-            try:
-                hh, mm = [int(x) for x in hhmm.split(":")]
-            except Exception:
-                continue
-
-            # convert to UTC hour if input is Karachi
-            hh_utc = (hh - 5) % 24 if input_tz == "KHI" else hh
-
-            found = try_match(mm_map, hh_utc, mm)
-            if found is None:
-                # strict mode: if exact minute not present, skip
-                # (we do NOT do any ±tolerance or nearest-hour fallback)
-                # Optional: print a once-per-run hint for visibility
-                if "_STRICT_MISS_SHOWN" not in globals():
-                    globals()["_STRICT_MISS_SHOWN"] = True
-                    avail_hours = sorted({h for (h, _m) in mm_map.keys()})
-                    print(f"[strict] exact minute not found; available UTC hours in lookback: {avail_hours}")
-                continue
-
-            # pass the exact matched minute downstream (UTC hh:mm)
-            from datetime import timezone
-            dt_found = datetime.fromtimestamp(int(found), timezone.utc)
-            hhmm_use = f"{dt_found.hour:02d}:{dt_found.minute:02d}"
-            lines.append((mint, hhmm_use, float(invest), "realistic", candles))
-            matched += 1
-
-        except Exception:
-            continue
-
-    return lines, matched, total_jobs
-
 def try_match(mm, hh, mmn):
-    \"\"\"Strict exact-minute only: returns ts if (hh,mm) exists, else None.\"\"\"
+    """Strict exact-minute only: returns ts if (hh,mm) exists, else None."""
     return mm.get(((hh % 24), mmn), None)
 
 def build_lines_strict(jobs):
-    \"\"\"Build lines with strict exact HH:MM matching.
+    """Build lines with strict exact HH:MM matching.
     - Input HH:MM interpreted via TB_INPUT_TZ (UTC|KHI). Default UTC.
     - Lookback default: last 48h (fetch_ohlcv_1m_last_48h).
       If TB_LOOKBACK='7d', uses fetch_ohlcv_1m_last_7d instead.
-    Returns (lines, matched, total_jobs).\"\"\"
+    Returns (lines, matched, total_jobs)."""
     from datetime import datetime, timezone
     import os as _os
 
@@ -802,6 +383,11 @@ def build_lines_strict(jobs):
     lookback = (_os.environ.get("TB_LOOKBACK", "48h") or "48h").lower()
     use_7d = (lookback == "7d")
 
+    # planning stage: one pool lookup per mint and one download per pool, shared by every job on it
+    plan = FetchPlan()
+    hours = 7 * 24 if use_7d else 48
+    now = int(time.time())
+    planned = []
     for parts in jobs:
         if len(parts) == 9:
             mint, hhmm, invest, *_ = parts
@@ -809,14 +395,31 @@ def build_lines_strict(jobs):
             mint, hhmm, mc, invest, *_ = parts
         else:
             continue
+        with profiling.span("pool_detect"):
+            found = plan.pool(mint, lambda: detect_network_and_pool(mint))
+        if found is None:
+            continue
+        net, pool = found
+        plan.add(len(planned), net, pool, now - hours * 3600, now)
+        planned.append((mint, hhmm, invest))
+
+    def _fetch(net, pool, start, end):
+        try:
+            return fetch_ohlcv_1m_last_7d(net, pool) if use_7d else fetch_ohlcv_1m_last_48h(net, pool)
+        except Exception:
+            return []
+    plan.fetch(_fetch)
 
+    mm_maps = {}
+    for idx, (mint, hhmm, invest) in enumerate(planned):
         try:
-            net, pool = detect_network_and_pool(mint)
-            candles = fetch_ohlcv_1m_last_7d(net, pool) if use_7d else fetch_ohlcv_1m_last_48h(net, pool)
+            candles = plan.series(idx, clip=False)
             if not candles:
                 continue
 
-            mm_map = _minute_map(candles)
+            if id(candles) not in mm_maps:
+                mm_maps[id(candles)] = _minute_map(candles)
+            mm_map = mm_maps[id(candles)]
 
             try:
                 hh, mm = [int(x) for x in hhmm.split(":")]
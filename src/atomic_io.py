@@ -0,0 +1,102 @@
+# src/atomic_io.py — crash- and concurrency-safe cache writes: temp file + os.replace, advisory file locks
+#
+# Readers never see a half-written file: writers fill a temp file unique to their process and
+# thread in the same directory, fsync it and os.replace() it over the target in one step.
+# Read-modify-write cycles (merging candles into a cache file, updating an index) hold an
+# advisory lock on a sidecar `<name>.lock` file: fcntl.flock on POSIX, msvcrt.locking on Windows.
+# The lock lives on the sidecar because os.replace swaps the target's inode.
+import os, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:       # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_POLL = 0.05
+
+def temp_path(path):
+    """Hidden temp file next to path, unique per process and thread"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """Yield a file whose contents replace `path` atomically on a clean exit (discarded on error)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def _lock_fd(fd, shared, blocking):
+    if fcntl is not None:
+        flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        fcntl.flock(fd, flags)
+    else:
+        # msvcrt has no shared locks; lock the first byte exclusively
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path, shared=False, timeout=None):
+    """Advisory lock on `<path>.lock`; raises TimeoutError if not acquired within `timeout` seconds"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_name(path.name + ".lock")
+    fd = os.open(lock, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                _lock_fd(fd, shared, blocking=fcntl is not None and deadline is None)
+                break
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"could not lock {lock} within {timeout}s")
+                time.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+def locked_update(path, read, merge, write, timeout=None):
+    """Under the path's lock: current = read(path) (None if missing), write(path, merge(current)).
+
+    write() is expected to publish through atomic_write, so lock-free readers stay safe.
+    """
+    with file_lock(path, timeout=timeout):
+        current = read(path) if Path(path).exists() else None
+        result = merge(current)
+        write(path, result)
+        return result
+
+def append_line(path, line, header=None):
+    """Append one line under the lock; `header` is written first if the file is new or empty"""
+    path = Path(path)
+    with file_lock(path):
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            if header is not None and f.tell() == 0:
+                f.write(header)
+            f.write(line)
@@ -0,0 +1,376 @@
+# src/backtest_server.py — long-running backtest daemon: local HTTP/JSON API over a resident candle store
+#
+#   python src/backtest_server.py --port 8765        (or: python src/tsb.py serve)
+#
+#   GET    /health                    store + job counters
+#   POST   /simulate                  {signals, tp, sl, tsl} -> results, answered synchronously
+#   POST   /jobs                      {kind: batch|grid|optimize, signals, ...} -> {job_id}
+#   GET    /jobs                      job list
+#   GET    /jobs/<id>?since=N         status, progress and rows[N:]
+#   GET    /jobs/<id>/stream          NDJSON rows as they are produced, then a final status line
+#   DELETE /jobs/<id>                 cancel
+import argparse, itertools, json, os, threading, time, uuid
+import urllib.request, urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import profiling
+from candle_store import get_store
+from signal_utils import normalize_signal
+from trade_results import ResultBatch
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = os.getenv("TB_SERVER", f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+JOB_WORKERS = int(os.getenv("TB_SERVER_WORKERS", "2"))
+MAX_JOBS = 100
+
+# --- Backtests over the store ---
+def batch_rows(store, signals, tp=None, sl=None, tsl=None, fetch=True, job=None, cost=None):
+    """One result row per signal, in the layout batch_trade_runner writes.
+
+    cost optionally overrides the simulator's cost model: {"slip", "fee", "invest_usd"}.
+    """
+    from single_trade_from_cache import simulate_trade
+    for raw in signals:
+        if job is not None and job.cancelled:
+            return
+        try:
+            sig = normalize_signal(raw)
+            candles, pyramid = store.candles(sig["chain"], sig["token"], sig["time"], sig["unix"], fetch=fetch)
+            if not candles:
+                res = {"status": "no_data", "pnl": 0.0, "exit_reason": "no_data"}
+            else:
+                with profiling.span("simulate"):
+                    res = simulate_trade(candles, sig["unix"], tp=tp, sl=sl, tsl=tsl,
+                                         entry_mc=sig["entry_mc"], pyramid=pyramid, **(cost or {}))
+            entry_price, exit_price = res.get("entry_price"), res.get("exit_price")
+            res.update({
+                "chain": sig["chain"],
+                "token": sig["token"],
+                "coin": store.coin_name(sig["chain"], sig["token"]) if fetch else sig["token"][:6],
+                "unix": sig["unix"],
+                "entry_mc": sig["entry_mc"],
+                "exit_mc": sig["entry_mc"] * (exit_price / entry_price) if entry_price and exit_price else None,
+            })
+        except Exception as e:
+            res = {"status": "error", "error": str(e), "token": raw.get("token"), "pnl": 0.0, "exit_reason": "error"}
+        yield res
+
+def grid_rows(store, signals, combinations, fetch=True, job=None, cost=None):
+    """Strategy metrics rows (as the optimizers stream them) for every TP/SL/TSL combination"""
+    from single_trade_from_cache import simulate_trade_record
+    prepared = []
+    for raw in signals:
+        sig = normalize_signal(raw)
+        candles, pyramid = store.candles(sig["chain"], sig["token"], sig["time"], sig["unix"], fetch=fetch)
+        if candles:
+            prepared.append((sig["unix"], sig["entry_mc"], candles, pyramid))
+    if job is not None:
+        job.total = len(combinations)
+    trades = ResultBatch()
+    for tp, sl, tsl in combinations:
+        if job is not None and job.cancelled:
+            return
+        trades.clear()
+        for sig_idx, (unix, entry_mc, candles, pyramid) in enumerate(prepared):
+            with profiling.span("simulate"):
+                rec = simulate_trade_record(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc,
+                                            pyramid=pyramid, **(cost or {}))
+            trades.append(sig_idx, rec, 0)
+        metrics = trades.metrics()
+        if job is not None:
+            job.done += 1
+        if metrics:
+            metrics.update({"tp": tp, "sl": sl, "tsl": tsl, "strategy_id": f"TP{tp}_SL{sl}_TSL{tsl}"})
+            yield metrics
+
+def grid_combinations(spec):
+    """Explicit {tp: [...], sl: [...], tsl: [...]} grid, defaulting to the optimizer ranges"""
+    from strategy_optimizer_cached import TP_RANGE, SL_RANGE, TSL_RANGE
+    spec = spec or {}
+    return list(itertools.product(spec.get("tp") or TP_RANGE, spec.get("sl") or SL_RANGE, spec.get("tsl") or TSL_RANGE))
+
+# --- Jobs ---
+class Job:
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.rows = []
+        self.result = None
+        self.error = None
+        self.done = 0
+        self.total = len(params.get("signals") or []) if kind == "batch" else 0
+        self.cancelled = False
+        self.created = time.time()
+        self.finished = None
+        self.cond = threading.Condition()
+
+    def add(self, row):
+        with self.cond:
+            self.rows.append(row)
+            if self.kind == "batch":
+                self.done += 1
+            self.cond.notify_all()
+
+    def finish(self, status, result=None, error=None):
+        with self.cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.cond.notify_all()
+
+    def info(self, since=0):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "rows": self.rows[since:],
+            "next": len(self.rows),
+            "result": self.result,
+            "error": self.error,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+
+class BacktestService:
+    def __init__(self, store=None, workers=JOB_WORKERS):
+        self.store = store or get_store()
+        self.jobs = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tb-job")
+        self._lock = threading.Lock()
+
+    def simulate(self, params):
+        t = time.perf_counter()
+        rows = list(batch_rows(self.store, params.get("signals") or [], params.get("tp"), params.get("sl"),
+                               params.get("tsl"), fetch=params.get("fetch", True), cost=params.get("cost")))
+        return {"results": rows, "ms": round((time.perf_counter() - t) * 1000, 2)}
+
+    def submit(self, kind, params):
+        if kind not in ("batch", "grid", "optimize"):
+            raise ValueError(f"unknown job kind '{kind}'")
+        job = Job(kind, params)
+        with self._lock:
+            finished = [j for j in self.jobs.values() if j.finished]
+            for old in sorted(finished, key=lambda j: j.finished)[:max(0, len(self.jobs) - MAX_JOBS + 1)]:
+                self.jobs.pop(old.id, None)
+            self.jobs[job.id] = job
+        self.pool.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        if job.cancelled:
+            job.finish("cancelled")
+            return
+        job.status = "running"
+        p = job.params
+        signals = p.get("signals") or []
+        fetch = p.get("fetch", True)
+        cost = p.get("cost")
+        try:
+            with profiling.span(f"job_{job.kind}"):
+                if job.kind == "batch":
+                    for row in batch_rows(self.store, signals, p.get("tp"), p.get("sl"), p.get("tsl"), fetch, job, cost):
+                        job.add(row)
+                    result = {"total_pnl": sum(r.get("pnl") or 0 for r in job.rows)}
+                elif job.kind == "grid":
+                    for row in grid_rows(self.store, signals, grid_combinations(p.get("grid")), fetch, job, cost):
+                        job.add(row)
+                    result = {"strategies": len(job.rows)}
+                else:
+                    from strategy_optimizer_cached import sample_combinations, find_best_strategies
+                    combos = sample_combinations(int(p.get("max_combinations", 1000)))
+                    for row in grid_rows(self.store, signals, combos, fetch, job, cost):
+                        job.add(row)
+                    result = {"strategies": len(job.rows),
+                              "best": find_best_strategies(job.rows, int(p.get("top_n", 10)))}
+            job.finish("cancelled" if job.cancelled else "done", result)
+        except Exception as e:
+            job.finish("error", error=str(e))
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancelled = True
+        return job
+
+    def health(self):
+        counts = {}
+        for j in list(self.jobs.values()):
+            counts[j.status] = counts.get(j.status, 0) + 1
+        return {"status": "ok", "pid": os.getpid(), "store": self.store.stats(), "jobs": counts}
+
+# --- HTTP ---
+class Handler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+    server_version = "tb-backtest/1"
+
+    def log_message(self, fmt, *args):
+        if os.getenv("TB_SERVER_LOG", "0") == "1":
+            super().log_message(fmt, *args)
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n).decode("utf-8")) if n else {}
+
+    def _job(self, parts):
+        job = self.service.jobs.get(parts[1]) if len(parts) > 1 else None
+        if job is None:
+            self._send(404, {"error": "no such job"})
+        return job
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            return self._send(200, self.service.health())
+        if parts == ["jobs"]:
+            return self._send(200, {"jobs": [dict(j.info(len(j.rows)), rows=[]) for j in self.service.jobs.values()]})
+        if parts and parts[0] == "jobs":
+            job = self._job(parts)
+            if job is None:
+                return
+            if parts[2:] == ["stream"]:
+                return self._stream(job)
+            since = int(parse_qs(url.query).get("since", ["0"])[0])
+            return self._send(200, job.info(since))
+        self._send(404, {"error": f"unknown path {url.path}"})
+
+    def do_POST(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        try:
+            params = self._body()
+            if parts == ["simulate"]:
+                with profiling.span("api_simulate"):
+                    return self._send(200, self.service.simulate(params))
+            if parts == ["jobs"]:
+                job = self.service.submit(params.pop("kind", "batch"), params)
+                return self._send(202, {"job_id": job.id, "status": job.status})
+        except (ValueError, KeyError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_DELETE(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        job = self.service.cancel(parts[1]) if len(parts) == 2 and parts[0] == "jobs" else None
+        if job is None:
+            return self._send(404, {"error": "no such job"})
+        self._send(200, {"job_id": job.id, "cancelled": True})
+
+    def _stream(self, job):
+        """Close-delimited NDJSON: one line per row, then {"event": "end", ...}"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        sent = 0
+        try:
+            while True:
+                with job.cond:
+                    while sent >= len(job.rows) and job.finished is None:
+                        job.cond.wait(timeout=1.0)
+                    rows, finished = job.rows[sent:], job.finished is not None
+                for row in rows:
+                    self.wfile.write((json.dumps(row, default=str) + "\n").encode("utf-8"))
+                sent += len(rows)
+                self.wfile.flush()
+                if finished and sent >= len(job.rows):
+                    break
+            end = dict(job.info(sent), rows=[], event="end")
+            self.wfile.write((json.dumps(end, default=str) + "\n").encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    handler = type("BoundHandler", (Handler,), {"service": service or BacktestService()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# --- Client ---
+class BacktestClient:
+    """Thin client for the daemon (stdlib only, so importing it stays cheap)"""
+    def __init__(self, url=DEFAULT_URL, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                return json.loads(r.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{method} {path}: {e.code} {e.read().decode('utf-8', 'replace')}") from None
+
+    def available(self):
+        try:
+            return self.health().get("status") == "ok"
+        except (OSError, RuntimeError, ValueError):
+            return False
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def simulate(self, signals, tp=None, sl=None, tsl=None, cost=None):
+        payload = {"signals": signals, "tp": tp, "sl": sl, "tsl": tsl, "cost": cost}
+        return self._request("POST", "/simulate", payload)["results"]
+
+    def submit(self, kind, signals, **params):
+        return self._request("POST", "/jobs", dict(params, kind=kind, signals=signals))["job_id"]
+
+    def job(self, job_id, since=0):
+        return self._request("GET", f"/jobs/{job_id}?since={since}")
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def stream(self, job_id):
+        """Yield result rows as the daemon produces them; returns the final status dict"""
+        with urllib.request.urlopen(f"{self.url}/jobs/{job_id}/stream", timeout=None) as r:
+            for line in r:
+                msg = json.loads(line)
+                if msg.get("event") == "end":
+                    return msg
+                yield msg
+
+    def wait(self, job_id, poll=0.5):
+        while True:
+            info = self.job(job_id)
+            if info["status"] in ("done", "error", "cancelled"):
+                return info
+            time.sleep(poll)
+
+def main():
+    p = argparse.ArgumentParser(description="Backtest daemon with a resident candle cache")
+    p.add_argument("--host", default=DEFAULT_HOST, help="Bind address (keep it local)")
+    p.add_argument("--port", type=int, default=int(os.getenv("TB_SERVER_PORT", DEFAULT_PORT)))
+    p.add_argument("--workers", type=int, default=JOB_WORKERS, help="Concurrent background jobs")
+    profiling.add_profile_args(p)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+
+    server = make_server(args.host, args.port, BacktestService(workers=args.workers))
+    print(f"Backtest daemon listening on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
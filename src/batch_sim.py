@@ -1,13 +1,20 @@
 ﻿# src/batch_sim.py  (CSV adds coin_symbol/coin_name; console unchanged)
-import os, sys, re, subprocess, csv, time
+import os, sys, re, subprocess
 import httpx
 from collections import Counter
 import argparse
 
+import profiling
+from result_writers import StreamingWriter
+from singleflight import HTTP
+
 API_ROOT = "https://api.geckoterminal.com/api/v2"
 BATCH_FILE = os.path.join("src", "batch_lines.txt")
 OUT_DIR = "out"
 OUT_CSV = os.path.join(OUT_DIR, "batch_results.csv")
+CSV_FIELDS = ["mint","coin_symbol","coin_name","net","time_hhmm_utc","mc","invest_usd","mode","pnl_usd","return_pct",
+              "entry_dt_utc","exit_dt_utc","exit_reason","hold_min","entry_raw","exit_raw_avg",
+              "ath_mult","pnl_token","entry_mc","exit_mc"]
 
 PNL_RE        = re.compile(r"PNL:\s*\$([-\d,\.]+)\s+Return:\s*([-\d\.]+)%")
 ENTRY_RE      = re.compile(r"Entry\s*@\s*([0-9\-: ]+UTC)")
@@ -28,15 +35,21 @@ def parse_args():
                help='Buy fee fraction, e.g. 0.01 = 1 percent')
     p.add_argument('--sell-fee', type=float, default=0.01,
                help='Sell fee fraction, e.g. 0.01 = 1 percent')
+    p.add_argument('--format', choices=['csv','ndjson'], default='csv',
+               help='Output format for out/batch_results.*')
+    profiling.add_profile_args(p)
 
     return p.parse_args()
 
 def get_token_info(net: str, mint: str):
-    try:
+    def fetch():
         r = httpx.get(f"{API_ROOT}/networks/{net}/tokens/{mint}",
                       headers={"accept":"application/json"}, timeout=6.0)
         r.raise_for_status()
-        js = r.json()
+        return r.json()
+    try:
+        # repeated mints share one request (see singleflight)
+        js = HTTP.do(("token_info", net, mint), fetch)
         data = js.get("data") or []
         if not data: return {"symbol": mint[:4]+"…", "name": mint}
         attrs = data[0].get("attributes", {})
@@ -90,7 +103,8 @@ def run_line(parts, args_env):
     # IMPORTANT: forward slippage/fee config to child via environment (used in Step 2)
     env = os.environ.copy()
     env.update(args_env)
-    res = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    with profiling.span("subprocess"):
+        res = subprocess.run(cmd, capture_output=True, text=True, env=env)
     out = (res.stdout or "") + (res.stderr or "")
     pnl = ret = None
     m = PNL_RE.search(out)
@@ -112,7 +126,8 @@ def run_line(parts, args_env):
     mode = stats.get("mode", parts[-1])
     invest = float(stats.get("invest", parts[2 if len(parts)==9 else 3]))
     # NEW: fetch coin name/symbol (fast timeout, safe fallback)
-    info = get_token_info(net or "solana", mint)
+    with profiling.span("token_info"):
+        info = get_token_info(net or "solana", mint)
     coin_symbol = info.get("symbol")
     coin_name = info.get("name")
     return out, {
@@ -140,6 +155,7 @@ def run_line(parts, args_env):
 
 def main():
     args = parse_args()
+    profiling.start_from_args(args)
     # config banner so we can verify wiring
     print(f"[cfg] slip={args.slip} mode={args.slip_mode} side={args.slip_side} "
           f"buy_fee={args.buy_fee} sell_fee={args.sell_fee}")
@@ -160,45 +176,52 @@ def main():
     jobs = [ln for ln in lines if ln.strip() and not ln.lstrip().startswith("#")]
     print(f"Running {len(jobs)} lines...\n")
 
-    rows = []
-    for i, ln in enumerate(lines, 1):
-        line = ln.strip()
-        if not line or line.lstrip().startswith("#"): continue
-        parts = clean_parts(line)
-        try:
-            out, row = run_line(parts, args_env=args_env)
-            rows.append(row)
-            tail = "\n".join(out.strip().splitlines()[-4:])
-            print(f"\n--- LINE {i} ---\n{tail}\n")
-        except Exception as e:
-            print(f"\n--- LINE {i} ERROR --- {e}\n")
-
-    ok = [r for r in rows if r["pnl_usd"] is not None]
+    os.makedirs(OUT_DIR, exist_ok=True)
+    out_path = OUT_CSV if args.format == "csv" else os.path.join(OUT_DIR, "batch_results.ndjson")
+
+    # rows are streamed to disk as each line finishes; only table cells and running totals stay in memory
+    table_rows = []
+    n_ok = n_win = 0
+    total_pnl = 0.0
+    hold_sum = 0
+    ath_sum = 0.0; ath_n = 0
+    reasons = Counter()
+    with StreamingWriter(out_path, fieldnames=CSV_FIELDS, fmt=args.format) as writer:
+        for i, ln in enumerate(lines, 1):
+            line = ln.strip()
+            if not line or line.lstrip().startswith("#"): continue
+            parts = clean_parts(line)
+            try:
+                out, r = run_line(parts, args_env=args_env)
+                tail = "\n".join(out.strip().splitlines()[-4:])
+                print(f"\n--- LINE {i} ---\n{tail}\n")
+            except Exception as e:
+                print(f"\n--- LINE {i} ERROR --- {e}\n")
+                continue
+            if r["pnl_usd"] is None:
+                continue
+
+            with profiling.span("csv_write"):
+                writer.write(r)
+            coin = r.get("coin_symbol") or (r["mint"][:4]+"…")
+            athx = f"{float(r['ath_mult']):.2f}x" if r["ath_mult"] else ""
+            emc = human_mc(r["entry_mc"]) if r["entry_mc"] else ""
+            xmc = human_mc(r["exit_mc"]) if r["exit_mc"] else ""
+            pnl_coin = f"{float(r['pnl_token']):.4f}" if r["pnl_token"] else ""
+            hold = fmt_dur(r["hold_min"])
+            reason = r["exit_reason"]
+            table_rows.append([coin, athx, emc, xmc, pnl_coin, hold, reason])
+
+            n_ok += 1
+            total_pnl += r["pnl_usd"]
+            if r["pnl_usd"] > 0: n_win += 1
+            if str(r["hold_min"]).isdigit(): hold_sum += int(r["hold_min"])
+            if r["ath_mult"]: ath_sum += float(r["ath_mult"]); ath_n += 1
+            if reason: reasons[reason] += 1
 
     # Console table (kept minimal)
     print("\n=== TRADES ===")
     headers = ["Coin","ATH x","Entry MC","Exit MC","PnL (coin)","Hold","Exit reason"]
-    def human_mc(x):
-        try: n = float(x)
-        except: return ""
-        for unit,div in [("t",1e12),("b",1e9),("m",1e6),("k",1e3)]:
-            if abs(n) >= div: return f"{n/div:.2f}{unit}"
-        return f"{n:.0f}"
-    def fmt_dur(mins):
-        try: m = int(mins)
-        except: return ""
-        h = m//60; mm = m%60
-        return f"{h}h {mm}m" if h else f"{mm}m"
-    table_rows = []
-    for r in ok:
-        coin = r.get("coin_symbol") or (r["mint"][:4]+"…")
-        athx = f"{float(r['ath_mult']):.2f}x" if r["ath_mult"] else ""
-        emc = human_mc(r["entry_mc"]) if r["entry_mc"] else ""
-        xmc = human_mc(r["exit_mc"]) if r["exit_mc"] else ""
-        pnl_coin = f"{float(r['pnl_token']):.4f}" if r["pnl_token"] else ""
-        hold = fmt_dur(r["hold_min"])
-        reason = r["exit_reason"]
-        table_rows.append([coin, athx, emc, xmc, pnl_coin, hold, reason])
     widths = [ max(len(h), max((len(str(row[i])) for row in table_rows), default=0)) for i,h in enumerate(headers) ]
     print(" | ".join(h.ljust(widths[i]) for i,h in enumerate(headers)))
     print("-+-".join("-"*w for w in widths))
@@ -206,12 +229,10 @@ def main():
         print(" | ".join(str(row[i]).ljust(widths[i]) for i in range(len(headers))))
 
     # Summary
-    total_pnl = sum(r["pnl_usd"] for r in ok)
-    avg_hold  = sum(int(r["hold_min"]) for r in ok if str(r["hold_min"]).isdigit()) / len(ok) if ok else 0
-    reasons = Counter((r["exit_reason"] for r in ok if r["exit_reason"]))
+    avg_hold  = hold_sum / n_ok if n_ok else 0
     top_reason, top_count = (reasons.most_common(1)[0] if reasons else ("",0))
-    win_rate = 100.0 * sum(1 for r in ok if r["pnl_usd"]>0) / len(ok) if ok else 0.0
-    avg_athx = sum(float(r["ath_mult"]) for r in ok if r["ath_mult"]) / max(1, sum(1 for r in ok if r["ath_mult"]))
+    win_rate = 100.0 * n_win / n_ok if n_ok else 0.0
+    avg_athx = ath_sum / max(1, ath_n)
     print("\n=== SUMMARY ===")
     print(f"Total PNL (USD): ${total_pnl:,.2f}")
     print(f"Average hold: {fmt_dur(int(avg_hold))}")
@@ -219,24 +240,11 @@ def main():
     print(f"Win rate: {win_rate:.1f}%")
     print(f"Most common exit reason: {top_reason} ({top_count})")
 
-    # CSV write (now with symbol/name)
-    os.makedirs(OUT_DIR, exist_ok=True)
-    fields = ["mint","coin_symbol","coin_name","net","time_hhmm_utc","mc","invest_usd","mode","pnl_usd","return_pct",
-              "entry_dt_utc","exit_dt_utc","exit_reason","hold_min","entry_raw","exit_raw_avg",
-              "ath_mult","pnl_token","entry_mc","exit_mc"]
-    try:
-        with open(OUT_CSV, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=fields)
-            w.writeheader()
-            for r in ok: w.writerow(r)
-        print(f"\nCSV saved: {OUT_CSV}")
-    except PermissionError:
-        ts = time.strftime("%Y%m%d_%H%M%S")
-        alt = os.path.join(OUT_DIR, f"batch_results_{ts}.csv")
-        with open(alt, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=fields); w.writeheader()
-            for r in ok: w.writerow(r)
-        print(f"\nCSV in use — wrote to: {alt}")
+    # CSV/NDJSON was written row by row; the locked-file fallback happens on the final rename
+    if writer.fallback:
+        print(f"\nCSV in use — wrote to: {writer.final_path}")
+    else:
+        print(f"\nCSV saved: {writer.final_path}")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,5 @@
 import csv, argparse, pathlib, datetime as dt
-from statistics import mean, mode
+from collections import Counter
 from rich.console import Console
 from rich.table import Table
 
@@ -7,9 +7,14 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 from single_trade_from_cache import simulate_trade
-from fetch_and_cache_candles import get_top_pool, fetch_gt_candles, http_get
+from fetch_and_cache_candles import get_top_pool, fetch_gt_range, signal_window, http_get
+from signal_plan import FetchPlan
+from gt_history import fan_out
+import profiling
+from result_writers import StreamingWriter
 
 OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
+DB_CHUNK = 500   # results per results-warehouse insert with --db
 OUTDIR.mkdir(exist_ok=True)
 
 console = Console()
@@ -58,10 +63,45 @@ def fetch_coin_name(chain, token):
         return token[:6]
 
 # --- Batch runner ---
-def run_batch(input_file, tp, sl, tsl):
-    results = []
-    PKT = dt.timezone(dt.timedelta(hours=5))
+CSV_FIELDS = [
+    "coin","token","unix","entry_mc","exit_mc",
+    "trade_ath","market_ath","trade_atl","max_drawdown",
+    "pnl","return_pct","duration","exit_reason"
+]
+
+def table_row(r):
+    """Rich table cells for one result (kept instead of the full result dict)"""
+    coin = r["coin"]
+    trade_ath = f"{r['trade_ath']:.2f}x" if r.get("trade_ath") else "N/A"
+    market_ath = f"{r['market_ath']:.2f}x" if r.get("market_ath") else "N/A"
+    trade_atl = f"{r['trade_atl']:.2f}x" if r.get("trade_atl") else "N/A"
+    max_dd = f"{r['max_drawdown']:.1f}%" if r.get("max_drawdown") else "N/A"
+    entry_mc = format_mc(r["entry_mc"])
+    exit_mc = format_mc(r["exit_mc"])
+    pnl = r.get("pnl", 0)
+    duration = format_duration(r.get("duration"))
+    reason = r.get("exit_reason", "no_entry")
+
+    if pnl > 0:
+        pnl_str = f"[green]{pnl:.2f}[/green]"
+        reason_str = f"[green]{reason}[/green]"
+    elif pnl < 0:
+        pnl_str = f"[red]{pnl:.2f}[/red]"
+        reason_str = f"[red]{reason}[/red]"
+    else:
+        pnl_str = f"[yellow]{pnl:.2f}[/yellow]"
+        reason_str = f"[yellow]{reason}[/yellow]"
 
+    return (coin, trade_ath, market_ath, trade_atl, max_dd, entry_mc, exit_mc, pnl_str, duration, reason_str)
+
+def plan_batch(input_file, concurrency=1):
+    """Read every signal, resolve each token's pool once and plan one fetch per (network, pool) window.
+
+    Pool lookups run on `concurrency` threads under the shared GT rate limiter.
+    """
+    PKT = dt.timezone(dt.timedelta(hours=5))
+    signals = []
+    plan = FetchPlan()
     with open(input_file, newline="") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -79,30 +119,126 @@ def run_batch(input_file, tp, sl, tsl):
                 cand_pkt -= dt.timedelta(days=1)
             cand_utc = cand_pkt.astimezone(dt.timezone.utc)
             unix = int(cand_utc.timestamp())
+            signals.append((chain, token, unix, entry_mc))
 
-            # Fetch candles with smart caching around signal time
-            pool = get_top_pool(net_map[chain], token)
-            candles = fetch_gt_candles(net_map[chain], pool, start_unix=unix, signal_unix=unix)
+    keys = [(net_map[chain], token) for chain, token, _, _ in signals]
+    pools = plan.resolve_pools(keys, lambda key: (key[0], get_top_pool(*key)), workers=concurrency)
+    for idx, ((chain, token, unix, entry_mc), key) in enumerate(zip(signals, keys)):
+        found = pools[key]
+        if found is None:
+            raise plan.errors[key]
+        # same 30-minute window fetch_gt_candles would cache for this signal
+        start, end = signal_window(unix)
+        plan.add(idx, key[0], found[1], start, end)
+    return signals, plan
 
-            # Run trade simulation with improved entry logic
+def local_results(input_file, tp, sl, tsl, series=None, concurrency=1):
+    """Fetch and simulate every signal in this process (each signal's candles appended to `series` if given).
+
+    The I/O stage (pool lookups, candle downloads, coin names) fans out over `concurrency`
+    threads; the simulation then runs over the fetched candles in input order.
+    """
+    signals, plan = plan_batch(input_file, concurrency)
+    plan.fetch(fetch_gt_range, workers=concurrency)
+    stats = plan.stats()
+    if stats["downloads"] < stats["signals"]:
+        console.print(f"[cyan]{stats['signals']} signals -> {stats['pools']} pools, {stats['downloads']} downloads[/cyan]")
+
+    coins = list(dict.fromkeys((chain, token) for chain, token, _, _ in signals))
+    with profiling.span("coin_name"):
+        coin_names = dict(zip(coins, fan_out(lambda key: fetch_coin_name(*key), coins, concurrency)))
+    for idx, (chain, token, unix, entry_mc) in enumerate(signals):
+        candles = plan.series(idx)
+        if series is not None:
+            series.append(candles)
+
+        # Run trade simulation with improved entry logic
+        with profiling.span("simulate"):
             res = simulate_trade(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc)
 
-            # Calculate exit_mc
-            entry_price = res.get("entry_price")
-            exit_price = res.get("exit_price")
-            exit_mc = entry_mc * (exit_price/entry_price) if entry_price and exit_price else None
+        # Calculate exit_mc
+        entry_price = res.get("entry_price")
+        exit_price = res.get("exit_price")
+        exit_mc = entry_mc * (exit_price/entry_price) if entry_price and exit_price else None
+
+        res.update({
+            "chain": chain,
+            "token": token,
+            "coin": coin_names[(chain, token)],
+            "unix": unix,
+            "entry_mc": entry_mc,
+            "exit_mc": exit_mc
+        })
+        yield res
+
+def server_results(url, input_file, tp, sl, tsl):
+    """Submit the signals to a running backtest daemon and stream its rows back"""
+    from backtest_server import BacktestClient
+    client = BacktestClient(url)
+    with open(input_file, newline="") as f:
+        signals = [{k: row[k] for k in ("chain", "token", "time", "entry_mc")} for row in csv.DictReader(f)]
+    job_id = client.submit("batch", signals, tp=tp, sl=sl, tsl=tsl)
+    console.print(f"[cyan]Submitted {len(signals)} signals to {url} (job {job_id})[/cyan]")
+    for res in client.stream(job_id):
+        if res.get("status") == "error":
+            console.print(f"[red]Error processing signal {res.get('token')}: {res.get('error')}[/red]")
+            continue
+        yield res
+
+def run_batch(input_file, tp, sl, tsl, fmt="csv", server=None, db=None, concurrency=1):
+    table_rows = []
+    db_rows, db_series = [], []   # pending warehouse inserts, flushed every DB_CHUNK results
+    n_db_signals = n_db_trades = 0
+
+    # running summary (results themselves are streamed to disk, not kept)
+    n_calls = n_wins = n_losses = n_neutral = 0
+    pnl_total = 0.0
+    dur_sum = dur_n = 0
+    exit_reasons = Counter()
+
+    if server:
+        results = server_results(server, input_file, tp, sl, tsl)
+    else:
+        results = local_results(input_file, tp, sl, tsl, series=db_series if db else None, concurrency=concurrency)
+    outfile = OUTDIR / ("batch_results.ndjson" if fmt == "ndjson" else "batch_results.csv")
+    if db:
+        import results_db
+        conn = results_db.connect(db)
+        run_id = results_db.start_run(conn, "batch", "batch_trade_runner",
+                                      {"input": str(input_file), "tp": tp, "sl": sl, "tsl": tsl, "server": server})
 
-            coin_name = fetch_coin_name(chain, token)
+    def flush_db():
+        nonlocal n_db_signals, n_db_trades
+        with profiling.span("db_write"):
+            n_db_trades += results_db.record_results(conn, run_id, db_rows, series=db_series or None, source="batch_trade_runner")
+        n_db_signals += len(db_rows)
+        db_rows.clear()
+        db_series.clear()
 
-            res.update({
-                "chain": chain,
-                "token": token,
-                "coin": coin_name,
-                "unix": unix,
-                "entry_mc": entry_mc,
-                "exit_mc": exit_mc
-            })
-            results.append(res)
+    with StreamingWriter(outfile, fieldnames=CSV_FIELDS, fmt=fmt) as writer:
+        for res in results:
+            with profiling.span("csv_write"):
+                writer.write(res)
+            table_rows.append(table_row(res))
+            if db:
+                db_rows.append(res)
+                if len(db_rows) >= DB_CHUNK:
+                    flush_db()
+
+            pnl = res.get("pnl", 0)
+            n_calls += 1
+            pnl_total += pnl
+            if pnl > 0:
+                n_wins += 1
+            elif pnl < 0:
+                n_losses += 1
+            else:
+                n_neutral += 1
+            if res.get("duration"):
+                dur_sum += res["duration"]
+                dur_n += 1
+            if res.get("exit_reason") and res["exit_reason"] != "no_entry":
+                exit_reasons[res["exit_reason"]] += 1
 
     # --- Print Rich table ---
     table = Table(title="Batch Backtest Results")
@@ -117,81 +253,58 @@ def run_batch(input_file, tp, sl, tsl):
     table.add_column("Duration")
     table.add_column("Exit Reason")
 
-    for r in results:
-        coin = r["coin"]
-        trade_ath = f"{r['trade_ath']:.2f}x" if r.get("trade_ath") else "N/A"
-        market_ath = f"{r['market_ath']:.2f}x" if r.get("market_ath") else "N/A"
-        trade_atl = f"{r['trade_atl']:.2f}x" if r.get("trade_atl") else "N/A"
-        max_dd = f"{r['max_drawdown']:.1f}%" if r.get("max_drawdown") else "N/A"
-        entry_mc = format_mc(r["entry_mc"])
-        exit_mc = format_mc(r["exit_mc"])
-        pnl = r.get("pnl", 0)
-        duration = format_duration(r.get("duration"))
-        reason = r.get("exit_reason", "no_entry")
-
-        if pnl > 0:
-            pnl_str = f"[green]{pnl:.2f}[/green]"
-            reason_str = f"[green]{reason}[/green]"
-        elif pnl < 0:
-            pnl_str = f"[red]{pnl:.2f}[/red]"
-            reason_str = f"[red]{reason}[/red]"
-        else:
-            pnl_str = f"[yellow]{pnl:.2f}[/yellow]"
-            reason_str = f"[yellow]{reason}[/yellow]"
-
-        table.add_row(coin, trade_ath, market_ath, trade_atl, max_dd, entry_mc, exit_mc, pnl_str, duration, reason_str)
+    for cells in table_rows:
+        table.add_row(*cells)
 
     console.print(table)
 
     # --- Summary ---
-    pnl_total = sum(r.get("pnl", 0) for r in results)
-    durations = [r["duration"] for r in results if r.get("duration")]
-    exit_reasons = [r["exit_reason"] for r in results if r.get("exit_reason") and r["exit_reason"] != "no_entry"]
-
-    wins = [r for r in results if r.get("pnl", 0) > 0]
-    losses = [r for r in results if r.get("pnl", 0) < 0]
-    neutral = [r for r in results if r.get("pnl", 0) == 0]
-
     console.print("\n[bold]SUMMARY[/bold]:")
-    console.print(f"Total calls: {len(results)}")
-    console.print(f"Winning calls: {len(wins)}")
-    console.print(f"Losing calls: {len(losses)}")
-    console.print(f"Neutral calls: {len(neutral)}")
+    console.print(f"Total calls: {n_calls}")
+    console.print(f"Winning calls: {n_wins}")
+    console.print(f"Losing calls: {n_losses}")
+    console.print(f"Neutral calls: {n_neutral}")
     console.print(f"Total PnL: {pnl_total:+.2f}")
-    if durations:
-        console.print(f"Average trade duration: {mean(durations)/60:.1f}m")
+    if dur_n:
+        console.print(f"Average trade duration: {dur_sum/dur_n/60:.1f}m")
     if exit_reasons:
-        try:
-            console.print(f"Most common exit reason: {mode(exit_reasons)}")
-        except:
-            pass
-
-    # --- Save CSV ---
-    outfile = OUTDIR / "batch_results.csv"
-    with open(outfile, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=[
-            "coin","token","unix","entry_mc","exit_mc",
-            "trade_ath","market_ath","trade_atl","max_drawdown",
-            "pnl","return_pct","duration","exit_reason"
-        ])
-        w.writeheader()
-        for r in results:
-            w.writerow({
-                "coin": r["coin"], "token": r["token"], "unix": r["unix"],
-                "entry_mc": r["entry_mc"], "exit_mc": r.get("exit_mc"),
-                "trade_ath": r.get("trade_ath"), "market_ath": r.get("market_ath"),
-                "trade_atl": r.get("trade_atl"), "max_drawdown": r.get("max_drawdown"),
-                "pnl": r.get("pnl"), "return_pct": r.get("return_pct"),
-                "duration": r.get("duration"), "exit_reason": r.get("exit_reason")
-            })
-    console.print(f"\nSaved results -> {outfile}")
+        console.print(f"Most common exit reason: {exit_reasons.most_common(1)[0][0]}")
 
+    if writer.fallback:
+        console.print(f"\n[yellow]{outfile.name} in use — wrote to: {writer.final_path}[/yellow]")
+    else:
+        console.print(f"\nSaved results -> {writer.final_path}")
 
-if __name__ == "__main__":
+    if db:
+        if db_rows:
+            flush_db()
+        results_db.finish_run(conn, run_id, output=writer.final_path, n_signals=n_db_signals, n_trades=n_db_trades)
+        conn.close()
+        console.print(f"Recorded run {run_id} ({n_db_trades} trades) -> {db}")
+
+
+def main():
     p = argparse.ArgumentParser()
     p.add_argument("--input", required=True, help="CSV file with columns: chain,token,time,entry_mc")
     p.add_argument("--tp", type=float, default=None)
     p.add_argument("--sl", type=float, default=None)
     p.add_argument("--tsl", type=float, default=None)
+    p.add_argument("--format", choices=["csv", "ndjson"], default="csv", help="Output format for out/batch_results.*")
+    p.add_argument("--server", nargs="?", const=os.getenv("TB_SERVER", "http://127.0.0.1:8765"), default=None,
+                   help="Run the batch on a backtest daemon (tsb serve) instead of in this process")
+    p.add_argument("--db", nargs="?", const="", default=None, metavar="PATH",
+                   help="Also record the run in the SQLite results warehouse (default out/results.db or TB_RESULTS_DB)")
+    p.add_argument("--concurrency", type=int, default=1, metavar="N",
+                   help="Threads for pool lookups, candle downloads and coin names (requests stay rate limited)")
+    profiling.add_profile_args(p)
     args = p.parse_args()
-    run_batch(args.input, tp=args.tp, sl=args.sl, tsl=args.tsl)
+    profiling.start_from_args(args)
+    db = None
+    if args.db is not None:
+        from results_db import DB_PATH
+        db = args.db or DB_PATH
+    run_batch(args.input, tp=args.tp, sl=args.sl, tsl=args.tsl, fmt=args.format, server=args.server, db=db,
+              concurrency=args.concurrency)
+
+if __name__ == "__main__":
+    main()
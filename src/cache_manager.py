@@ -0,0 +1,272 @@
+# src/cache_manager.py — cache/ and out/ bookkeeping: access index, hit rates per tier, LRU eviction under a byte budget
+#
+# Loaders report hits and misses with touch()/miss(); counts are buffered in-process and merged
+# into cache/.cache_index.json at exit, so the hot path never rewrites the index. gc() evicts the
+# least recently used files until every tier together fits TB_CACHE_BUDGET, skipping pinned
+# files: the candle series of tokens in the active signals.csv, the latest result files and
+# anything committed to git (e.g. the sample OHLCV series).
+#
+#   python src/tsb.py cache stats
+#   python src/tsb.py cache gc --budget 2G [--dry-run]
+import argparse, atexit, json, os, pathlib, time
+
+from atomic_io import atomic_write, file_lock
+import profiling
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+CACHEDIR = ROOT / "cache"
+OUTDIR = ROOT / "out"
+INDEX_PATH = CACHEDIR / ".cache_index.json"
+SIGNALS_PATH = ROOT / "signals.csv"
+
+TIERS = {
+    "candles": CACHEDIR,                     # {chain}_{token[:8]}_{HHMM}.csv / .tbc
+    "ohlcv": CACHEDIR / "ohlcv_1m_48h",      # {network}_{pool}[_7d].tbc / .json
+    "out": OUTDIR,                           # per-run results and candle dumps
+}
+# never evicted: the files every tool reads as "the latest run"
+PINNED_NAMES = {"batch_results.csv", "batch_results.ndjson", "results.db", "results.db-wal", "results.db-shm",
+                "live_signals.csv", "live_results.ndjson"}
+GC_INTERVAL = 3600
+
+# --- Helpers ---
+def parse_size(s):
+    """'500M', '2G', '1.5T' or plain bytes -> int"""
+    s = str(s).strip().upper().rstrip("B")
+    for unit, mult in (("K", 1 << 10), ("M", 1 << 20), ("G", 1 << 30), ("T", 1 << 40)):
+        if s.endswith(unit):
+            return int(float(s[:-1]) * mult)
+    return int(float(s))
+
+def human_size(n):
+    for unit in ("B", "K", "M", "G"):
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}T"
+
+def budget():
+    """TB_CACHE_BUDGET in bytes, or None when unset (no automatic eviction)"""
+    value = os.getenv("TB_CACHE_BUDGET")
+    return parse_size(value) if value else None
+
+def _rel(path):
+    path = pathlib.Path(path).resolve()
+    try:
+        return path.relative_to(ROOT).as_posix()
+    except ValueError:
+        return None
+
+def tier_of(rel):
+    parent = (ROOT / rel).parent
+    for name, directory in TIERS.items():
+        if parent == directory:
+            return name
+    return None
+
+# --- Access tracking (buffered, merged into the index at exit) ---
+_pending = {}     # rel path -> [last access, hits]
+_counts = {}      # tier -> [hits, misses]
+_registered = False
+
+def _register():
+    global _registered
+    if not _registered:
+        atexit.register(flush)
+        _registered = True
+
+def touch(path, hit=True):
+    """Record an access (a cache hit, or a fresh write with hit=False)"""
+    rel = _rel(path)
+    if rel is None:
+        return
+    _register()
+    entry = _pending.setdefault(rel, [0, 0])
+    entry[0] = time.time()
+    if hit:
+        entry[1] += 1
+        tier = tier_of(rel)
+        if tier:
+            _counts.setdefault(tier, [0, 0])[0] += 1
+
+def miss(tier):
+    _register()
+    _counts.setdefault(tier, [0, 0])[1] += 1
+
+def load_index():
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if isinstance(index, dict) and "files" in index:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": 1, "files": {}, "tiers": {}, "last_gc": 0}
+
+def save_index(index):
+    with atomic_write(INDEX_PATH, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+def _merge(index):
+    for rel, (atime, hits) in _pending.items():
+        entry = index["files"].setdefault(rel, {"atime": 0, "hits": 0})
+        entry["atime"] = max(entry["atime"], atime)
+        entry["hits"] += hits
+    for tier, (hits, misses) in _counts.items():
+        t = index["tiers"].setdefault(tier, {"hits": 0, "misses": 0})
+        t["hits"] += hits
+        t["misses"] += misses
+    _pending.clear()
+    _counts.clear()
+
+def flush():
+    """Merge this process's accesses into the index (and run gc if a budget is set and it is due)"""
+    if not _pending and not _counts:
+        return
+    try:
+        with file_lock(INDEX_PATH, timeout=10):
+            index = load_index()
+            _merge(index)
+            limit = budget()
+            if limit is not None and time.time() - index.get("last_gc", 0) > GC_INTERVAL:
+                gc(limit, index=index)
+            else:
+                save_index(index)
+    except (OSError, TimeoutError):
+        pass
+
+# --- Scanning / pinning ---
+def scan(index=None):
+    """Every cache/out file: [(rel, tier, size, last access)]; untracked files fall back to mtime"""
+    files = (index or load_index())["files"]
+    entries = []
+    for tier, directory in TIERS.items():
+        if not directory.is_dir():
+            continue
+        with os.scandir(directory) as it:
+            for e in it:
+                if not e.is_file() or e.name.startswith(".") or e.name.endswith((".tmp", ".lock", ".partial")):
+                    continue
+                st = e.stat()
+                rel = f"{directory.relative_to(ROOT).as_posix()}/{e.name}"
+                atime = files.get(rel, {}).get("atime") or st.st_mtime
+                entries.append((rel, tier, st.st_size, atime))
+    return entries
+
+def pinned_tokens(signal_files=None):
+    """Tokens of the active signal files (default: signals.csv)"""
+    import csv
+    tokens = set()
+    for path in signal_files or [SIGNALS_PATH]:
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                tokens.update(row["token"].strip() for row in csv.DictReader(f) if row.get("token"))
+        except (OSError, KeyError):
+            continue
+    return tokens
+
+def tracked_files():
+    """cache/ and out/ files committed to git (empty outside a git checkout)"""
+    import subprocess
+    try:
+        out = subprocess.run(["git", "-C", str(ROOT), "ls-files", "-z", "--", "cache", "out"],
+                             capture_output=True, timeout=10, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return set()
+    return set(filter(None, out.decode("utf-8", "replace").split("\0")))
+
+def is_pinned(rel, tokens):
+    """Pinned result files, and candle files named {chain}_{token prefix}_... of a pinned token.
+
+    OHLCV files are keyed by pool, not token, so they are only protected by recency.
+    """
+    name = rel.rsplit("/", 1)[-1]
+    if name in PINNED_NAMES:
+        return True
+    parts = name.split("_")
+    if len(parts) < 3 or len(parts[1]) < 6:
+        return False
+    return any(t.startswith(parts[1]) for t in tokens)
+
+# --- Eviction / reporting ---
+def gc(limit, signal_files=None, dry_run=False, index=None):
+    """Delete least recently used unpinned files until all tiers fit in `limit` bytes"""
+    index = load_index() if index is None else index
+    entries = scan(index)
+    total = sum(size for _, _, size, _ in entries)
+    tokens = pinned_tokens(signal_files)
+    tracked = tracked_files()
+    evicted, freed = [], 0
+    for rel, tier, size, atime in sorted(entries, key=lambda e: e[3]):
+        if total - freed <= limit:
+            break
+        if rel in tracked or is_pinned(rel, tokens):
+            continue
+        if not dry_run:
+            try:
+                os.remove(ROOT / rel)
+            except OSError:
+                continue
+            index["files"].pop(rel, None)
+        evicted.append((rel, tier, size, atime))
+        freed += size
+    if not dry_run:
+        live = {rel for rel, *_ in entries}
+        index["files"] = {rel: e for rel, e in index["files"].items() if rel in live}
+        index["last_gc"] = time.time()
+        save_index(index)
+    return {"before": total, "after": total - freed, "freed": freed, "evicted": evicted}
+
+def stats():
+    """Per tier: files, bytes, tracked files, hits, misses"""
+    flush()
+    index = load_index()
+    out = {tier: {"files": 0, "bytes": 0, "tracked": 0, "hits": 0, "misses": 0} for tier in TIERS}
+    for rel, tier, size, _ in scan(index):
+        out[tier]["files"] += 1
+        out[tier]["bytes"] += size
+        out[tier]["tracked"] += rel in index["files"]
+    for tier, counts in index["tiers"].items():
+        if tier in out:
+            out[tier].update(counts)
+    return out, index.get("last_gc", 0)
+
+def main():
+    p = argparse.ArgumentParser(description="Cache index, hit rates and LRU garbage collection for cache/ and out/")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    st = sub.add_parser("stats", help="Files, bytes and hit rate per tier")
+    g = sub.add_parser("gc", help="Evict least recently used files down to a byte budget")
+    g.add_argument("--budget", default=os.getenv("TB_CACHE_BUDGET"), help="e.g. 2G (default: TB_CACHE_BUDGET)")
+    g.add_argument("--signals", nargs="*", default=None, help="Signal CSVs whose tokens are pinned (default: signals.csv)")
+    g.add_argument("--dry-run", action="store_true", help="List what would be evicted without deleting")
+    for sp in (st, g):
+        profiling.add_profile_args(sp)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+
+    if args.cmd == "stats":
+        with profiling.span("stats"):
+            tiers, last_gc = stats()
+        print(f"{'tier':<8} {'files':>7} {'bytes':>9} {'tracked':>8} {'hits':>7} {'misses':>7} {'hit rate':>9}")
+        for tier, s in tiers.items():
+            lookups = s["hits"] + s["misses"]
+            rate = f"{s['hits'] / lookups * 100:.1f}%" if lookups else "-"
+            print(f"{tier:<8} {s['files']:>7} {human_size(s['bytes']):>9} {s['tracked']:>8} {s['hits']:>7} {s['misses']:>7} {rate:>9}")
+        total = sum(s["bytes"] for s in tiers.values())
+        limit = budget()
+        print(f"total {human_size(total)}" + (f" of {human_size(limit)} budget" if limit else " (no TB_CACHE_BUDGET)")
+              + (f", last gc {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_gc))}" if last_gc else ""))
+        return
+
+    if not args.budget:
+        p.error("gc needs --budget or TB_CACHE_BUDGET")
+    with profiling.span("gc"), file_lock(INDEX_PATH):
+        result = gc(parse_size(args.budget), args.signals, args.dry_run)
+    verb = "would evict" if args.dry_run else "evicted"
+    for rel, tier, size, atime in result["evicted"]:
+        print(f"{verb} {rel} ({human_size(size)}, last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(atime))})")
+    print(f"{human_size(result['before'])} -> {human_size(result['after'])} "
+          f"({verb} {len(result['evicted'])} files, {human_size(result['freed'])})")
+
+if __name__ == "__main__":
+    main()
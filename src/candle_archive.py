@@ -0,0 +1,288 @@
+# src/candle_archive.py — compact candle archive (.tbc): delta-encoded ts, byte-shuffled columns, compressed blocks
+#
+# Layout (little-endian):
+#   header  <4sBBBBIIQ   magic "TBC1", version, codec, price mode, reserved, block_rows, n_blocks, n_rows
+#   index   n_blocks x <qqIQIb3x   first_ts, last_ts, rows, offset, length, price exponent
+#   blocks  compressed payload: ts (constant step or int64 deltas) + o,h,l,c,v columns
+#
+# Every column is stored as 8-byte values with their bytes transposed (all first bytes, then all
+# second bytes, ...), which lets zlib/lzma find the runs that raw float64 text hides. Prices are
+# float64 (lossless) or, with price_mode="scaled", int64 deltas at ~10 significant digits. The
+# index sits right after the header, so a time range reads only the blocks that overlap it.
+import argparse, json, lzma, math, pathlib, struct, sys, zlib
+
+import numpy as np
+
+from atomic_io import atomic_write, locked_update
+import profiling
+
+EXT = ".tbc"
+MAGIC = b"TBC1"
+VERSION = 1
+BLOCK_ROWS = 1440          # one day of 1m candles per block
+SIG_DIGITS = 10            # precision kept by price_mode="scaled"
+
+CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+PRICE_MODES = {"float": 0, "scaled": 1}
+
+_HEADER = struct.Struct("<4sBBBBIIQ")
+_ENTRY = struct.Struct("<qqIQIb3x")
+_TS_CONST, _TS_DELTA = 0, 1
+PRICE_COLS = ("o", "h", "l", "c")
+COLS = ("ts",) + PRICE_COLS + ("v",)
+
+# --- Column encoding ---
+def _shuffle(arr):
+    return np.ascontiguousarray(arr).view(np.uint8).reshape(-1, 8).T.tobytes()
+
+def _unshuffle(buf, n, dtype):
+    return np.frombuffer(buf, dtype=np.uint8, count=n * 8).reshape(8, n).T.copy().view(dtype).ravel()
+
+def _compress(raw, codec):
+    if codec == 1:
+        return zlib.compress(raw, 6)
+    if codec == 2:
+        return lzma.compress(raw, preset=6)
+    return raw
+
+def _decompress(raw, codec):
+    if codec == 1:
+        return zlib.decompress(raw)
+    if codec == 2:
+        return lzma.decompress(raw)
+    return raw
+
+def _exponent(prices):
+    """Decimal exponent that scales this block's largest price to SIG_DIGITS digits"""
+    top = float(np.max(np.abs(prices))) if prices.size else 0.0
+    if not math.isfinite(top) or top <= 0:
+        return 0
+    return max(-60, min(60, SIG_DIGITS - 1 - math.floor(math.log10(top))))
+
+def _encode_block(cols, lo, hi, price_mode):
+    ts = cols["ts"][lo:hi]
+    n = hi - lo
+    deltas = np.diff(ts)
+    if n > 1 and (deltas == deltas[0]).all():
+        parts = [struct.pack("<Bqq", _TS_CONST, int(ts[0]), int(deltas[0]))]
+    else:
+        parts = [struct.pack("<Bq", _TS_DELTA, int(ts[0])), _shuffle(deltas.astype("<i8"))]
+    exp = 0
+    if price_mode == 1:
+        exp = _exponent(np.concatenate([cols[k][lo:hi] for k in PRICE_COLS]))
+        scale = 10.0 ** exp
+        for k in PRICE_COLS:
+            ints = np.rint(cols[k][lo:hi] * scale).astype("<i8")
+            parts.append(_shuffle(np.diff(ints, prepend=np.int64(0))))
+    else:
+        for k in PRICE_COLS:
+            parts.append(_shuffle(cols[k][lo:hi].astype("<f8")))
+    parts.append(_shuffle(cols["v"][lo:hi].astype("<f8")))
+    return b"".join(parts), exp
+
+def _decode_block(raw, n, price_mode, exp):
+    mode = raw[0]
+    if mode == _TS_CONST:
+        first, step = struct.unpack_from("<qq", raw, 1)
+        ts = first + step * np.arange(n, dtype=np.int64)
+        pos = 17
+    else:
+        (first,) = struct.unpack_from("<q", raw, 1)
+        deltas = _unshuffle(raw[9:9 + (n - 1) * 8], n - 1, "<i8")
+        ts = np.concatenate(([first], first + np.cumsum(deltas))).astype(np.int64)
+        pos = 9 + (n - 1) * 8
+    out = {"ts": ts}
+    for k in PRICE_COLS:
+        if price_mode == 1:
+            out[k] = np.cumsum(_unshuffle(raw[pos:pos + n * 8], n, "<i8")) / 10.0 ** exp
+        else:
+            out[k] = _unshuffle(raw[pos:pos + n * 8], n, "<f8")
+        pos += n * 8
+    out["v"] = _unshuffle(raw[pos:pos + n * 8], n, "<f8")
+    return out
+
+def to_columns(candles):
+    """Column arrays from dict candles, [ts,o,h,l,c,v] rows, or a dict of columns; sorted by ts"""
+    if isinstance(candles, dict):
+        cols = {k: np.asarray(candles[k]) for k in COLS}
+    elif candles and isinstance(candles[0], dict):
+        n = len(candles)
+        cols = {k: np.fromiter((c[k] for c in candles), dtype=np.float64, count=n) for k in COLS}
+    else:
+        arr = np.asarray(candles, dtype=np.float64).reshape(-1, 6)
+        cols = {k: arr[:, i] for i, k in enumerate(COLS)}
+    cols["ts"] = np.asarray(cols["ts"]).astype(np.int64)
+    for k in COLS[1:]:
+        cols[k] = np.asarray(cols[k], dtype=np.float64)
+    if len(cols["ts"]) > 1 and (np.diff(cols["ts"]) < 0).any():
+        order = np.argsort(cols["ts"], kind="stable")
+        cols = {k: v[order] for k, v in cols.items()}
+    return cols
+
+# --- Writing ---
+def write_archive(path, candles, codec="zlib", price_mode="float", block_rows=BLOCK_ROWS):
+    """Write candles (any to_columns input) to path atomically; returns the path"""
+    cols = to_columns(candles)
+    codec_id, mode_id = CODECS[codec], PRICE_MODES[price_mode]
+    n_rows = len(cols["ts"])
+    blocks = []
+    for lo in range(0, n_rows, block_rows):
+        hi = min(lo + block_rows, n_rows)
+        raw, exp = _encode_block(cols, lo, hi, mode_id)
+        blocks.append((int(cols["ts"][lo]), int(cols["ts"][hi - 1]), hi - lo, _compress(raw, codec_id), exp))
+
+    path = pathlib.Path(path)
+    offset = _HEADER.size + _ENTRY.size * len(blocks)
+    with atomic_write(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, codec_id, mode_id, 0, block_rows, len(blocks), n_rows))
+        for first, last, n, data, exp in blocks:
+            f.write(_ENTRY.pack(first, last, n, offset, len(data), exp))
+            offset += len(data)
+        for *_, data, _ in blocks:
+            f.write(data)
+    return path
+
+def merge_archive(path, candles, keep_from=None, **kwargs):
+    """Merge candles into the archive at path under its file lock; returns the merged columns.
+
+    Rows are unioned by ts (the newer write wins for a repeated ts) and, with keep_from,
+    trimmed to ts >= keep_from, so concurrent fetchers of one pool extend the file
+    instead of overwriting each other.
+    """
+    new = to_columns(candles)
+
+    def read(path):
+        try:
+            return read_arrays(path, start=keep_from)
+        except (OSError, ValueError, zlib.error, lzma.LZMAError):
+            return None  # unreadable archive: replace it
+
+    def merge(old):
+        cols = new if old is None else {k: np.concatenate([old[k], new[k]]) for k in COLS}
+        # last occurrence of each ts wins
+        ts = cols["ts"][::-1]
+        _, first = np.unique(ts, return_index=True)
+        keep = len(ts) - 1 - first
+        cols = {k: v[keep] for k, v in cols.items()}
+        if keep_from is not None:
+            mask = cols["ts"] >= keep_from
+            cols = {k: v[mask] for k, v in cols.items()}
+        return cols
+
+    return locked_update(path, read, merge, lambda path, cols: write_archive(path, cols, **kwargs))
+
+# --- Reading ---
+def read_index(path):
+    """Header fields plus the block index, without touching any block data"""
+    with open(path, "rb") as f:
+        return _read_index(f)
+
+def _read_index(f):
+    magic, version, codec, mode, _, block_rows, n_blocks, n_rows = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a candle archive (magic {magic!r}, version {version})")
+    raw = f.read(_ENTRY.size * n_blocks)
+    blocks = [dict(zip(("first_ts", "last_ts", "rows", "offset", "length", "exp"), _ENTRY.unpack_from(raw, i * _ENTRY.size)))
+              for i in range(n_blocks)]
+    return {"codec": codec, "price_mode": mode, "block_rows": block_rows, "rows": n_rows, "blocks": blocks}
+
+def span(path):
+    """(first_ts, last_ts, rows) from the index alone, or None for an empty archive"""
+    idx = read_index(path)
+    if not idx["blocks"]:
+        return None
+    return idx["blocks"][0]["first_ts"], idx["blocks"][-1]["last_ts"], idx["rows"]
+
+def read_arrays(path, start=None, end=None):
+    """Columns (ts, o, h, l, c, v numpy arrays) for start <= ts <= end; only overlapping blocks are read"""
+    parts = []
+    with open(path, "rb") as f:
+        idx = _read_index(f)
+        for b in idx["blocks"]:
+            if (start is not None and b["last_ts"] < start) or (end is not None and b["first_ts"] > end):
+                continue
+            f.seek(b["offset"])
+            raw = _decompress(f.read(b["length"]), idx["codec"])
+            parts.append(_decode_block(raw, b["rows"], idx["price_mode"], b["exp"]))
+    if not parts:
+        return {k: np.empty(0, dtype=np.int64 if k == "ts" else np.float64) for k in COLS}
+    cols = {k: np.concatenate([p[k] for p in parts]) for k in COLS} if len(parts) > 1 else parts[0]
+    if start is not None or end is not None:
+        lo = np.searchsorted(cols["ts"], start, "left") if start is not None else 0
+        hi = np.searchsorted(cols["ts"], end, "right") if end is not None else len(cols["ts"])
+        cols = {k: v[lo:hi] for k, v in cols.items()}
+    return cols
+
+def read_candles(path, start=None, end=None):
+    """Dict candles ({ts,o,h,l,c,v}), the format load_candles returns for cache CSVs"""
+    cols = read_arrays(path, start, end)
+    lists = [cols[k].tolist() for k in COLS]
+    return [{"ts": ts, "o": o, "h": h, "l": l, "c": c, "v": v} for ts, o, h, l, c, v in zip(*lists)]
+
+def read_rows(path, start=None, end=None):
+    """GeckoTerminal-style [ts, o, h, l, c, v] rows, as ai_strategy_finder caches them"""
+    cols = read_arrays(path, start, end)
+    return [list(r) for r in zip(*(cols[k].tolist() for k in COLS))]
+
+# --- Conversion ---
+def _load_any(path):
+    path = pathlib.Path(path)
+    if path.suffix == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    from single_trade_from_cache import load_candles
+    return load_candles(path)
+
+def pack(path, codec="zlib", price_mode="float", keep=True):
+    """Convert a cache CSV or OHLCV JSON to a .tbc next to it; returns (archive path, old bytes, new bytes)"""
+    path = pathlib.Path(path)
+    out = write_archive(path.with_suffix(EXT), _load_any(path), codec, price_mode)
+    sizes = (path.stat().st_size, out.stat().st_size)
+    if not keep:
+        path.unlink()
+    return out, *sizes
+
+def main():
+    p = argparse.ArgumentParser(description="Pack cache CSV / OHLCV JSON files into .tbc candle archives, or inspect one")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    pk = sub.add_parser("pack", help="Convert files (or every .csv/.json in a directory) to .tbc")
+    pk.add_argument("paths", nargs="+")
+    pk.add_argument("--codec", choices=list(CODECS), default="zlib")
+    pk.add_argument("--prices", choices=list(PRICE_MODES), default="float",
+                    help="float = lossless float64, scaled = int64 deltas at ~10 significant digits")
+    pk.add_argument("--delete", action="store_true", help="Remove the source file after packing")
+    info = sub.add_parser("info", help="Print an archive's header and block index")
+    info.add_argument("path")
+    for sp in (pk, info):
+        profiling.add_profile_args(sp)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+
+    if args.cmd == "info":
+        idx = read_index(args.path)
+        codec = {v: k for k, v in CODECS.items()}[idx["codec"]]
+        mode = {v: k for k, v in PRICE_MODES.items()}[idx["price_mode"]]
+        print(f"{args.path}: {idx['rows']} rows in {len(idx['blocks'])} blocks ({codec}, {mode} prices)")
+        for b in idx["blocks"]:
+            print(f"  {b['first_ts']}..{b['last_ts']}  rows={b['rows']}  bytes={b['length']}")
+        return
+
+    files = []
+    for path in map(pathlib.Path, args.paths):
+        files += sorted(q for q in path.iterdir() if q.suffix in (".csv", ".json")) if path.is_dir() else [path]
+    before = after = 0
+    for path in files:
+        try:
+            with profiling.span("pack"):
+                out, old, new = pack(path, args.codec, args.prices, keep=not args.delete)
+        except Exception as e:
+            print(f"skip {path.name}: {e}", file=sys.stderr)
+            continue
+        before += old
+        after += new
+        print(f"{path.name} -> {out.name}  {old:,} -> {new:,} bytes")
+    if before:
+        print(f"{len(files)} files: {before:,} -> {after:,} bytes ({after / before * 100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
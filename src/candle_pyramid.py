@@ -0,0 +1,72 @@
+# src/candle_pyramid.py — coarse bar pyramid (5m/15m/1h) over 1m candles for span skipping
+from bisect import bisect_right
+
+from range_stats import RangeStats
+
+# Bars per coarse block, largest first (1h, 15m, 5m of 1m candles)
+BLOCK_SIZES = (60, 15, 5)
+MAX_CACHED = 256
+
+_CACHE = {}
+
+class CandlePyramid:
+    """High/low of every k-bar block of an ascending 1m candle series.
+
+    Blocks are counted in bars from the start of the series (not clock-aligned),
+    so gaps in illiquid pools never split a block. A simulator can ask whether a
+    whole block can be skipped and only touch 1m bars inside blocks that may trigger.
+    """
+    __slots__ = ("ts", "n", "block_sizes", "levels", "_highs", "_stats")
+
+    def __init__(self, candles, block_sizes=BLOCK_SIZES):
+        self.ts = [c["ts"] for c in candles]
+        self.n = len(candles)
+        for a, b in zip(self.ts, self.ts[1:]):
+            if b < a:
+                raise ValueError("candles must be ascending by ts")
+
+        highs = [c["h"] for c in candles]
+        lows = [c["l"] for c in candles]
+        self._highs, self._stats = highs, None
+        self.block_sizes = tuple(sorted(block_sizes, reverse=True))
+        self.levels = {}
+        # Build each level from the next finer one when sizes nest (5 -> 15 -> 60)
+        src_k, src_h, src_l = 1, highs, lows
+        for k in sorted(self.block_sizes):
+            if k % src_k:
+                src_k, src_h, src_l = 1, highs, lows
+            step = k // src_k
+            h = [max(src_h[i:i + step]) for i in range(0, len(src_h), step)]
+            l = [min(src_l[i:i + step]) for i in range(0, len(src_l), step)]
+            self.levels[k] = (h, l)
+            src_k, src_h, src_l = k, h, l
+
+    def first_after(self, ts):
+        """Index of the first bar strictly after ts"""
+        return bisect_right(self.ts, ts)
+
+    @property
+    def stats(self):
+        """RangeStats of this series (O(1) window max, suffix max), built on first use"""
+        if self._stats is None:
+            self._stats = RangeStats(self._highs)
+        return self._stats
+
+    def max_high(self, candles, start, end):
+        """Max high over bars [start, end) (-inf for an empty range)"""
+        if start >= end:
+            return float("-inf")
+        if end == self.n:
+            return self.stats.suffix_high[start]
+        return self.stats.max_high(start, end)
+
+def get_pyramid(key, candles):
+    """Return the cached pyramid for a series, building it on first use"""
+    p = _CACHE.get(key)
+    if p is not None and p.n == len(candles):
+        return p
+    if len(_CACHE) >= MAX_CACHED:
+        _CACHE.pop(next(iter(_CACHE)))
+    p = CandlePyramid(candles)
+    _CACHE[key] = p
+    return p
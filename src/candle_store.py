@@ -0,0 +1,193 @@
+# src/candle_store.py — process-resident pool / candle / token-name cache shared by long-running services
+import csv, pathlib, threading, time
+from contextlib import contextmanager
+
+import profiling
+import cache_manager
+from atomic_io import atomic_write
+from candle_pyramid import CandlePyramid
+from signal_utils import NET_MAP
+
+CACHEDIR = pathlib.Path(__file__).resolve().parent.parent / "cache"
+MAX_SERIES = 2048
+
+class CandleStore:
+    """Keep resolved pools, 1m candle series and token names in memory.
+
+    Lookups fall through memory -> cache/ CSV (same file names as the cached optimizer)
+    -> GeckoTerminal. A per-key lock makes concurrent requests for the same signal
+    share one fetch instead of racing to the API.
+    """
+    def __init__(self, cachedir=CACHEDIR, max_series=MAX_SERIES):
+        self.cachedir = pathlib.Path(cachedir)
+        self.max_series = max_series
+        self.pools = {}
+        self.names = {}
+        self.series = {}
+        self.hits = self.misses = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Hold the per-key lock for a load.
+
+        The lock is only needed while a load is in flight, so it is dropped on the way out
+        (also when the load raises) and _key_locks only ever holds keys being loaded.
+        Waiters that already hold a reference re-check the cache once they get it.
+        """
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                if self._key_locks.get(key) is lock:
+                    del self._key_locks[key]
+
+    def _put_series(self, key, entry):
+        """Store a series (evicting the oldest at capacity); call with self._lock held"""
+        if key not in self.series and len(self.series) >= self.max_series:
+            del self.series[next(iter(self.series))]
+        self.series[key] = entry
+
+    # --- Pools / names ---
+    def pool(self, chain, token):
+        key = (chain, token)
+        if key in self.pools:
+            return self.pools[key]
+        with self._key_lock(("pool",) + key):
+            if key not in self.pools:
+                from fetch_and_cache_candles import get_top_pool
+                self.pools[key] = get_top_pool(NET_MAP[chain], token)
+        return self.pools[key]
+
+    def coin_name(self, chain, token):
+        key = (chain, token)
+        if key in self.names:
+            return self.names[key]
+        from fetch_and_cache_candles import http_get
+        try:
+            url = f"https://api.geckoterminal.com/api/v2/networks/{NET_MAP[chain]}/tokens/{token}"
+            with profiling.span("coin_name"):
+                name = http_get(url)["data"]["attributes"].get("name") or token[:6]
+        except Exception:
+            return token[:6]  # not cached, so a transient failure is retried next time
+        self.names[key] = name
+        return name
+
+    # --- Candles ---
+    def cache_file(self, chain, token, time_str):
+        return self.cachedir / f"{chain}_{token[:8]}_{time_str.replace(':', '')}.csv"
+
+    def candles(self, chain, token, time_str, unix, fetch=True):
+        """(candles, pyramid) for one signal, or (None, None) if unavailable"""
+        key = (chain, token, unix)
+        with self._lock:
+            hit = self.series.get(key)
+            if hit is not None:
+                self.hits += 1
+        if hit is not None:
+            profiling.count("store_hit")
+            return hit
+        with self._key_lock(("series",) + key):
+            with self._lock:
+                hit = self.series.get(key)
+                if hit is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if hit is not None:
+                return hit
+            profiling.count("store_miss")
+            candles = self._load(chain, token, time_str, unix, fetch)
+            if not candles:
+                return None, None
+            candles.sort(key=lambda c: c["ts"])
+            with profiling.span("pyramid"):
+                entry = (candles, CandlePyramid(candles))
+            with self._lock:
+                self._put_series(key, entry)
+            return entry
+
+    def _load(self, chain, token, time_str, unix, fetch):
+        from single_trade_from_cache import find_series, load_candles
+        path = find_series(self.cache_file(chain, token, time_str)) if time_str else None
+        if path is not None:
+            cache_manager.touch(path)
+            with profiling.span("load_candles"):
+                return load_candles(path)
+        if time_str:
+            cache_manager.miss("candles")
+        if not fetch:
+            return None
+        from fetch_and_cache_candles import fetch_gt_candles
+        pool = self.pool(chain, token)
+        return fetch_gt_candles(NET_MAP[chain], pool, start_unix=unix, signal_unix=unix)
+
+    def complete(self, chain, token, time_str, unix):
+        """(candles, pyramid) with a resident partial series extended to its full signal window.
+
+        Only the missing tail [last ts + 60, window end] is downloaded and merged in; without a
+        resident series this is candles().
+        """
+        from fetch_and_cache_candles import fetch_gt_range, signal_window
+        key = (chain, token, unix)
+        with self._key_lock(("series",) + key):
+            entry = self.series.get(key)
+            if entry is not None:
+                candles = entry[0]
+                last = candles[-1]["ts"]
+                _, end = signal_window(unix)
+                if last + 60 <= end:
+                    with profiling.span("tail_fetch"):
+                        tail = [c for c in fetch_gt_range(NET_MAP[chain], self.pool(chain, token), last + 60, end)
+                                if c["ts"] > last]
+                    profiling.count("store_tail_candles", len(tail))
+                    if tail:
+                        candles = candles + tail
+                        with profiling.span("pyramid"):
+                            entry = (candles, CandlePyramid(candles))
+                        with self._lock:
+                            self._put_series(key, entry)
+                return entry
+        return self.candles(chain, token, time_str, unix)
+
+    def save(self, chain, token, time_str, candles):
+        """Write a series to cache/ so the cached optimizer and batch tools pick it up"""
+        path = self.cache_file(chain, token, time_str)
+        with atomic_write(path, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=["ts", "o", "h", "l", "c", "v"], extrasaction="ignore")
+            w.writeheader()
+            w.writerows(candles)
+        cache_manager.touch(path, hit=False)
+        return path
+
+    def forget(self, chain, token, unix):
+        with self._lock:
+            self.series.pop((chain, token, unix), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "series": len(self.series),
+                "candles": sum(len(c) for c, _ in self.series.values()),
+                "pools": len(self.pools),
+                "names": len(self.names),
+                "hits": self.hits,
+                "misses": self.misses,
+                "uptime": round(time.time() - self.started, 1),
+            }
+
+_STORE = None
+
+def get_store():
+    """The process-wide store (created on first use)"""
+    global _STORE
+    if _STORE is None:
+        _STORE = CandleStore()
+    return _STORE
@@ -0,0 +1,134 @@
+# src/chart_data.py — chart data layer: LTTB / OHLC bucketing to a point budget + figures cached by input hash
+import hashlib, json
+from collections import OrderedDict
+
+import numpy as np
+
+LINE_POINTS = 2000
+OHLC_BARS = 600
+SCATTER_POINTS = 5000
+MAX_FIGURES = 32
+
+# --- Downsampling ---
+def lttb(x, y, threshold=LINE_POINTS):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the line's shape.
+
+    First and last points are always kept; every bucket in between contributes the point
+    forming the largest triangle with the previous pick and the next bucket's average.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # threshold-2 inner buckets
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else x[-1]
+        avg_y = y[nxt_lo:nxt_hi].mean() if nxt_hi > nxt_lo else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area)) if hi > lo else lo
+        keep[b + 1] = a
+    return keep
+
+def ohlc_buckets(candles, target=OHLC_BARS):
+    """Merge consecutive candles into at most `target` bars (first open, max high, min low, last close, sum volume)"""
+    n = len(candles)
+    if n <= target:
+        return list(candles)
+    ts = np.fromiter((c["ts"] for c in candles), dtype=np.int64, count=n)
+    o, h, l, c, v = (np.fromiter((r[k] for r in candles), dtype=np.float64, count=n) for k in "ohlcv")
+    starts = np.linspace(0, n, target, endpoint=False).astype(np.int64)
+    ends = np.append(starts[1:], n) - 1
+    highs, lows, vols = np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), np.add.reduceat(v, starts)
+    return [{"ts": int(ts[s]), "o": float(o[s]), "h": float(hi), "l": float(lo), "c": float(c[e]), "v": float(vol)}
+            for s, e, hi, lo, vol in zip(starts, ends, highs, lows, vols)]
+
+def thin_scatter(x, y, target=SCATTER_POINTS, keep=()):
+    """Indices of at most ~target points: one per occupied cell of a sqrt(target)^2 grid, plus `keep`.
+
+    Outliers and sparse regions survive (they own their cells); dense clouds collapse.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= target:
+        return np.arange(n)
+    side = max(1, int(np.sqrt(target)))
+    def cells(v):
+        finite = np.isfinite(v)
+        lo, hi = (v[finite].min(), v[finite].max()) if finite.any() else (0.0, 1.0)
+        span = hi - lo if hi > lo else 1.0
+        return np.clip(((np.nan_to_num(v, nan=lo, posinf=hi, neginf=lo) - lo) / span * side).astype(np.int64), 0, side - 1)
+    cell = cells(x) * side + cells(y)
+    _, first = np.unique(cell, return_index=True)
+    return np.union1d(first, np.asarray(list(keep), dtype=np.int64))
+
+# --- Figure cache ---
+def data_hash(*parts):
+    """Stable digest of chart inputs (arrays, lists of dicts, scalars)"""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        if isinstance(p, np.ndarray):
+            h.update(p.tobytes())
+        else:
+            h.update(json.dumps(p, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"|")
+    return h.hexdigest()
+
+_FIGURES = OrderedDict()
+
+def cached_figure(key, build):
+    """Return the figure for key, calling build() only on a miss (LRU of MAX_FIGURES)"""
+    fig = _FIGURES.get(key)
+    if fig is not None:
+        _FIGURES.move_to_end(key)
+        return fig
+    fig = build()
+    _FIGURES[key] = fig
+    if len(_FIGURES) > MAX_FIGURES:
+        _FIGURES.popitem(last=False)
+    return fig
+
+# --- Figures (plotly is imported only when a figure is actually built) ---
+def candle_figure(candles, title="", target=OHLC_BARS):
+    def build():
+        import plotly.graph_objects as go
+        bars = ohlc_buckets(candles, target)
+        fig = go.Figure(go.Candlestick(
+            x=[b["ts"] * 1000 for b in bars], open=[b["o"] for b in bars], high=[b["h"] for b in bars],
+            low=[b["l"] for b in bars], close=[b["c"] for b in bars]))
+        fig.update_layout(title=title, xaxis_type="date", xaxis_rangeslider_visible=False, height=420)
+        return fig
+    return cached_figure(("candles", title, target, data_hash(candles)), build)
+
+def line_figure(x, y, title="", x_title="", y_title="", target=LINE_POINTS):
+    def build():
+        import plotly.graph_objects as go
+        xs, ys = np.asarray(x), np.asarray(y, dtype=np.float64)
+        idx = lttb(np.arange(len(ys)) if xs.dtype.kind not in "iuf" else xs, ys, target)
+        fig = go.Figure(go.Scatter(x=xs[idx], y=ys[idx], mode="lines"))
+        fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, height=360)
+        return fig
+    return cached_figure(("line", title, target, data_hash(list(x), list(y))), build)
+
+def strategy_scatter(strategy_results, x="win_rate", y="total_pnl", title="", target=SCATTER_POINTS, highlight=10):
+    """Scatter of strategy metrics thinned to `target` points; the top `highlight` rows are always drawn"""
+    def build():
+        import plotly.graph_objects as go
+        xs = np.array([float(r.get(x) or 0) for r in strategy_results])
+        ys = np.array([float(r.get(y) or 0) for r in strategy_results])
+        ids = [str(r.get("strategy_id", i)) for i, r in enumerate(strategy_results)]
+        idx = thin_scatter(xs, ys, target, keep=range(min(highlight, len(strategy_results))))
+        fig = go.Figure(go.Scattergl(x=xs[idx], y=ys[idx], mode="markers", text=[ids[i] for i in idx],
+                                     marker=dict(size=6, opacity=0.6)))
+        fig.update_layout(title=f"{title} ({len(idx)} of {len(strategy_results)} shown)" if title else None,
+                          xaxis_title=x, yaxis_title=y, height=420)
+        return fig
+    key = ("scatter", x, y, title, target, highlight,
+           data_hash([[r.get("strategy_id"), r.get(x), r.get(y)] for r in strategy_results]))
+    return cached_figure(key, build)
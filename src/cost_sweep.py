@@ -0,0 +1,106 @@
+# src/cost_sweep.py — sweep slippage/fee scenarios over a strategy grid without re-simulating per scenario
+#
+# In simulate_trade_record only slippage moves the path (it shifts the entry and with it the
+# TP/SL levels, and scales every exit fill); the USD fee is linear:
+#   pnl = (invest - fee) * exit_price / entry_price - fee - invest
+# So each (strategy, signal) is simulated once per distinct slippage with fee=0, keeping the
+# exit/entry ratio, and every fee is applied to those ratios by numpy broadcasting.
+import itertools
+
+import numpy as np
+
+from single_trade_from_cache import simulate_trade_record
+from trade_results import ExitReason
+import profiling
+
+GRID_KEYS = ("slip", "fee")
+
+def parse_cost_grid(spec):
+    """'slip=0.01,0.03;fee=0.5,1,2' -> [{'slip': 0.01, 'fee': 0.5}, ...] (cartesian product)"""
+    values = {"slip": [0.03], "fee": [1.0]}    # simulate_trade_record defaults
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        key, _, vals = part.partition("=")
+        key = key.strip().lower()
+        if key not in GRID_KEYS or not vals.strip():
+            raise ValueError(f"bad cost grid entry {part!r} (expected e.g. slip=0.01,0.03;fee=0.5,1)")
+        values[key] = [float(v) for v in vals.split(",") if v.strip()]
+    return [dict(zip(GRID_KEYS, combo)) for combo in itertools.product(*(values[k] for k in GRID_KEYS))]
+
+def path_ratios(prepared, tp, sl, tsl, slip):
+    """exit_price / entry_price per signal at this slippage (NaN where there was no entry)"""
+    ratios = np.full(len(prepared), np.nan)
+    for i, (_, _, unix, entry_mc, candles, pyramid) in enumerate(prepared):
+        rec = simulate_trade_record(candles, unix, tp=tp, sl=sl, tsl=tsl, slip=slip, fee=0.0,
+                                    entry_mc=entry_mc, pyramid=pyramid)
+        if rec.reason != ExitReason.NO_ENTRY:
+            ratios[i] = rec.exit_price / rec.entry_price
+    return ratios
+
+def fee_metrics(ratios, fees, invest_usd=100):
+    """Score-relevant metrics (as in ResultBatch.metrics) for every fee at once: {key: array[len(fees)]}"""
+    fees = np.asarray(fees, dtype=float)[:, None]
+    entered = ~np.isnan(ratios)
+    pnl = np.where(entered, (invest_usd - fees) * np.nan_to_num(ratios) - fees - invest_usd, 0.0)
+    n = pnl.shape[1]
+    wins = np.where(pnl > 0, pnl, 0.0).sum(axis=1)
+    losses = -np.where(pnl < 0, pnl, 0.0).sum(axis=1)
+    returns = pnl[:, entered] / invest_usd * 100
+    if returns.shape[1] > 1:
+        std = returns.std(axis=1, ddof=1)
+        sharpe = np.divide(returns.mean(axis=1), std, out=np.zeros_like(std), where=std > 0)
+    else:
+        sharpe = np.zeros(len(fees))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(losses > 0, wins / losses, np.inf)
+    return {
+        "total_trades": np.full(len(fees), n),
+        "winning_trades": (pnl > 0).sum(axis=1),
+        "losing_trades": (pnl < 0).sum(axis=1),
+        "win_rate": (pnl > 0).sum(axis=1) / n * 100,
+        "total_pnl": pnl.sum(axis=1),
+        "avg_pnl": pnl.mean(axis=1),
+        "avg_return": returns.mean(axis=1) if returns.shape[1] else np.zeros(len(fees)),
+        "profit_factor": profit_factor,
+        "sharpe_ratio": sharpe,
+    }
+
+def sweep_costs(prepared, combinations, scenarios, score, invest_usd=100):
+    """One metrics row per (strategy, cost scenario), scored with `score`.
+
+    prepared is strategy_optimizer_cached.prepare_signals output. Simulations run once per
+    (strategy, signal, distinct slippage); fees are broadcast.
+    """
+    by_slip = {}
+    for k, s in enumerate(scenarios):
+        by_slip.setdefault(s["slip"], []).append(k)
+    rows = []
+    for tp, sl, tsl in combinations:
+        for slip, idxs in by_slip.items():
+            with profiling.span("simulate"):
+                ratios = path_ratios(prepared, tp, sl, tsl, slip)
+            with profiling.span("metrics"):
+                metrics = fee_metrics(ratios, [scenarios[k]["fee"] for k in idxs], invest_usd)
+            for j, k in enumerate(idxs):
+                row = {"tp": tp, "sl": sl, "tsl": tsl, "strategy_id": f"TP{tp}_SL{sl}_TSL{tsl}", **scenarios[k]}
+                row.update({key: v[j].item() for key, v in metrics.items()})
+                row["score"] = score(row)
+                rows.append(row)
+    if profiling.enabled():
+        profiling.count("cost_scenarios", len(scenarios))
+        profiling.count("cost_paths", len(by_slip) * len(combinations))
+    return rows
+
+def robustness(rows):
+    """Per strategy across scenarios: worst/median score and worst/best total PnL, sorted by worst score"""
+    by_id = {}
+    for r in rows:
+        by_id.setdefault(r["strategy_id"], []).append(r)
+    out = []
+    for sid, rs in by_id.items():
+        scores = [r["score"] for r in rs]
+        pnls = [r["total_pnl"] for r in rs]
+        out.append({"strategy_id": sid, "tp": rs[0]["tp"], "sl": rs[0]["sl"], "tsl": rs[0]["tsl"],
+                    "scenarios": len(rs), "worst_score": min(scores), "median_score": float(np.median(scores)),
+                    "worst_pnl": min(pnls), "best_pnl": max(pnls)})
+    out.sort(key=lambda r: r["worst_score"], reverse=True)
+    return out
@@ -1,6 +1,13 @@
 import os, json, csv, argparse, datetime as dt, urllib.request
 from pathlib import Path
 
+import profiling
+from atomic_io import atomic_write
+from singleflight import HTTP, freeze
+from gt_history import fetch_ohlcv_range, GT_LIMITER
+
+GT_HOST = "https://api.geckoterminal.com/"
+
 # --- .env loader ---
 def _load_dotenv():
     for candidate in [Path(__file__).resolve().parent.parent / ".env", Path(__file__).resolve().parent / ".env"]:
@@ -12,16 +19,28 @@ def _load_dotenv():
                         os.environ.setdefault(k, v.strip().strip('"').strip("'"))
 _load_dotenv()
 
-def http_get(url, headers=None):
-    req = urllib.request.Request(url, headers=headers or {"User-Agent":"Mozilla/5.0 (Backtester)"})
-    with urllib.request.urlopen(req, timeout=20) as r:
-        return json.loads(r.read().decode("utf-8"))
+def http_get(url, headers=None, ttl=None):
+    """GET JSON; concurrent identical requests share one call, results cached briefly (see singleflight).
+
+    Only requests that actually go out take a slot from the shared GeckoTerminal limiter;
+    cached and coalesced ones return without waiting.
+    """
+    def fetch():
+        if url.startswith(GT_HOST):
+            GT_LIMITER.wait()
+        profiling.count("http_requests")
+        with profiling.span("http_get"):
+            req = urllib.request.Request(url, headers=headers or {"User-Agent":"Mozilla/5.0 (Backtester)"})
+            with urllib.request.urlopen(req, timeout=20) as r:
+                return json.loads(r.read().decode("utf-8"))
+    return HTTP.do(("GET", url, freeze(headers)), fetch, ttl)
 
 # --- step 1: find top pool for token ---
 def get_top_pool(network, token):
     base = "https://api.geckoterminal.com/api/v2"
     url = f"{base}/networks/{network}/tokens/{token}/pools"
-    data = http_get(url)
+    with profiling.span("pool_detect"):
+        data = http_get(url)
     pools = data.get("data") or []
     if not pools:
         raise RuntimeError(f"No pools found for {token} on {network}")
@@ -30,45 +49,39 @@ def get_top_pool(network, token):
     return attrs.get("address") or chosen.get("id")
 
 # --- step 2: fetch OHLCV from pool with smart caching ---
-def fetch_gt_candles(network, pool, start_unix=None, signal_unix=None):
+def fetch_gt_range(network, pool, start_unix, end_unix):
+    """1m candles (dicts) for [start_unix, end_unix], oldest→newest"""
     base = "https://api.geckoterminal.com/api/v2"
-    now_unix = int(dt.datetime.now(dt.timezone.utc).timestamp())
-    results = []
-    before = now_unix
 
-    # Smart caching: if signal_unix provided, cache around signal time
-    if signal_unix:
-        # Cache 30 minutes after signal time only (no before data needed)
-        cache_start = signal_unix  # Start exactly at signal time
-        cache_end = signal_unix + (30 * 60)   # 30 minutes after
-    else:
-        # Default: cache last 48 hours
-        cache_start = now_unix - (48 * 3600)
-        cache_end = now_unix
-
-    while True:
-        url = f"{base}/networks/{network}/pools/{pool}/ohlcv/minute?aggregate=1&before_timestamp={before}&limit=100"
+    def get_page(before, limit):
+        url = f"{base}/networks/{network}/pools/{pool}/ohlcv/minute?aggregate=1&before_timestamp={before}&limit={limit}"
         data = http_get(url)
-        ohlcv = (data.get("data", {}).get("attributes", {}).get("ohlcv_list", []) or [])
-        if not ohlcv:
-            break
+        return data.get("data", {}).get("attributes", {}).get("ohlcv_list", []) or []
 
-        chunk = [{"ts": r[0], "o": r[1], "h": r[2], "l": r[3], "c": r[4], "v": r[5]} for r in ohlcv]
-        results.extend(chunk)
+    # Only the windows covering [start_unix, end_unix] are requested, concurrently
+    with profiling.span("ohlcv_fetch"):
+        rows = fetch_ohlcv_range(get_page, start_unix, end_unix)
+    return [{"ts": r[0], "o": r[1], "h": r[2], "l": r[3], "c": r[4], "v": r[5]} for r in rows]
 
-        before = chunk[-1]["ts"] - 60
-        if before <= cache_start:
-            break
+def signal_window(signal_unix=None, now_unix=None):
+    """[start, end] that fetch_gt_candles caches for a signal (or the last 48h without one)"""
+    now_unix = now_unix or int(dt.datetime.now(dt.timezone.utc).timestamp())
+    if signal_unix:
+        # Cache 30 minutes after signal time only (no before data needed)
+        return signal_unix, min(signal_unix + (30 * 60), now_unix)
+    # Default: cache last 48 hours
+    return now_unix - (48 * 3600), now_unix
+
+def fetch_gt_candles(network, pool, start_unix=None, signal_unix=None):
+    # Smart caching: if signal_unix provided, cache around signal time
+    cache_start, cache_end = signal_window(signal_unix)
+    results = fetch_gt_range(network, pool, cache_start, cache_end)
 
-    # Filter to cache window
-    results = [c for c in results if cache_start <= c["ts"] <= cache_end]
-    
     # Keep only candles after start_unix if given
     if start_unix:
         results = [c for c in results if c["ts"] >= start_unix]
 
-    # results are newest→oldest, reverse them
-    results.reverse()
+    # stitched rows are already oldest→newest
     return results
 
 
@@ -79,17 +92,19 @@ def fetch_be_price(chain, token):
     url = f"https://public-api.birdeye.so/defi/price?address={token}"
     headers = {"x-chain":chain,"X-API-KEY":key}
     try:
-        data = http_get(url, headers=headers)
+        data = http_get(url, headers=headers, ttl=0)  # live price: coalesce, never reuse
         return data.get("data",{}).get("value")
     except Exception:
         return None
 
-if __name__ == "__main__":
+def main():
     p = argparse.ArgumentParser()
     p.add_argument("--chain", choices=["SOL","ETH","BNB"], required=True)
     p.add_argument("--token", required=True)
     p.add_argument("--time", required=True, help="Call time PKT HH:MM (last 24h)")
+    profiling.add_profile_args(p)
     args = p.parse_args()
+    profiling.start_from_args(args)
 
     PKT = dt.timezone(dt.timedelta(hours=5))
     now_utc = dt.datetime.now(dt.timezone.utc)
@@ -119,8 +134,11 @@ if __name__ == "__main__":
     outdir = Path(__file__).resolve().parent.parent / "out"
     outdir.mkdir(exist_ok=True)
     outfile = outdir / f"{args.chain}_{args.token[:6]}_{cand_pkt.strftime('%Y%m%d')}.csv"
-    with open(outfile,"w",newline="") as f:
+    with profiling.span("csv_write"), atomic_write(outfile, "w", newline="") as f:
         w = csv.DictWriter(f, fieldnames=["ts","o","h","l","c","v"])
         w.writeheader()
         for r in candles: w.writerow(r)
     print(f"Saved {len(candles)} candles -> {outfile}")
+
+if __name__ == "__main__":
+    main()
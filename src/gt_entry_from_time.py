@@ -3,11 +3,15 @@ import sys, time
 from datetime import datetime, timezone, timedelta
 import httpx
 
+import profiling
+
 BASE = "https://api.geckoterminal.com/api/v2"
 NETWORKS = ["solana","bsc","eth","base"]  # priority order
 
 def get(url, params=None):
-    r = httpx.get(url, params=params, headers={"accept":"application/json"}, timeout=25)
+    profiling.count("http_requests")
+    with profiling.span("http_get"):
+        r = httpx.get(url, params=params, headers={"accept":"application/json"}, timeout=25)
     r.raise_for_status()
     return r.json()
 
@@ -34,6 +38,7 @@ def fetch_ohlcv_1m_last_48h(network: str, pool: str):
         attrs = (j.get("data") or {}).get("attributes") or {}
         part = attrs.get("ohlcv_list") or []
         if not part: break
+        profiling.count("ohlcv_pages")
         lst.extend(part)
         # part is in ascending order. Move 'before' to the oldest ts in the batch.
         oldest_ts = int(part[0][0])
@@ -41,7 +46,7 @@ def fetch_ohlcv_1m_last_48h(network: str, pool: str):
         if oldest_ts <= cutoff:
             break
         # be polite on rate limits
-        time.sleep(0.3)
+        profiling.sleep(0.3)
     # We accumulated from newer→older batches; ensure overall ascending by ts
     lst.sort(key=lambda r: int(r[0]))
     # Keep only last 48h
@@ -64,6 +69,7 @@ def find_most_recent_minute(candles, hh:int, mm:int):
     return target
 
 def main():
+    profiling.start_from_argv()
     if len(sys.argv) < 3:
         print("Usage: python src/gt_entry_from_time.py <mint_address> <HH:MM-UTC>")
         sys.exit(1)
@@ -78,18 +84,21 @@ def main():
 
     print(f"Mint: {mint} | Time (UTC): {hh:02d}:{mm:02d}")
 
-    net, pool = find_pools_for_token(mint)
+    with profiling.span("pool_detect"):
+        net, pool = find_pools_for_token(mint)
     if not pool:
         print("Could not find a pool for this mint in networks:", NETWORKS)
         sys.exit(2)
     print(f"Detected network: {net} | First pool: {pool}")
 
-    candles = fetch_ohlcv_1m_last_48h(net, pool)
+    with profiling.span("ohlcv_fetch"):
+        candles = fetch_ohlcv_1m_last_48h(net, pool)
     if not candles:
         print("No candles in last 48h.")
         sys.exit(3)
 
-    target_ts = find_most_recent_minute(candles, hh, mm)
+    with profiling.span("entry_match"):
+        target_ts = find_most_recent_minute(candles, hh, mm)
     if not target_ts:
         print("No candle found at that HH:MM within last 48h.")
         # Print a nearby sample
@@ -1,11 +1,15 @@
 # src/gt_find_pools.py
 import sys, httpx, json
 
+import profiling
+
 BASE = "https://api.geckoterminal.com/api/v2"
 NETWORKS = ["solana", "bsc", "eth", "base"]  # try in this priority
 
 def get(url, params=None):
-    r = httpx.get(url, params=params, headers={"accept": "application/json"}, timeout=20)
+    profiling.count("http_requests")
+    with profiling.span("http_get"):
+        r = httpx.get(url, params=params, headers={"accept": "application/json"}, timeout=20)
     try:
         r.raise_for_status()
     except httpx.HTTPStatusError as e:
@@ -42,11 +46,13 @@ def pretty_token(included, rel_key):
     return "?"
 
 def main():
+    profiling.start_from_argv()
     if len(sys.argv) < 2:
         print("Usage: python src/gt_find_pools.py <mint_address>")
         sys.exit(1)
     mint = sys.argv[1].strip()
-    net, pools, included = find_pools_for_token(mint)
+    with profiling.span("pool_detect"):
+        net, pools, included = find_pools_for_token(mint)
     if not pools:
         print("No pools found for:", mint)
         sys.exit(2)
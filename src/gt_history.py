@@ -0,0 +1,95 @@
+# src/gt_history.py — concurrent windowed OHLCV history download for GeckoTerminal
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+
+PAGE_LIMIT = 1000        # max candles GT returns per ohlcv request
+DEFAULT_WORKERS = 4
+
+class RateLimiter:
+    """Thread-safe minimum spacing between requests (shared by all workers)"""
+    def __init__(self, min_interval=0.25):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            profiling.observe("rate_limit_wait_s", slot - now)
+            profiling.sleep(slot - now)
+
+# One limiter per process so concurrent fetchers share the GT budget
+GT_LIMITER = RateLimiter(0.25)
+
+def fan_out(fn, items, workers=DEFAULT_WORKERS, limiter=None):
+    """[fn(x) for x in items] on a bounded thread pool, results in input order.
+
+    fn is expected to pace its own requests (fetch_and_cache_candles.http_get waits on
+    GT_LIMITER for every request it sends); pass `limiter` to take one slot per item
+    instead. workers <= 1 runs inline. The first exception is re-raised.
+    """
+    items = list(items)
+
+    def one(x):
+        if limiter:
+            limiter.wait()
+        return fn(x)
+
+    if workers <= 1 or len(items) <= 1:
+        return [one(x) for x in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as ex:
+        return list(ex.map(one, items))
+
+def plan_windows(start_unix, end_unix, limit=PAGE_LIMIT, step=60):
+    """Split [start, end] into before_timestamp windows of at most `limit` candles"""
+    span = limit * step
+    windows = []
+    before = int(end_unix) + step
+    while before > start_unix:
+        windows.append(before)
+        before -= span
+    return windows
+
+def stitch(pages, start_unix=None, end_unix=None):
+    """Merge pages of [ts,o,h,l,c,v] rows: dedupe by ts, ascending, clipped to range"""
+    by_ts = {}
+    for page in pages:
+        for r in page:
+            by_ts[int(r[0])] = r
+    rows = [by_ts[ts] for ts in sorted(by_ts)]
+    if start_unix is not None:
+        rows = [r for r in rows if int(r[0]) >= start_unix]
+    if end_unix is not None:
+        rows = [r for r in rows if int(r[0]) <= end_unix]
+    return rows
+
+def fetch_ohlcv_range(get_page, start_unix, end_unix, limit=PAGE_LIMIT, workers=DEFAULT_WORKERS, limiter=None):
+    """Fetch 1m candles for [start, end] by requesting fixed windows concurrently.
+
+    get_page(before_timestamp, limit) must return a list of [ts,o,h,l,c,v] rows older
+    than before_timestamp. A window never holds more than `limit` minutes, so every
+    candle in it comes back in one page even when the pool has gaps; pages may overlap
+    and are deduplicated when stitched. get_page paces its own requests (its HTTP helper
+    waits on GT_LIMITER only when a page really goes out, not for cached or coalesced
+    ones); pass `limiter` to take a slot per window instead.
+    """
+    limit = max(1, min(limit, (int(end_unix) - int(start_unix)) // 60 + 2))
+    windows = plan_windows(start_unix, end_unix, limit)
+
+    def one(before):
+        if limiter:
+            limiter.wait()
+        profiling.count("ohlcv_pages")
+        return get_page(before, limit) or []
+
+    if workers <= 1 or len(windows) <= 1:
+        pages = [one(b) for b in windows]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(windows))) as ex:
+            pages = list(ex.map(one, windows))
+    return stitch(pages, start_unix, end_unix)
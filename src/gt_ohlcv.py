@@ -2,14 +2,19 @@
 from datetime import datetime, timezone
 import httpx
 
+import profiling
+
 BASE = "https://api.geckoterminal.com/api/v2"
 
 def get(url, params=None):
-    r = httpx.get(url, params=params, headers={"accept":"application/json"}, timeout=20)
+    profiling.count("http_requests")
+    with profiling.span("http_get"):
+        r = httpx.get(url, params=params, headers={"accept":"application/json"}, timeout=20)
     r.raise_for_status()
     return r.json()
 
 def main():
+    profiling.start_from_argv()
     if len(sys.argv) < 3:
         print("Usage: python src/gt_ohlcv.py <network> <pool_address> [limit]")
         sys.exit(1)
@@ -19,7 +24,8 @@ def main():
 
     url = f"{BASE}/networks/{network}/pools/{pool}/ohlcv/minute"
     params = {"aggregate": 1, "limit": limit, "before_timestamp": int(time.time())}
-    j = get(url, params=params)
+    with profiling.span("ohlcv_fetch"):
+        j = get(url, params=params)
 
     attrs = (j.get("data") or {}).get("attributes") or {}
     lst = attrs.get("ohlcv_list") or []
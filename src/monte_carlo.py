@@ -0,0 +1,161 @@
+# src/monte_carlo.py — vectorized Monte Carlo robustness check over a strategy's per-signal trades
+import pathlib
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+import profiling
+from result_writers import write_rows
+from trade_results import ExitReason
+
+OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
+
+DEFAULT_SIMS = 5000
+CHUNK_ELEMS = 2_000_000     # max sims*trades values materialized at once
+SLIP_RANGE = (0.0, 0.06)    # per-leg slippage drawn per trade in the perturbation run
+FILL_JITTER = 0.01          # +/- entry fill error (open vs. somewhere in the bar)
+
+console = Console()
+
+# --- Trade extraction ---
+def strategy_trades(trades, strategy_idx, signal_table=None):
+    """(pnl, entered) arrays for one strategy of a ResultBatch, in signal time order"""
+    sidx = np.frombuffer(trades.strategy_idx, dtype=np.uint32)
+    rows = np.flatnonzero(sidx == strategy_idx)
+    pnl = np.frombuffer(trades.pnl, dtype=np.float64)[rows]
+    entered = np.frombuffer(trades.reason, dtype=np.int8)[rows] != ExitReason.NO_ENTRY
+    if signal_table is not None and len(rows):
+        sig = np.frombuffer(trades.signal_idx, dtype=np.uint32)[rows]
+        order = np.argsort([signal_table[i]["unix"] for i in sig], kind="stable")
+        pnl, entered = pnl[order], entered[order]
+    return pnl, entered
+
+# --- Vectorized kernels (rows = simulations, columns = trades in order) ---
+def _max_drawdown(samples):
+    """Peak-to-trough drop of the cumulative $ pnl of each row (equity starts at 0)"""
+    equity = np.cumsum(samples, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 0.0)
+    return (peak - equity).max(axis=1)
+
+def _chunks(n_sims, n_trades):
+    step = max(1, CHUNK_ELEMS // max(1, n_trades))
+    for lo in range(0, n_sims, step):
+        yield min(step, n_sims - lo)
+
+def _collect(gen_samples, n_sims, n_trades):
+    totals, wins, dds = [], [], []
+    for size in _chunks(n_sims, n_trades):
+        s = gen_samples(size)
+        totals.append(s.sum(axis=1))
+        wins.append((s > 0).mean(axis=1) * 100)
+        dds.append(_max_drawdown(s))
+    return np.concatenate(totals), np.concatenate(wins), np.concatenate(dds)
+
+def reprice(pnl, entered, slip, fill, base_slip=0.03, invest_usd=100, fee=1.0):
+    """Re-cost trades simulated at base_slip with new per-leg slippage and entry fill error.
+
+    simulate_trade pays entry*(1+slip) and receives exit*(1-slip), so the gross
+    multiple is recoverable from pnl and can be re-applied with other costs.
+    """
+    gross = (pnl + invest_usd + fee) / (invest_usd - fee) * (1 + base_slip) / (1 - base_slip)
+    new = (invest_usd - fee) * gross * (1 - slip) / ((1 + slip) * (1 + fill)) - fee - invest_usd
+    return np.where(entered, new, 0.0)
+
+def run_monte_carlo(pnl, entered=None, n_sims=DEFAULT_SIMS, ci=0.95, seed=None,
+                    slip_range=SLIP_RANGE, fill_jitter=FILL_JITTER, base_slip=0.03, invest_usd=100, fee=1.0):
+    """Bootstrap, order-permutation and cost-perturbation runs for one pnl vector.
+
+    Returns {run: {metric: (lo, median, hi)}} for runs bootstrap/permutation/perturbed
+    and metrics total_pnl/win_rate/max_dd, plus p_loss (share of bootstrap totals < 0).
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    entered = np.ones(len(pnl), dtype=bool) if entered is None else np.asarray(entered, dtype=bool)
+    n = len(pnl)
+    if n == 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    q = [(1 - ci) / 2 * 100, 50, (1 + ci) / 2 * 100]
+
+    def band(x):
+        return tuple(float(v) for v in np.percentile(x, q))
+
+    def boot(size):
+        return pnl[rng.integers(0, n, size=(size, n))]
+
+    def perm(size):
+        return rng.permuted(np.broadcast_to(pnl, (size, n)), axis=1)
+
+    def perturb(size):
+        slip = rng.uniform(slip_range[0], slip_range[1], size=(size, n))
+        fill = rng.uniform(-fill_jitter, fill_jitter, size=(size, n))
+        return reprice(pnl, entered, slip, fill, base_slip, invest_usd, fee)
+
+    out = {}
+    for name, gen in (("bootstrap", boot), ("permutation", perm), ("perturbed", perturb)):
+        totals, wins, dds = _collect(gen, n_sims, n)
+        out[name] = {
+            "total_pnl": band(totals),
+            "win_rate": band(wins),
+            "max_dd": band(dds),
+        }
+        if name == "bootstrap":
+            out["p_loss"] = float((totals < 0).mean())
+    return out
+
+# --- Optimizer integration ---
+def summarize(strategy, mc):
+    """Flat CSV/table row for one strategy's Monte Carlo result"""
+    b, p, x = mc["bootstrap"], mc["permutation"], mc["perturbed"]
+    return {
+        "strategy_id": strategy["strategy_id"],
+        "total_pnl": strategy["total_pnl"],
+        "pnl_lo": b["total_pnl"][0],
+        "pnl_med": b["total_pnl"][1],
+        "pnl_hi": b["total_pnl"][2],
+        "win_rate_lo": b["win_rate"][0],
+        "win_rate_hi": b["win_rate"][2],
+        "p_loss": mc["p_loss"],
+        "dd_med": p["max_dd"][1],
+        "dd_hi": p["max_dd"][2],
+        "pnl_cost_lo": x["total_pnl"][0],
+        "pnl_cost_med": x["total_pnl"][1],
+    }
+
+def monte_carlo_for_strategies(trades, strategy_results, best_strategies, n_sims=DEFAULT_SIMS, signal_table=None, seed=None):
+    """Run the Monte Carlo stage on each of the top strategies of an optimizer run"""
+    index = {r["strategy_id"]: i for i, r in enumerate(strategy_results)}
+    rows = []
+    for strategy in best_strategies:
+        pnl, entered = strategy_trades(trades, index[strategy["strategy_id"]], signal_table)
+        mc = run_monte_carlo(pnl, entered, n_sims=n_sims, seed=seed)
+        if mc:
+            rows.append(summarize(strategy, mc))
+    return rows
+
+def monte_carlo_table(rows, n_sims, ci=0.95):
+    table = Table(title=f"🎲 Monte Carlo Robustness ({n_sims} sims, {ci*100:.0f}% CI)")
+    table.add_column("Strategy", style="cyan")
+    table.add_column("Total PnL", justify="right", style="green")
+    table.add_column("Bootstrap PnL CI", justify="right")
+    table.add_column("Win Rate CI", justify="right")
+    table.add_column("P(loss)", justify="right")
+    table.add_column("Order DD med/hi", justify="right")
+    table.add_column("Costs PnL lo/med", justify="right")
+    for r in rows:
+        table.add_row(
+            r["strategy_id"],
+            f"${r['total_pnl']:.2f}",
+            f"${r['pnl_lo']:.2f} … ${r['pnl_hi']:.2f}",
+            f"{r['win_rate_lo']:.0f}% … {r['win_rate_hi']:.0f}%",
+            f"{r['p_loss']*100:.1f}%",
+            f"${r['dd_med']:.2f} / ${r['dd_hi']:.2f}",
+            f"${r['pnl_cost_lo']:.2f} / ${r['pnl_cost_med']:.2f}",
+        )
+    return table
+
+def save_monte_carlo_results(mc_rows, output_file):
+    """Save Monte Carlo confidence intervals to CSV"""
+    with profiling.span("csv_write"):
+        mc_file = write_rows(OUTDIR / f"monte_carlo_{output_file}", mc_rows)
+    
+    console.print(f"[green]Saved Monte Carlo results -> {mc_file}[/green]")
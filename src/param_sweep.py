@@ -1,6 +1,8 @@
 import os, sys, subprocess
 from collections import defaultdict, namedtuple, Counter
 
+import profiling
+
 BATCH_FILE = os.path.join("src","batch_lines.txt")
 
 # --- richer, still small grid ---
@@ -47,7 +49,8 @@ def run_one(parts, strat: Strategy, env):
     else:
         return None, None, "bad line shape"
 
-    res = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    with profiling.span("subprocess"):
+        res = subprocess.run(cmd, capture_output=True, text=True, env=env)
     out = (res.stdout or "") + (res.stderr or "")
     pnl_usd, reason, hold_min = None, None, None
 
@@ -68,6 +71,7 @@ def run_one(parts, strat: Strategy, env):
     return pnl_usd, reason, hold_min
 
 def main():
+    profiling.start_from_argv()
     # Read jobs
     try:
         raw = open(BATCH_FILE, "r", encoding="utf-8").read().splitlines()
@@ -0,0 +1,168 @@
+# src/pareto.py — non-dominated (Pareto) frontier of swept strategies + interactive re-weighting
+import csv, argparse, pathlib
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from result_writers import write_rows
+import profiling
+
+console = Console()
+
+# (metric, direction): +1 = higher is better, -1 = lower is better
+OBJECTIVES = (("total_pnl", 1), ("max_dd", -1), ("win_rate", 1), ("avg_duration", -1))
+BLOCK = 1024
+
+# --- Frontier ---
+def _objective_matrix(strategy_results, objectives):
+    """n x k matrix where every column is to be maximized"""
+    X = np.array([[float(r.get(m, 0) or 0) for m, _ in objectives] for r in strategy_results], dtype=np.float64)
+    X *= np.array([d for _, d in objectives], dtype=np.float64)
+    X[np.isnan(X)] = -np.inf
+    return X
+
+def _front_2d(X):
+    """O(n log n) sweep: sort by objective 0 desc (ties by 1 desc), keep strict new maxima of 1"""
+    order = np.lexsort((-X[:, 1], -X[:, 0]))
+    keep = []
+    best = -np.inf
+    prev = None
+    for i in order:
+        a, b = X[i]
+        if b > best or (prev is not None and a == prev[0] and b == prev[1]):
+            keep.append(i)
+            best = max(best, b)
+            prev = (a, b)
+    return np.array(keep, dtype=np.int64)
+
+def _dominates(A, B):
+    """D[i, j] = A[i] dominates B[j], built one objective at a time (no n x m x k temporary)"""
+    ge = np.ones((len(A), len(B)), dtype=bool)
+    gt = np.zeros((len(A), len(B)), dtype=bool)
+    for c in range(A.shape[1]):
+        a, b = A[:, c, None], B[None, :, c]
+        ge &= a >= b
+        gt |= a > b
+    return ge & gt
+
+def _front_blocks(X, block=BLOCK):
+    """Vectorized dominance in blocks against the front found so far.
+
+    Points are visited by descending objective sum; a dominating point always has a
+    strictly larger sum, so it is either already on the front or earlier in the block.
+    """
+    order = np.argsort(-X.sum(axis=1), kind="stable")
+    front = np.empty((0, X.shape[1]))
+    keep = []
+    for lo in range(0, len(order), block):
+        idx = order[lo:lo + block]
+        B = X[idx]
+        if len(front):
+            alive = ~_dominates(front, B).any(axis=0)
+            idx, B = idx[alive], B[alive]
+        # dominance inside the block, only among points the front did not already remove
+        alive = ~_dominates(B, B).any(axis=0)
+        keep.extend(idx[alive].tolist())
+        front = np.vstack([front, B[alive]])
+    return np.array(keep, dtype=np.int64)
+
+def pareto_front(strategy_results, objectives=OBJECTIVES):
+    """Strategies not dominated on any objective by another strategy"""
+    if not strategy_results:
+        return []
+    X = _objective_matrix(strategy_results, objectives)
+    keep = _front_2d(X) if X.shape[1] == 2 else _front_blocks(X)
+    front = [strategy_results[i] for i in keep]
+    front.sort(key=lambda r: float(r.get(objectives[0][0], 0) or 0) * objectives[0][1], reverse=True)
+    return front
+
+# --- Re-weighting ---
+def parse_weights(spec):
+    """'total_pnl=0.5,max_dd=0.3' -> {'total_pnl': 0.5, 'max_dd': 0.3}"""
+    weights = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            weights[k.strip()] = float(v)
+    return weights
+
+def reweight(front, weights, objectives=OBJECTIVES):
+    """Order frontier strategies by a weighted sum of min-max normalized objectives"""
+    if not front:
+        return []
+    names = [m for m, _ in objectives]
+    X = _objective_matrix(front, objectives)
+    X[~np.isfinite(X)] = np.nan
+    lo, hi = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    N = np.nan_to_num((X - lo) / span)
+    w = np.array([weights.get(m, 0.0) for m in names], dtype=np.float64)
+    scores = N @ w
+    order = np.argsort(-scores, kind="stable")
+    return [dict(front[i], pareto_score=float(scores[i])) for i in order]
+
+# --- Display / IO ---
+def pareto_table(front, title="📐 Pareto Frontier", limit=20):
+    table = Table(title=f"{title} ({len(front)} strategies)")
+    table.add_column("Strategy", style="cyan")
+    table.add_column("Total PnL", justify="right", style="green")
+    table.add_column("Max DD%", justify="right")
+    table.add_column("Win Rate%", justify="right")
+    table.add_column("Avg Dur", justify="right")
+    if front and "pareto_score" in front[0]:
+        table.add_column("Score", justify="right")
+    for r in front[:limit]:
+        cells = [str(r["strategy_id"]), f"${float(r['total_pnl']):.2f}", f"{float(r['max_dd']):.1f}%",
+                 f"{float(r['win_rate']):.1f}%", f"{float(r['avg_duration'])/60:.0f}m"]
+        if "pareto_score" in r:
+            cells.append(f"{r['pareto_score']:.3f}")
+        table.add_row(*cells)
+    return table
+
+def save_front(front, path):
+    return write_rows(path, front)
+
+def interactive_reweight(front):
+    """Prompt for weights and re-rank the frontier until an empty line is entered"""
+    names = ", ".join(m for m, _ in OBJECTIVES)
+    while True:
+        spec = console.input(f"[bold]Weights[/bold] ({names}; e.g. total_pnl=0.6,max_dd=0.4) or Enter to quit: ").strip()
+        if not spec:
+            return
+        try:
+            console.print(pareto_table(reweight(front, parse_weights(spec)), title="📐 Re-weighted Frontier"))
+        except ValueError as e:
+            console.print(f"[red]Bad weights: {e}[/red]")
+
+def load_strategy_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto frontier of saved optimizer results")
+    parser.add_argument("input", help="all_strategies_*.csv written by an optimizer")
+    parser.add_argument("--weights", default="", help="Re-rank the frontier, e.g. total_pnl=0.5,max_dd=0.3,win_rate=0.2")
+    parser.add_argument("--interactive", action="store_true", help="Prompt for weights repeatedly")
+    parser.add_argument("--top-n", type=int, default=20, help="Rows to display")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start_from_args(args)
+
+    with profiling.span("parse"):
+        rows = load_strategy_csv(args.input)
+    with profiling.span("pareto"):
+        front = pareto_front(rows)
+    console.print(f"[green]{len(front)} of {len(rows)} strategies are on the frontier[/green]")
+    console.print(pareto_table(reweight(front, parse_weights(args.weights)) if args.weights else front, limit=args.top_n))
+
+    out = pathlib.Path(args.input)
+    out = out.with_name(out.name.replace("all_strategies_", "pareto_", 1) if out.name.startswith("all_strategies_") else f"pareto_{out.name}")
+    with profiling.span("csv_write"):
+        out = save_front(front, out)
+    console.print(f"[green]Saved frontier -> {out}[/green]")
+
+    if args.interactive:
+        interactive_reweight(front)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# src/portfolio_sim.py — event-driven portfolio simulation: shared bankroll, concurrency cap, equity curve
+import heapq
+
+from single_trade_from_cache import _exit_on_bar
+
+DEFAULT_BANKROLL = 1000.0
+DEFAULT_MAX_CONCURRENT = 5
+
+_BAR, _ENTRY = 0, 1  # bars sort before entries at the same ts, so capital freed at T is usable at T
+
+def _entry_index(candles, entry_unix):
+    """Entry bar by simulate_trade_record's rule: exact ts, else the closest within ±5s"""
+    best, best_diff = None, 6
+    for i, c in enumerate(candles):
+        diff = abs(c["ts"] - entry_unix)
+        if diff == 0:
+            return i
+        if diff < best_diff:
+            best, best_diff = i, diff
+    return best
+
+def prepare_portfolio(series):
+    """Strategy-independent part of the event stream, computed once per signal set.
+
+    series: [(unix, entry_mc, candles[, pyramid])] with ascending candles.
+    Returns [(unix, candles, entry_idx, first_bar)] for signals that have an entry bar.
+    """
+    prepared = []
+    for item in series:
+        unix, candles = item[0], item[2]
+        entry_idx = _entry_index(candles, unix)
+        if entry_idx is None:
+            continue
+        pyramid = item[3] if len(item) > 3 else None
+        if pyramid is not None:
+            first_bar = pyramid.first_after(unix)
+        else:
+            first_bar = next((i for i, c in enumerate(candles) if c["ts"] > unix), len(candles))
+        prepared.append((unix, candles, entry_idx, first_bar))
+    return prepared
+
+def simulate_portfolio(prepared, tp=None, sl=None, tsl=None, bankroll=DEFAULT_BANKROLL,
+                       max_concurrent=DEFAULT_MAX_CONCURRENT, invest_usd=100, slip=0.03, fee=1.0, curve=False):
+    """One merged, time-ordered pass over every signal's bars under capital constraints.
+
+    Each admitted position follows exactly the exit rules of simulate_trade_record; a
+    signal is skipped when max_concurrent positions are open or cash < invest_usd.
+    Open positions are marked to market at every bar close for the equity curve.
+    """
+    heap = [(unix, _ENTRY, j, entry_idx) for j, (unix, _, entry_idx, _) in enumerate(prepared)]
+    heapq.heapify(heap)
+
+    cash = float(bankroll)
+    open_value = 0.0          # mark-to-market value of open positions
+    exposure = 0.0            # capital committed to open positions
+    positions = {}            # j -> [entry_price, tokens, tp_level, sl_level, trade_ath, value]
+    realized = peak_realized = float(bankroll)
+    peak_equity = float(bankroll)
+    max_dd = realized_dd = 0.0
+    peak_exposure = 0.0
+    max_open = taken = wins = 0
+    skipped_concurrency = skipped_capital = 0
+    points = []
+
+    def close(j, exit_price):
+        nonlocal cash, open_value, exposure, realized, peak_realized, realized_dd, wins
+        pos = positions.pop(j)
+        proceeds = pos[1] * exit_price - fee
+        pnl = proceeds - invest_usd
+        cash += proceeds
+        open_value -= pos[5]
+        exposure -= invest_usd
+        realized += pnl
+        wins += pnl > 0
+        peak_realized = max(peak_realized, realized)
+        if peak_realized > 0:
+            realized_dd = max(realized_dd, (peak_realized - realized) / peak_realized * 100)
+
+    while heap:
+        ts, kind, j, i = heapq.heappop(heap)
+        candles = prepared[j][1]
+        if kind == _ENTRY:
+            if len(positions) >= max_concurrent:
+                skipped_concurrency += 1
+                continue
+            if cash < invest_usd:
+                skipped_capital += 1
+                continue
+            entry_price = candles[i]["o"] * (1 + slip)
+            tokens = (invest_usd - fee) / entry_price
+            positions[j] = [entry_price, tokens,
+                            entry_price * (1 + tp) if tp else None,
+                            entry_price * (1 - sl) if sl else None,
+                            entry_price, tokens * entry_price]
+            cash -= invest_usd
+            open_value += tokens * entry_price
+            exposure += invest_usd
+            taken += 1
+            max_open = max(max_open, len(positions))
+            peak_exposure = max(peak_exposure, exposure)
+            first_bar = prepared[j][3]
+            if first_bar < len(candles):
+                heapq.heappush(heap, (candles[first_bar]["ts"], _BAR, j, first_bar))
+            else:
+                close(j, entry_price)  # no bar after entry: flat exit at the entry price
+        else:
+            c = candles[i]
+            pos = positions[j]
+            pos[4] = max(pos[4], c["h"])
+            hit = _exit_on_bar(c, pos[0], pos[2], pos[3], pos[4], tsl, slip)
+            if hit:
+                close(j, hit[0])
+            elif i + 1 >= len(candles):
+                close(j, c["c"] * (1 - slip))  # neutral at last close
+            else:
+                value = pos[1] * c["c"]
+                open_value += value - pos[5]
+                pos[5] = value
+                heapq.heappush(heap, (candles[i + 1]["ts"], _BAR, j, i + 1))
+
+        # equity is sampled once every event at this timestamp has been applied
+        if not heap or heap[0][0] != ts:
+            equity = cash + open_value
+            peak_equity = max(peak_equity, equity)
+            if peak_equity > 0:
+                max_dd = max(max_dd, (peak_equity - equity) / peak_equity * 100)
+            if curve:
+                points.append((ts, equity))
+
+    result = {
+        "portfolio_pnl": cash - bankroll,
+        "final_equity": cash,
+        "trades_taken": taken,
+        "portfolio_win_rate": wins / taken * 100 if taken else 0,
+        "skipped_concurrency": skipped_concurrency,
+        "skipped_capital": skipped_capital,
+        "max_open": max_open,
+        "peak_exposure": peak_exposure,
+        "peak_exposure_pct": peak_exposure / bankroll * 100 if bankroll else 0,
+        "portfolio_max_dd": max_dd,
+        "realized_dd": realized_dd,
+    }
+    if curve:
+        result["equity_curve"] = points
+    return result
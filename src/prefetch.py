@@ -0,0 +1,171 @@
+# src/prefetch.py — warm cache/ with every signal's candles so the cached optimizers never touch the network
+#
+# Reads a signals CSV, resolves each token's pool once, downloads each (network, pool) window
+# once on a bounded, rate-limited thread pool and writes every signal's series to
+# cache/{chain}_{token[:8]}_{HHMM}.csv (or .tbc) — the files strategy_optimizer_cached reads.
+# Files are written as their download lands, so an interrupted run resumes where it stopped:
+# signals whose cache file already covers their window are skipped (unless --refresh); a file
+# written while the window was still open is fetched again once it has closed.
+#
+#   python src/tsb.py prefetch --input signals.csv --concurrency 8
+import argparse, csv, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rich.console import Console
+from rich.progress import Progress
+
+import profiling
+import cache_manager
+from candle_store import CandleStore, CACHEDIR
+from fetch_and_cache_candles import get_top_pool, fetch_gt_range, signal_window
+from signal_plan import FetchPlan
+from signal_utils import NET_MAP, normalize_signal
+from single_trade_from_cache import find_series, load_candles, ARCHIVE_EXT
+
+console = Console()
+
+def load_signals(path):
+    """Normalized signals of a CSV (rows that fail to parse are reported and skipped)"""
+    signals = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                sig = normalize_signal(row)
+                NET_MAP[sig["chain"]]
+            except (KeyError, ValueError) as e:
+                console.print(f"[red]Skipping bad signal {row}: {e}[/red]")
+                continue
+            signals.append(sig)
+    return signals
+
+def write_series(store, sig, candles, fmt="csv"):
+    """Write one signal's candles into the cache layout the optimizers read.
+
+    A sibling in the other format is removed: find_series prefers the .csv, so a stale one
+    would shadow a fresh .tbc (and keep is_complete checking the old series).
+    """
+    csv_path = store.cache_file(sig["chain"], sig["token"], sig["time"])
+    if fmt == "csv":
+        path, stale = store.save(sig["chain"], sig["token"], sig["time"], candles), csv_path.with_suffix(ARCHIVE_EXT)
+    else:
+        from candle_archive import write_archive
+        path, stale = write_archive(csv_path.with_suffix(ARCHIVE_EXT), candles), csv_path
+        cache_manager.touch(path, hit=False)
+    stale.unlink(missing_ok=True)
+    return path
+
+def cache_window(sig, now, minutes=None):
+    """[start, end] of a signal's series: the batch runner's window, or `minutes` after the call"""
+    start, end = signal_window(sig["unix"], now)
+    if minutes:
+        end = min(sig["unix"] + minutes * 60, now)
+    return start, end
+
+def is_complete(path, end):
+    """True if the cached series at `path` covers its window up to `end`.
+
+    Either its last candle reaches the final minute, or the file was written after `end`
+    (so a missing tail is a gap in trading, not a window that was still open).
+    """
+    if path.stat().st_mtime >= end:
+        return True
+    if path.suffix == ARCHIVE_EXT:
+        from candle_archive import span
+        covered = span(path)
+        last = covered[1] if covered else None
+    else:
+        candles = load_candles(path)
+        last = candles[-1]["ts"] if candles else None
+    return last is not None and last >= end - 60
+
+def prefetch(signals, concurrency=4, minutes=None, fmt="csv", refresh=False, cachedir=CACHEDIR):
+    """Fetch and cache every signal's window; returns counts {signals, cached, written, empty, no_pool, failed}"""
+    store = CandleStore(cachedir)
+    counts = {"signals": len(signals), "cached": 0, "written": 0, "empty": 0, "no_pool": 0, "failed": 0}
+
+    # One file per (chain, token prefix, HH:MM); files that already cover their window are done
+    todo, seen = [], set()
+    now = int(time.time())
+    for sig in signals:
+        path = store.cache_file(sig["chain"], sig["token"], sig["time"])
+        if path in seen:
+            continue
+        seen.add(path)
+        cached = None if refresh else find_series(path)
+        if cached is not None and is_complete(cached, cache_window(sig, now, minutes)[1]):
+            counts["cached"] += 1
+        else:
+            todo.append(sig)
+    if not todo:
+        return counts
+
+    plan = FetchPlan()
+    keys = [(NET_MAP[sig["chain"]], sig["token"]) for sig in todo]
+    with profiling.span("pool_detect"):
+        pools = plan.resolve_pools(keys, lambda key: (key[0], get_top_pool(*key)), workers=concurrency)
+    for idx, (sig, key) in enumerate(zip(todo, keys)):
+        if pools[key] is None:
+            counts["no_pool"] += 1
+            console.print(f"[red]✗ No pool for {sig['chain']} {sig['token'][:8]}: {plan.errors[key]}[/red]")
+            continue
+        plan.add(idx, key[0], pools[key][1], *cache_window(sig, now, minutes))
+    if not plan.groups:
+        return counts
+
+    with Progress(console=console) as progress, ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        task = progress.add_task("[green]Prefetching candles...", total=len(plan.members))
+        futures = {ex.submit(plan.fetch_group, key, fetch_gt_range): key for key in plan.groups}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            members = plan.groups[key]
+            try:
+                plan.store(key, fut.result())
+            except Exception as e:
+                counts["failed"] += len(members)
+                console.print(f"[red]✗ Fetch failed for pool {key[1][:8]} ({len(members)} signals): {e}[/red]")
+                progress.advance(task, len(members))
+                continue
+            for idx in members:
+                sig = todo[idx]
+                candles = plan.series(idx)
+                if candles:
+                    with profiling.span("csv_write"):
+                        write_series(store, sig, candles, fmt)
+                    counts["written"] += 1
+                else:
+                    counts["empty"] += 1
+                    console.print(f"[yellow]No candles for {sig['chain']} {sig['token'][:8]} at {sig['time']}[/yellow]")
+                progress.advance(task)
+    stats = plan.stats()
+    counts.update(pools=stats["pools"], downloads=stats["downloads"])
+    return counts
+
+def main():
+    p = argparse.ArgumentParser(description="Fetch every signal's candles into cache/ for the cached optimizers")
+    p.add_argument("--input", default="signals.csv", help="CSV file with columns: chain,token,time,entry_mc")
+    p.add_argument("--concurrency", type=int, default=4, metavar="N",
+                   help="Threads for pool lookups and downloads (requests stay rate limited)")
+    p.add_argument("--minutes", type=int, default=None,
+                   help="Minutes after each call to cache (default: the 30-minute window the batch runner simulates)")
+    p.add_argument("--format", choices=["csv", "tbc"], default="csv", help="Cache file format (.tbc = candle archive)")
+    p.add_argument("--refresh", action="store_true", help="Re-download signals that are already cached")
+    profiling.add_profile_args(p)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+
+    signals = load_signals(args.input)
+    console.print(f"[bold]Loaded {len(signals)} signals from {args.input}[/bold]")
+    start_time = time.time()
+    with profiling.span("prefetch"):
+        counts = prefetch(signals, args.concurrency, args.minutes, args.format, args.refresh)
+    console.print(f"[green]Prefetch finished in {time.time() - start_time:.1f} seconds[/green]")
+    console.print(f"{counts['written']} written, {counts['cached']} already cached, {counts['empty']} empty, "
+                  f"{counts['no_pool']} without pool, {counts['failed']} failed"
+                  + (f" ({counts['downloads']} downloads for {counts['pools']} pools)" if "downloads" in counts else ""))
+    if counts["no_pool"] or counts["failed"]:
+        console.print("[yellow]Re-run the same command to retry; cached signals are skipped.[/yellow]")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
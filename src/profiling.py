@@ -0,0 +1,151 @@
+# src/profiling.py — lightweight spans, counters and histograms (off unless --profile / TB_PROFILE=1)
+import atexit, json, math, os, sys, threading, time
+from contextlib import nullcontext
+from pathlib import Path
+
+OUTDIR = Path(__file__).resolve().parent.parent / "out"
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_spans = {}        # "outer;inner" -> [calls, total_s, self_s]
+_counters = {}     # name -> int/float
+_hists = {}        # name -> {"count","sum","min","max","buckets"{log2: n}}
+_NULL = nullcontext()
+_report_path = None
+_cprof = None
+
+def enabled():
+    return _enabled
+
+# --- spans ---
+class _Span:
+    __slots__ = ("name", "t0", "child")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.child = 0.0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.t0
+        stack = _local.stack
+        path = ";".join(s.name for s in stack)
+        stack.pop()
+        if stack:
+            stack[-1].child += elapsed
+        with _lock:
+            rec = _spans.get(path)
+            if rec is None:
+                rec = _spans[path] = [0, 0.0, 0.0]
+            rec[0] += 1
+            rec[1] += elapsed
+            rec[2] += elapsed - self.child
+        return False
+
+def span(name):
+    """Time a named stage; nested spans form a stack path (flamegraph-compatible)"""
+    return _Span(name) if _enabled else _NULL
+
+def sleep(seconds):
+    """time.sleep recorded as a 'sleep' span so backoff time shows up in reports"""
+    with span("sleep"):
+        time.sleep(seconds)
+
+# --- counters / histograms ---
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def observe(name, value):
+    if not _enabled:
+        return
+    b = int(math.floor(math.log2(value))) if value > 0 else None
+    with _lock:
+        h = _hists.get(name)
+        if h is None:
+            h = _hists[name] = {"count": 0, "sum": 0.0, "min": value, "max": value, "buckets": {}}
+        h["count"] += 1
+        h["sum"] += value
+        h["min"] = min(h["min"], value)
+        h["max"] = max(h["max"], value)
+        key = "<=0" if b is None else f"2^{b}"
+        h["buckets"][key] = h["buckets"].get(key, 0) + 1
+
+# --- lifecycle ---
+def enable(report_path=None, cprofile=False):
+    """Turn instrumentation on and write the report when the process exits"""
+    global _enabled, _report_path, _cprof
+    if _enabled:
+        return
+    _enabled = True
+    _report_path = Path(report_path) if report_path else OUTDIR / f"profile_{Path(sys.argv[0]).stem}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+    if cprofile:
+        import cProfile
+        _cprof = cProfile.Profile()
+        _cprof.enable()
+    atexit.register(write_report)
+
+def add_profile_args(parser):
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="REPORT_JSON",
+                        help="Record per-stage timings/counters and write a JSON + folded-stack report")
+    parser.add_argument("--cprofile", action="store_true", help="With --profile, also wrap the run in cProfile")
+
+def start_from_args(args):
+    if getattr(args, "profile", None) is not None:
+        enable(args.profile or None, cprofile=getattr(args, "cprofile", False))
+    else:
+        start_from_env()
+
+def start_from_env():
+    if os.getenv("TB_PROFILE", "0") == "1":
+        enable(os.getenv("TB_PROFILE_OUT") or None, cprofile=os.getenv("TB_CPROFILE", "0") == "1")
+
+def start_from_argv():
+    """For positional-argv CLIs: consume --profile/--cprofile from sys.argv (or TB_PROFILE=1)"""
+    flags = {"--profile", "--cprofile"}
+    if "--profile" in sys.argv:
+        cprofile = "--cprofile" in sys.argv
+        sys.argv[:] = [a for a in sys.argv if a not in flags]
+        enable(cprofile=cprofile)
+    else:
+        start_from_env()
+
+def report():
+    with _lock:
+        spans = {k: {"calls": v[0], "total_s": round(v[1], 6), "self_s": round(v[2], 6)} for k, v in _spans.items()}
+        hists = {}
+        for k, h in _hists.items():
+            hists[k] = dict(h, mean=h["sum"] / h["count"] if h["count"] else 0.0)
+        return {"argv": sys.argv, "spans": spans, "counters": dict(_counters), "histograms": hists}
+
+def write_report():
+    global _cprof
+    rep = report()
+    try:
+        _report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(_report_path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2)
+        # folded stacks (self time in microseconds) for flamegraph.pl / speedscope
+        folded = _report_path.with_suffix(".folded")
+        with open(folded, "w", encoding="utf-8") as f:
+            for path, s in sorted(rep["spans"].items()):
+                us = int(s["self_s"] * 1e6)
+                if us > 0:
+                    f.write(f"{path} {us}\n")
+        if _cprof is not None:
+            _cprof.disable()
+            _cprof.dump_stats(str(_report_path.with_suffix(".prof")))
+            _cprof = None
+        print(f"[profile] report -> {_report_path}", file=sys.stderr)
+    except Exception as e:
+        print(f"[profile] could not write report: {e}", file=sys.stderr)
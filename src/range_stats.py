@@ -0,0 +1,43 @@
+# src/range_stats.py — O(1) max-high over any bar window (sparse table + suffix max)
+#
+# Built once per candle series and kept next to it (CandlePyramid.stats), so the high of any
+# (entry, exit) window is two table lookups instead of a walk over the bars, and the post-exit
+# market ATH is a single suffix-max read.
+
+class RangeStats:
+    """Sparse table of highs: level k holds the max of the 2**k bars starting at each index.
+
+    A window [i, j) is covered by two overlapping power-of-two blocks, so queries are O(1)
+    after an O(n log n) build. Windows are half-open and must be non-empty.
+    """
+    __slots__ = ("n", "_hi", "suffix_high")
+
+    def __init__(self, highs):
+        highs = list(highs)
+        self.n = len(highs)
+        self._hi = [highs]
+        width = 1
+        while 2 * width <= self.n:
+            hi = self._hi[-1]
+            self._hi.append(list(map(max, hi[:-width], hi[width:])))
+            width *= 2
+        # suffix_high[i] = max high of bars [i, n); suffix_high[n] = -inf
+        self.suffix_high = [float("-inf")] * (self.n + 1)
+        for i in range(self.n - 1, -1, -1):
+            self.suffix_high[i] = max(highs[i], self.suffix_high[i + 1])
+
+    @classmethod
+    def from_candles(cls, candles):
+        """From {ts,o,h,l,c,v} dicts"""
+        return cls(c["h"] for c in candles)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From [ts, o, h, l, c, v] rows (GeckoTerminal OHLCV lists)"""
+        return cls(float(r[2]) for r in rows)
+
+    def max_high(self, i, j):
+        """Max high of bars [i, j)"""
+        k = (j - i).bit_length() - 1
+        row = self._hi[k]
+        return max(row[i], row[j - (1 << k)])
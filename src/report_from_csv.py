@@ -2,6 +2,8 @@
 import os, csv
 from collections import Counter
 
+import profiling
+
 CSV_PATH = os.path.join("out", "batch_results.csv")
 
 def human_mc(x: str) -> str:
@@ -20,13 +22,67 @@ def fmt_dur(mins: str) -> str:
 def short_symbol(mint: str) -> str:
     return (mint[:4] + "…") if mint else "—"
 
+def print_table(headers, table):
+    widths = [len(h) for h in headers]
+    for row in table:
+        for i, cell in enumerate(row): widths[i] = max(widths[i], len(str(cell)))
+    def line(cells): return " | ".join(str(cells[i]).ljust(widths[i]) for i in range(len(headers)))
+
+    print(line(headers)); print("-+-".join("-"*w for w in widths))
+    for row in table: print(line(row))
+
+def pct(x) -> str:
+    return "" if x is None else f"{x*100:.0f}%"
+
+def db_report(path, top, days):
+    """Top strategies (and most consistent TP/SL/TSL sets) across recent runs in the results warehouse"""
+    import time, results_db
+    path = path or str(results_db.DB_PATH)
+    if not os.path.isfile(path):
+        print("No results database found. Run an optimizer or the batch with --db first.")
+        return
+    conn = results_db.connect(path)
+    t0 = time.perf_counter()
+    with profiling.span("db_query"):
+        rows = results_db.top_strategies(conn, top, days)
+        params = results_db.param_summary(conn, top, days)
+    elapsed = (time.perf_counter() - t0) * 1000
+    scope = f"last {days:g} days" if days else "all runs"
+
+    print(f"=== TOP {top} STRATEGIES ({scope}) ===")
+    print_table(["Run","Tool","Date","TP","SL","TSL","Score","PnL ($)","Win %","Trades"],
+                [[r["run_id"], (r["tool"] or "").replace("strategy_optimizer_", ""),
+                  time.strftime("%Y-%m-%d %H:%M", time.localtime(r["started"])),
+                  pct(r["tp"]), pct(r["sl"]), pct(r["tsl"]), f"{r['score'] or 0:.3f}",
+                  f"{r['total_pnl'] or 0:+.2f}", f"{r['win_rate'] or 0:.1f}", r["total_trades"] or 0] for r in rows])
+
+    print(f"\n=== MOST CONSISTENT PARAMETERS ({scope}) ===")
+    print_table(["TP","SL","TSL","Runs","Avg score","Worst score","Avg PnL ($)"],
+                [[pct(r["tp"]), pct(r["sl"]), pct(r["tsl"]), r["runs"], f"{r['avg_score']:.3f}",
+                  f"{r['min_score']:.3f}", f"{r['avg_pnl'] or 0:+.2f}"] for r in params])
+    print(f"\n({len(rows)} strategies, {len(params)} parameter sets, queried in {elapsed:.1f} ms)")
+    conn.close()
+
 def main():
+    import argparse
+    p = argparse.ArgumentParser(description="Print the trade table and summary of out/batch_results.csv")
+    p.add_argument("--db", nargs="?", const="", default=None, metavar="PATH",
+                   help="Report top strategies from the SQLite results warehouse instead (default out/results.db)")
+    p.add_argument("--top", type=int, default=20, help="With --db, number of strategies to list")
+    p.add_argument("--days", type=float, default=30, help="With --db, only runs from the last N days (0 = all)")
+    profiling.add_profile_args(p)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+    if args.db is not None:
+        db_report(args.db, args.top, args.days)
+        return
+
     if not os.path.isfile(CSV_PATH):
         print("No CSV found. Run the batch first so out/batch_results.csv exists.")
         return
 
     rows = []
-    with open(CSV_PATH, "r", encoding="utf-8") as f:
+    with profiling.span("parse"), open(CSV_PATH, "r", encoding="utf-8") as f:
         rows = list(csv.DictReader(f))
 
     headers = ["Coin","ATH x","Entry MC","Exit MC","PnL (coin)","Hold","Exit reason"]
@@ -47,13 +103,7 @@ def main():
         if (r.get("hold_min") or "").isdigit(): holds.append(int(r["hold_min"]))
         if reason: reasons.append(reason)
 
-    widths = [len(h) for h in headers]
-    for row in table:
-        for i, cell in enumerate(row): widths[i] = max(widths[i], len(str(cell)))
-    def line(cells): return " | ".join(str(cells[i]).ljust(widths[i]) for i in range(len(headers)))
-
-    print(line(headers)); print("-+-".join("-"*w for w in widths))
-    for row in table: print(line(row))
+    print_table(headers, table)
 
     avg_hold = (sum(holds)/len(holds)) if holds else 0.0
     from math import floor
@@ -0,0 +1,91 @@
+# src/result_writers.py — streaming row writers (CSV / NDJSON) with interval flush and atomic finalize
+import csv, json, os, time
+from pathlib import Path
+
+FLUSH_SECS = float(os.getenv("TB_FLUSH_SECS", "1.0"))
+BUFFER_BYTES = 64 * 1024
+
+def format_for(path, fmt=None):
+    """'csv' or 'ndjson' from an explicit choice or the file suffix"""
+    if fmt:
+        return fmt
+    return "ndjson" if Path(path).suffix.lower() in (".ndjson", ".jsonl") else "csv"
+
+class StreamingWriter:
+    """Append result rows to disk as they are produced.
+
+    Rows go to `<path>.<pid>.partial` through a buffered file that is flushed at least every
+    `flush_secs`, so a crash leaves every flushed row on disk. close() renames the
+    partial file onto `path`; if the target is locked (e.g. open in Excel) the rows
+    land in `<stem>_<ts><suffix>` instead and `fallback` is set.
+    """
+    def __init__(self, path, fieldnames=None, fmt=None, flush_secs=FLUSH_SECS):
+        self.path = Path(path)
+        self.final_path = self.path
+        self.fmt = format_for(path, fmt)
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.flush_secs = flush_secs
+        self.rows = 0
+        self.fallback = False
+        # per-process name: two runs writing the same target never share a partial file
+        self.partial = self.path.with_name(f"{self.path.name}.{os.getpid()}.partial")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.partial, "w", newline="", encoding="utf-8", buffering=BUFFER_BYTES)
+        self._csv = None
+        self._last_flush = time.monotonic()
+        if self.fmt == "csv" and self.fieldnames:
+            self._start_csv()
+
+    def _start_csv(self):
+        self._csv = csv.DictWriter(self._f, fieldnames=self.fieldnames, extrasaction="ignore")
+        self._csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == "ndjson":
+            self._f.write(json.dumps(row, default=str) + "\n")
+        else:
+            if self._csv is None:
+                self.fieldnames = list(row.keys())
+                self._start_csv()
+            self._csv.writerow(row)
+        self.rows += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_secs:
+            self._f.flush()
+            self._last_flush = now
+
+    def write_many(self, rows):
+        for r in rows:
+            self.write(r)
+
+    def close(self, finalize=True):
+        """Flush and publish the file; with finalize=False the .partial file is kept as-is"""
+        if self._f.closed:
+            return self.final_path
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        if not finalize:
+            return self.partial
+        try:
+            os.replace(self.partial, self.path)
+        except PermissionError:
+            ts = time.strftime("%Y%m%d_%H%M%S")
+            self.final_path = self.path.with_name(f"{self.path.stem}_{ts}{self.path.suffix}")
+            os.replace(self.partial, self.final_path)
+            self.fallback = True
+        return self.final_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # on error keep the .partial file (everything written so far) for inspection
+        self.close(finalize=exc_type is None)
+        return False
+
+def write_rows(path, rows, fieldnames=None, fmt=None):
+    """Stream an iterable of dict rows to path; returns the file actually written"""
+    with StreamingWriter(path, fieldnames=fieldnames, fmt=fmt) as w:
+        w.write_many(rows)
+    return w.final_path
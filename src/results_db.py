@@ -0,0 +1,295 @@
+# src/results_db.py — SQLite results warehouse: signals, candle-series versions, runs, trades, strategy metrics
+#
+# One file (out/results.db, or TB_RESULTS_DB) accumulates every batch and optimizer run, so
+# questions like "top 20 strategies across last month's runs" are one indexed query instead of
+# a scan over dozens of out/*.csv files. Writers insert with executemany inside one transaction
+# per run (the batch runner: per chunk of results as they stream in); readers (report_from_csv
+# --db, the Streamlit results tab) only run SELECTs.
+import hashlib, json, math, os, pathlib, sqlite3, time
+
+OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
+DB_PATH = pathlib.Path(os.getenv("TB_RESULTS_DB", str(OUTDIR / "results.db")))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    unix INTEGER NOT NULL,
+    entry_mc REAL,
+    coin TEXT,
+    UNIQUE (chain, token, unix)
+);
+CREATE TABLE IF NOT EXISTS candle_series (
+    id INTEGER PRIMARY KEY,
+    signal_id INTEGER NOT NULL REFERENCES signals(id),
+    digest TEXT NOT NULL,
+    n_candles INTEGER,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    source TEXT,
+    recorded INTEGER,
+    UNIQUE (signal_id, digest)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    tool TEXT,
+    started INTEGER NOT NULL,
+    finished INTEGER,
+    params TEXT,
+    n_signals INTEGER,
+    n_strategies INTEGER,
+    n_trades INTEGER,
+    output TEXT
+);
+CREATE TABLE IF NOT EXISTS strategies (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    strategy_idx INTEGER NOT NULL,
+    strategy_id TEXT,
+    tp REAL,
+    sl REAL,
+    tsl REAL,
+    score REAL,
+    total_pnl REAL,
+    win_rate REAL,
+    profit_factor REAL,
+    sharpe_ratio REAL,
+    max_dd REAL,
+    avg_duration REAL,
+    total_trades INTEGER,
+    metrics TEXT,
+    PRIMARY KEY (run_id, strategy_idx)
+);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    strategy_idx INTEGER,
+    signal_id INTEGER NOT NULL REFERENCES signals(id),
+    series_id INTEGER REFERENCES candle_series(id),
+    exit_reason TEXT,
+    pnl REAL,
+    return_pct REAL,
+    trade_ath REAL,
+    market_ath REAL,
+    trade_atl REAL,
+    max_drawdown REAL,
+    duration INTEGER,
+    exit_mc REAL
+);
+DROP INDEX IF EXISTS idx_strategies_params;
+CREATE INDEX IF NOT EXISTS idx_strategies_params_cover ON strategies (tp, sl, tsl, run_id, score, total_pnl);
+CREATE INDEX IF NOT EXISTS idx_strategies_run_score ON strategies (run_id, score);
+CREATE INDEX IF NOT EXISTS idx_strategies_score ON strategies (score);
+CREATE INDEX IF NOT EXISTS idx_signals_token_unix ON signals (token, unix);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS idx_trades_run ON trades (run_id, strategy_idx);
+CREATE INDEX IF NOT EXISTS idx_trades_signal ON trades (signal_id);
+"""
+
+STRATEGY_COLUMNS = ("total_pnl", "win_rate", "profit_factor", "sharpe_ratio", "max_dd", "avg_duration", "total_trades")
+
+# --- Helpers ---
+def _num(v):
+    """SQLite-safe number: NaN/inf/'' -> None"""
+    if v is None or v == "":
+        return None
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+def _json(obj):
+    return json.dumps(obj, sort_keys=True, default=str)
+
+def _clean(metrics):
+    return {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in metrics.items()}
+
+def _ts(c):
+    return c["ts"] if isinstance(c, dict) else int(c[0])
+
+def series_digest(candles):
+    """Content hash of a candle series, so re-fetched or extended data becomes a new version"""
+    h = hashlib.blake2b(digest_size=12)
+    for c in candles:
+        row = (c["ts"], c["o"], c["h"], c["l"], c["c"], c["v"]) if isinstance(c, dict) else tuple(c[:6])
+        h.update(repr(row).encode("ascii"))
+    return h.hexdigest()
+
+def connect(path=None):
+    """Open (and create if needed) the warehouse; WAL so the UI can read while a run writes"""
+    path = pathlib.Path(path or DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+# --- Writers ---
+def start_run(conn, kind, tool=None, params=None, output=None):
+    with conn:
+        cur = conn.execute("INSERT INTO runs (kind, tool, started, params, output) VALUES (?, ?, ?, ?, ?)",
+                           (kind, tool, int(time.time()), _json(params or {}), None if output is None else str(output)))
+    return cur.lastrowid
+
+def finish_run(conn, run_id, output=None, **counts):
+    with conn:
+        conn.execute("UPDATE runs SET finished = ?, n_signals = ?, n_strategies = ?, n_trades = ? WHERE id = ?",
+                     (int(time.time()), counts.get("n_signals"), counts.get("n_strategies"), counts.get("n_trades"), run_id))
+        if output is not None:
+            conn.execute("UPDATE runs SET output = ? WHERE id = ?", (str(output), run_id))
+
+def record_signals(conn, signals):
+    """Upsert signal dicts (chain, token, unix, entry_mc[, coin]); returns their ids in input order"""
+    rows = [(s["chain"], s["token"], int(s["unix"]), _num(s.get("entry_mc")), s.get("coin")) for s in signals]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO signals (chain, token, unix, entry_mc, coin) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany("UPDATE signals SET coin = ? WHERE chain = ? AND token = ? AND unix = ? AND coin IS NULL",
+                         [(coin, chain, token, unix) for chain, token, unix, _, coin in rows if coin])
+    ids = {}
+    for chain, token, unix, _, _ in rows:
+        if (chain, token, unix) not in ids:
+            ids[(chain, token, unix)] = conn.execute(
+                "SELECT id FROM signals WHERE chain = ? AND token = ? AND unix = ?", (chain, token, unix)).fetchone()[0]
+    return [ids[(chain, token, unix)] for chain, token, unix, _, _ in rows]
+
+def record_series(conn, signal_ids, series, source=None):
+    """One candle_series version per (signal, content digest); returns series ids aligned with signal_ids"""
+    now = int(time.time())
+    rows = []
+    for signal_id, candles in zip(signal_ids, series):
+        if not candles:
+            rows.append(None)
+            continue
+        rows.append((signal_id, series_digest(candles), len(candles), _ts(candles[0]), _ts(candles[-1]), source, now))
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO candle_series (signal_id, digest, n_candles, first_ts, last_ts, source, recorded) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", [r for r in rows if r])
+    return [None if r is None else conn.execute("SELECT id FROM candle_series WHERE signal_id = ? AND digest = ?",
+                                                (r[0], r[1])).fetchone()[0]
+            for r in rows]
+
+def record_strategies(conn, run_id, strategy_results, score=None):
+    """Bulk insert optimizer metrics rows; strategy_idx is the row's position (as in ResultBatch)"""
+    rows = []
+    for idx, m in enumerate(strategy_results):
+        rows.append((run_id, idx, m.get("strategy_id"), _num(m.get("tp")), _num(m.get("sl")), _num(m.get("tsl")),
+                     _num(score(m)) if score else None, *(_num(m.get(k)) for k in STRATEGY_COLUMNS), _json(_clean(m))))
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO strategies (run_id, strategy_idx, strategy_id, tp, sl, tsl, score, "
+                         "total_pnl, win_rate, profit_factor, sharpe_ratio, max_dd, avg_duration, total_trades, metrics) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+def record_trade_batch(conn, run_id, trades, signal_ids, series_ids=None, strategies=None):
+    """Bulk insert a ResultBatch; trades[i].signal_idx indexes signal_ids (and series_ids).
+
+    strategies: optional set of strategy indices to keep (e.g. only the top N of a large sweep).
+    """
+    from trade_results import ExitReason
+    labels = {int(r): r.label for r in ExitReason}
+    def rows():
+        for i in range(len(trades)):
+            strat = trades.strategy_idx[i]
+            if strategies is not None and strat not in strategies:
+                continue
+            sig = trades.signal_idx[i]
+            yield (run_id, strat, signal_ids[sig], series_ids[sig] if series_ids else None, labels[trades.reason[i]],
+                   _num(trades.pnl[i]), _num(trades.return_pct[i]), _num(trades.trade_ath[i]),
+                   _num(trades.market_ath[i]), _num(trades.trade_atl[i]), _num(trades.max_drawdown[i]),
+                   trades.duration[i] if trades.duration[i] >= 0 else None, None)
+    return _insert_trades(conn, rows())
+
+def record_results(conn, run_id, results, series=None, source=None, strategy_idx=None):
+    """Bulk insert batch result dicts (chain, token, unix, entry_mc, coin, pnl, ...) with their signals.
+
+    series: optional candle lists aligned with results, stored as candle_series versions.
+    """
+    keep = [i for i, r in enumerate(results) if r.get("unix") is not None]
+    results = [results[i] for i in keep]
+    signal_ids = record_signals(conn, results)
+    series_ids = record_series(conn, signal_ids, [series[i] for i in keep], source) if series else [None] * len(results)
+    rows = ((run_id, strategy_idx, sid, ser, r.get("exit_reason"), _num(r.get("pnl")), _num(r.get("return_pct")),
+             _num(r.get("trade_ath")), _num(r.get("market_ath")), _num(r.get("trade_atl")), _num(r.get("max_drawdown")),
+             r.get("duration"), _num(r.get("exit_mc")))
+            for sid, ser, r in zip(signal_ids, series_ids, results))
+    return _insert_trades(conn, rows)
+
+def _insert_trades(conn, rows):
+    n = 0
+    with conn:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= 5000:
+                conn.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                n += len(batch)
+                batch.clear()
+        if batch:
+            conn.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            n += len(batch)
+    return n
+
+def record_optimization(conn, tool, params, signal_table, strategy_results, trades, score,
+                        series=None, output=None, all_trades=False, top_n=10):
+    """Store one optimizer run: its signals (+ candle versions), every strategy's metrics and score,
+    and the trades of the top_n strategies by score (or of every strategy with all_trades=True).
+    """
+    run_id = start_run(conn, "optimize", tool, params, output)
+    signal_ids = record_signals(conn, signal_table)
+    series_ids = record_series(conn, signal_ids, series, source=tool) if series else None
+    record_strategies(conn, run_id, strategy_results, score)
+    keep = None
+    if not all_trades:
+        ranked = sorted(range(len(strategy_results)), key=lambda i: score(strategy_results[i]), reverse=True)
+        keep = set(ranked[:top_n])
+    n_trades = record_trade_batch(conn, run_id, trades, signal_ids, series_ids, keep) if trades is not None else 0
+    finish_run(conn, run_id, n_signals=len(signal_table), n_strategies=len(strategy_results), n_trades=n_trades)
+    return run_id
+
+# --- Queries ---
+def _since(days):
+    return int(time.time() - days * 86400) if days else 0
+
+def _recent_runs(days, kind=None):
+    """WHERE clause + args keeping strategies of runs started in the last `days` days.
+
+    The run ids come from idx_runs_started; the unary + keeps SQLite from driving the
+    query off the run_id indexes, so ORDER BY score / GROUP BY params use their own index.
+    """
+    sql = "+s.run_id IN (SELECT id FROM runs WHERE started >= ?" + (" AND kind = ?" if kind else "") + ")"
+    return sql, (_since(days), kind) if kind else (_since(days),)
+
+def top_strategies(conn, limit=20, days=None, kind=None):
+    """Best-scoring strategies across every run started in the last `days` days"""
+    where, args = _recent_runs(days, kind)
+    sql = ("SELECT s.run_id, r.tool, r.started, s.strategy_id, s.tp, s.sl, s.tsl, s.score, s.total_pnl, s.win_rate, "
+           "s.profit_factor, s.sharpe_ratio, s.max_dd, s.total_trades FROM strategies s JOIN runs r ON r.id = s.run_id "
+           f"WHERE {where} ORDER BY s.score DESC LIMIT ?")
+    return [dict(r) for r in conn.execute(sql, (*args, limit))]
+
+def param_summary(conn, limit=20, days=None):
+    """Per (tp, sl, tsl): how many runs tested it and its mean / worst score across them"""
+    where, args = _recent_runs(days)
+    sql = ("SELECT s.tp, s.sl, s.tsl, COUNT(*) AS runs, AVG(s.score) AS avg_score, MIN(s.score) AS min_score, "
+           f"AVG(s.total_pnl) AS avg_pnl FROM strategies s WHERE {where} "
+           "GROUP BY s.tp, s.sl, s.tsl ORDER BY avg_score DESC LIMIT ?")
+    return [dict(r) for r in conn.execute(sql, (*args, limit))]
+
+def recent_runs(conn, limit=20, kind=None):
+    sql = "SELECT * FROM runs" + (" WHERE kind = ?" if kind else "") + " ORDER BY started DESC, id DESC LIMIT ?"
+    return [dict(r) for r in conn.execute(sql, (kind, limit) if kind else (limit,))]
+
+def run_trades(conn, run_id, strategy_idx=None):
+    """Trades of one run (optionally one strategy) joined with their signals"""
+    sql = ("SELECT t.*, g.chain, g.token, g.unix, g.entry_mc, g.coin FROM trades t JOIN signals g ON g.id = t.signal_id "
+           "WHERE t.run_id = ?" + (" AND t.strategy_idx = ?" if strategy_idx is not None else "") + " ORDER BY g.unix")
+    return [dict(r) for r in conn.execute(sql, (run_id, strategy_idx) if strategy_idx is not None else (run_id,))]
+
+def token_trades(conn, token, since_unix=0):
+    """Every stored trade of one token, newest signal first"""
+    sql = ("SELECT t.*, g.chain, g.token, g.unix, g.entry_mc, g.coin FROM signals g JOIN trades t ON t.signal_id = g.id "
+           "WHERE g.token = ? AND g.unix >= ? ORDER BY g.unix DESC")
+    return [dict(r) for r in conn.execute(sql, (token, since_unix))]
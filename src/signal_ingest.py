@@ -0,0 +1,253 @@
+# src/signal_ingest.py — live signal ingestion: channel updates -> parsed calls -> pre-warmed cache -> scheduled backtest
+#
+#   python src/signal_ingest.py --source telegram --chat @mychannel          (needs TB_TELEGRAM_TOKEN)
+#   python src/signal_ingest.py --source fake --replay signals.csv --window 0 --offline
+#
+# Every parsed call resolves its pool and starts fetching candles immediately; the backtest
+# runs once the post-signal window (30 minutes, as in fetch_gt_candles) has elapsed and only
+# downloads the candles that arrived since the prewarm. Calls
+# are appended to out/live_signals.csv and results to out/live_results.ndjson, and the full
+# candle window is written to cache/ for the cached optimizer.
+import argparse, asyncio, csv, datetime as dt, io, json, os, pathlib, re, time
+
+import profiling
+from atomic_io import append_line
+from candle_store import get_store
+from signal_utils import parse_mc, signal_unix, pkt_hhmm
+
+OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
+WINDOW_SECS = 30 * 60
+
+# --- Parsing ---
+_SOL_ADDR = r"[1-9A-HJ-NP-Za-km-z]{32,44}"
+_EVM_ADDR = r"0x[0-9a-fA-F]{40}"
+_MC = r"[\d.,]+\s*[kKmM]?"
+
+# signals.csv row: SOL,<token>,20:48,47.18k
+CSV_RE = re.compile(rf"^\s*(SOL|ETH|BNB)\s*,\s*({_EVM_ADDR}|{_SOL_ADDR})\s*,\s*(\d{{1,2}}:\d{{2}})\s*,\s*({_MC})\s*$", re.I)
+# batch_lines.txt row: <mint> | 12:55 | 12.34m | ...
+PIPE_RE = re.compile(rf"^\s*({_SOL_ADDR})\s*\|\s*(\d{{1,2}}:\d{{2}})\s*\|\s*([\d.]+\s*[kKmM])\s*(?:\||$)")
+# free-form channel post
+CHAIN_RE = re.compile(r"\b(SOL|SOLANA|ETH|ETHEREUM|BNB|BSC)\b", re.I)
+EVM_RE = re.compile(rf"\b{_EVM_ADDR}\b")
+SOL_RE = re.compile(rf"(?<![0-9A-Za-z]){_SOL_ADDR}(?![0-9A-Za-z])")
+MC_RE = re.compile(rf"(?:\bMC\b|\bmcap\b|market\s*cap)\s*[:=@-]?\s*\$?\s*({_MC})", re.I)
+TIME_RE = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+
+CHAIN_ALIASES = {"SOLANA": "SOL", "ETHEREUM": "ETH", "BSC": "BNB"}
+
+def _signal(chain, token, time_str, mc, posted=None):
+    try:
+        entry_mc = parse_mc(mc.replace(",", "").replace(" ", ""))
+    except ValueError:
+        return None
+    if time_str:
+        unix = signal_unix(time_str, posted)
+    else:
+        # no call time in the text: use the minute the update was posted
+        unix = int((posted or dt.datetime.now(dt.timezone.utc)).timestamp()) // 60 * 60
+        time_str = pkt_hhmm(unix)
+    return {"chain": chain.upper(), "token": token, "time": time_str, "entry_mc": entry_mc, "unix": unix}
+
+def parse_message(text, posted=None):
+    """Signal dict (chain, token, time, entry_mc, unix) from one update, or None"""
+    for line in text.splitlines():
+        m = CSV_RE.match(line)
+        if m:
+            return _signal(m.group(1), m.group(2), m.group(3), m.group(4), posted)
+        m = PIPE_RE.match(line)
+        if m:
+            return _signal("SOL", m.group(1), m.group(2), m.group(3), posted)
+
+    m_mc = MC_RE.search(text)
+    if not m_mc:
+        return None
+    m_chain = CHAIN_RE.search(text)
+    chain = CHAIN_ALIASES.get(m_chain.group(1).upper(), m_chain.group(1).upper()) if m_chain else None
+    m_evm = EVM_RE.search(text)
+    if m_evm:
+        token, chain = m_evm.group(0), chain if chain in ("ETH", "BNB") else "ETH"
+    else:
+        m_sol = SOL_RE.search(text)
+        if not m_sol:
+            return None
+        token, chain = m_sol.group(0), "SOL"
+    m_time = TIME_RE.search(text)
+    time_str = f"{int(m_time.group(1)):02d}:{m_time.group(2)}" if m_time else None
+    return _signal(chain, token, time_str, m_mc.group(1), posted)
+
+# --- Update sources ---
+class FakeFeed:
+    """Offline source: replays messages (or signals.csv / batch_lines.txt lines) with a fixed interval"""
+    def __init__(self, messages, interval=0.0):
+        self.messages = list(messages)
+        self.interval = interval
+
+    @classmethod
+    def from_file(cls, path, interval=0.0):
+        with open(path, encoding="utf-8-sig") as f:
+            lines = [l.strip() for l in f if l.strip() and not l.startswith("#")]
+        return cls(lines, interval)
+
+    async def updates(self):
+        for msg in self.messages:
+            text, posted = msg if isinstance(msg, tuple) else (msg, None)
+            yield text, posted
+            if self.interval:
+                await asyncio.sleep(self.interval)
+
+class TelegramFeed:
+    """Channel posts and messages seen by a bot (python-telegram-bot >= 20, imported on use)"""
+    def __init__(self, bot_token, chats=None):
+        self.bot_token = bot_token
+        self.chats = {c.lstrip("@").lower() for c in chats or []}
+
+    def _wanted(self, chat):
+        if not self.chats:
+            return True
+        return str(chat.id) in self.chats or (chat.username or "").lower() in self.chats
+
+    async def updates(self):
+        from telegram.ext import Application, MessageHandler, filters
+
+        queue = asyncio.Queue()
+
+        async def on_message(update, context):
+            msg, chat = update.effective_message, update.effective_chat
+            text = (msg.text or msg.caption) if msg else None
+            if text and self._wanted(chat):
+                await queue.put((text, msg.date))
+
+        app = Application.builder().token(self.bot_token).build()
+        app.add_handler(MessageHandler(filters.TEXT | filters.CAPTION, on_message))
+        await app.initialize()
+        await app.start()
+        await app.updater.start_polling(allowed_updates=["message", "channel_post"])
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()
+
+# --- Pipeline ---
+class IngestService:
+    """Track every parsed call from arrival to its backtest result"""
+    def __init__(self, store=None, window=WINDOW_SECS, tp=None, sl=None, tsl=None, fetch=True, outdir=OUTDIR):
+        self.store = store or get_store()
+        self.window = window
+        self.tp, self.sl, self.tsl = tp, sl, tsl
+        self.fetch = fetch
+        self.outdir = pathlib.Path(outdir)
+        self.outdir.mkdir(exist_ok=True)
+        self.signals_path = self.outdir / "live_signals.csv"
+        self.results_path = self.outdir / "live_results.ndjson"
+        self.seen = set()
+        self.tasks = set()
+        self.results = []
+
+    async def run(self, source, drain=True):
+        """Consume the source; with drain=True wait for scheduled backtests once it ends"""
+        async for text, posted in source.updates():
+            with profiling.span("parse"):
+                sig = parse_message(text, posted)
+            if sig is None:
+                profiling.count("ingest_unparsed")
+                continue
+            self.submit(sig)
+        if drain and self.tasks:
+            await asyncio.gather(*list(self.tasks))
+        return self.results
+
+    def submit(self, sig):
+        key = (sig["chain"], sig["token"], sig["unix"])
+        if key in self.seen:
+            profiling.count("ingest_duplicate")
+            return None
+        self.seen.add(key)
+        profiling.count("ingest_signals")
+        self._append_signal(sig)
+        task = asyncio.get_running_loop().create_task(self._track(sig))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _track(self, sig):
+        label = f"{sig['chain']} {sig['token'][:8]} @ {sig['time']}"
+        try:
+            if self.fetch:
+                await asyncio.to_thread(self._prewarm, sig)
+            delay = sig["unix"] + self.window - time.time()
+            if delay > 0:
+                print(f"[ingest] {label}: backtest in {delay/60:.1f}m")
+                await asyncio.sleep(delay)
+            row = await asyncio.to_thread(self._backtest, sig)
+        except Exception as e:
+            print(f"[ingest] {label}: {e}")
+            return
+        self.results.append(row)
+        append_line(self.results_path, json.dumps(row, default=str) + "\n")
+        print(f"[ingest] {label}: {row.get('exit_reason')} pnl={row.get('pnl', 0):+.2f}")
+
+    def _prewarm(self, sig):
+        """Resolve pool and name and pull the candles available so far (kept resident for the backtest)"""
+        with profiling.span("prewarm"):
+            self.store.pool(sig["chain"], sig["token"])
+            self.store.coin_name(sig["chain"], sig["token"])
+            if time.time() >= sig["unix"] + self.window:
+                return  # window already complete: the backtest fetch is the only one needed
+            self.store.candles(sig["chain"], sig["token"], sig["time"], sig["unix"])
+
+    def _backtest(self, sig):
+        from backtest_server import batch_rows
+        with profiling.span("ingest_backtest"):
+            if self.fetch:
+                # extend the prewarmed partial series with just the missing tail
+                candles, _ = self.store.complete(sig["chain"], sig["token"], sig["time"], sig["unix"])
+            else:
+                candles, _ = self.store.candles(sig["chain"], sig["token"], sig["time"], sig["unix"], fetch=False)
+            if candles and self.fetch:
+                self.store.save(sig["chain"], sig["token"], sig["time"], candles)
+            return next(batch_rows(self.store, [sig], self.tp, self.sl, self.tsl, fetch=self.fetch))
+
+    def _append_signal(self, sig):
+        fields = ["chain", "token", "time", "entry_mc", "unix"]
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore").writerow(sig)
+        append_line(self.signals_path, buf.getvalue(), header=",".join(fields) + "\r\n")
+
+def main():
+    p = argparse.ArgumentParser(description="Ingest live calls, pre-warm their candles and backtest them")
+    p.add_argument("--source", choices=["telegram", "fake"], default="telegram")
+    p.add_argument("--chat", action="append", default=[], help="Channel/chat username or id to follow (repeatable)")
+    p.add_argument("--replay", default=None, help="fake source: file of messages / signals.csv / batch_lines.txt")
+    p.add_argument("--interval", type=float, default=0.0, help="fake source: seconds between messages")
+    p.add_argument("--window", type=int, default=WINDOW_SECS, help="Seconds after the call before backtesting")
+    p.add_argument("--offline", action="store_true", help="Never hit the API; only use cache/ files")
+    p.add_argument("--tp", type=float, default=None)
+    p.add_argument("--sl", type=float, default=None)
+    p.add_argument("--tsl", type=float, default=None)
+    profiling.add_profile_args(p)
+    args = p.parse_args()
+    profiling.start_from_args(args)
+
+    if args.source == "fake":
+        if not args.replay:
+            p.error("--source fake needs --replay FILE")
+        source = FakeFeed.from_file(args.replay, args.interval)
+    else:
+        bot_token = os.getenv("TB_TELEGRAM_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
+        if not bot_token:
+            p.error("set TB_TELEGRAM_TOKEN (or TELEGRAM_BOT_TOKEN) for the telegram source")
+        source = TelegramFeed(bot_token, args.chat)
+
+    service = IngestService(window=args.window, tp=args.tp, sl=args.sl, tsl=args.tsl, fetch=not args.offline)
+    try:
+        results = asyncio.run(service.run(source))
+    except KeyboardInterrupt:
+        return
+    print(f"[ingest] {len(service.seen)} calls, {len(results)} backtested -> {service.results_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# src/signal_plan.py — fetch planning for a batch: one pool lookup per token, one download per (network, pool) window
+from bisect import bisect_left, bisect_right
+
+import profiling
+from gt_history import PAGE_LIMIT, fan_out
+
+# Windows of the same pool closer than one GT page are fetched together: the gap costs no extra request
+MERGE_GAP = PAGE_LIMIT * 60
+
+def _ts(row):
+    return row["ts"] if isinstance(row, dict) else int(row[0])
+
+def merge_windows(windows, gap=MERGE_GAP):
+    """Union of [start, end] windows, joining any that overlap or sit within `gap` seconds"""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(w) for w in merged]
+
+class FetchPlan:
+    """Group signals by (network, pool), fetch each group's union window once, fan the series out.
+
+    Usage: resolve pools with pool() (memoized per token, failures included), add() each
+    signal's window, call fetch(fetch_range) once, then series(i) per signal. Reposted
+    runners and tokens called several times cost one lookup and one download.
+    resolve_pools() and fetch(workers=N) run the lookups and downloads on N threads.
+    """
+    def __init__(self, gap=MERGE_GAP):
+        self.gap = gap
+        self.members = {}     # signal index -> (network, pool, start, end)
+        self.groups = {}      # (network, pool) -> [signal index]
+        self.fetched = {}     # (network, pool) -> [(start, end, rows, ts)]
+        self._pools = {}
+        self.errors = {}      # key -> exception of a failed lookup
+        self.lookups = 0
+        self.downloads = 0
+        self.last_error = None
+
+    def pool(self, key, resolve):
+        """resolve() once per key; returns its (network, pool) result or None if it raised"""
+        if key not in self._pools:
+            self.lookups += 1
+            try:
+                self._pools[key] = resolve()
+            except Exception as e:
+                self._fail(key, e)
+        else:
+            profiling.count("plan_pool_shared")
+        return self._pools[key]
+
+    def _fail(self, key, e):
+        profiling.count("plan_pool_fail")
+        self._pools[key] = None
+        self.errors[key] = self.last_error = e
+
+    def resolve_pools(self, keys, resolve, workers=1):
+        """pool() for many keys up front: resolve(key) once per new key, fanned out over `workers` threads.
+
+        Returns {key: result or None} for every key asked for.
+        """
+        asked = list(keys)
+        keys = list(dict.fromkeys(asked))
+        todo = [k for k in keys if k not in self._pools]
+        profiling.count("plan_pool_shared", len(asked) - len(todo))
+
+        def one(key):
+            try:
+                return resolve(key), None
+            except Exception as e:
+                return None, e
+
+        for key, (found, err) in zip(todo, fan_out(one, todo, workers)):
+            self.lookups += 1
+            if err is None:
+                self._pools[key] = found
+            else:
+                self._fail(key, err)
+        return {k: self._pools[k] for k in keys}
+
+    def add(self, idx, network, pool, start, end):
+        self.members[idx] = (network, pool, int(start), int(end))
+        self.groups.setdefault((network, pool), []).append(idx)
+
+    def windows(self, network, pool):
+        return merge_windows([self.members[i][2:] for i in self.groups[(network, pool)]], self.gap)
+
+    def fetch_group(self, key, fetch_range):
+        """Download one (network, pool) group's merged windows: [(start, end, rows, ts)] for store()"""
+        network, pool = key
+        parts = []
+        for start, end in self.windows(network, pool):
+            with profiling.span("plan_fetch"):
+                rows = fetch_range(network, pool, start, end) or []
+            parts.append((start, end, rows, [_ts(r) for r in rows]))
+        return parts
+
+    def store(self, key, parts):
+        self.downloads += len(parts)
+        self.fetched[key] = parts
+        profiling.count("plan_signals_shared", len(self.groups[key]) - len(parts))
+
+    def fetch(self, fetch_range, workers=1):
+        """fetch_range(network, pool, start, end) -> ascending rows (dict candles or [ts,...] lists).
+
+        With workers > 1 the groups download concurrently; fetch_range is expected to pace its
+        own requests (fetch_and_cache_candles.http_get waits on the shared GT limiter for each
+        request that actually goes out).
+        """
+        keys = list(self.groups)
+        for key, parts in zip(keys, fan_out(lambda key: self.fetch_group(key, fetch_range), keys, workers)):
+            self.store(key, parts)
+        return self
+
+    def series(self, idx, clip=True):
+        """Rows for one signal: its own [start, end] slice, or the whole shared window with clip=False"""
+        network, pool, start, end = self.members[idx]
+        for w_start, w_end, rows, ts in self.fetched.get((network, pool), ()):
+            if w_start <= start and end <= w_end:
+                if not clip:
+                    return rows
+                return rows[bisect_left(ts, start):bisect_right(ts, end)]
+        return []
+
+    def stats(self):
+        return {
+            "signals": len(self.members),
+            "pools": len(self.groups),
+            "pool_lookups": self.lookups,
+            "downloads": self.downloads,
+        }
@@ -0,0 +1,39 @@
+# src/signal_utils.py — shared signal-row helpers (chain map, MC parsing, PKT call time -> unix)
+import datetime as dt
+
+NET_MAP = {"SOL": "solana", "ETH": "eth", "BNB": "bsc"}
+PKT = dt.timezone(dt.timedelta(hours=5))
+
+def parse_mc(s):
+    s = str(s).upper().strip()
+    if s.endswith("K"):
+        return float(s[:-1]) * 1000
+    if s.endswith("M"):
+        return float(s[:-1]) * 1_000_000
+    return float(s)
+
+def signal_unix(time_str, now=None):
+    """Unix time of the most recent PKT HH:MM call time (within the last 24h)"""
+    now_utc = now or dt.datetime.now(dt.timezone.utc)
+    now_pkt = now_utc.astimezone(PKT)
+    hh, mm = map(int, time_str.split(":"))
+    cand_pkt = now_pkt.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    if cand_pkt > now_pkt:
+        cand_pkt -= dt.timedelta(days=1)
+    return int(cand_pkt.astimezone(dt.timezone.utc).timestamp())
+
+def pkt_hhmm(unix):
+    """PKT HH:MM call time for a unix timestamp (the signals.csv `time` column)"""
+    return dt.datetime.fromtimestamp(unix, PKT).strftime("%H:%M")
+
+def normalize_signal(row):
+    """Signal dict with upper-case chain, parsed entry_mc and its unix call time"""
+    chain = str(row["chain"]).upper().strip()
+    time_str = str(row["time"]).strip()
+    return {
+        "chain": chain,
+        "token": str(row["token"]).strip(),
+        "time": time_str,
+        "entry_mc": parse_mc(row["entry_mc"]),
+        "unix": int(row["unix"]) if row.get("unix") else signal_unix(time_str),
+    }
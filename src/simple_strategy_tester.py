@@ -5,7 +5,11 @@ from rich.console import Console
 from rich.table import Table
 
 from single_trade_from_cache import simulate_trade
+from range_stats import RangeStats
 from fetch_and_cache_candles import get_top_pool, fetch_gt_candles, http_get
+from gt_history import fan_out
+import profiling
+from atomic_io import atomic_write
 
 OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
 console = Console()
@@ -65,8 +69,8 @@ def calculate_strategy_metrics(results):
         "profit_factor": sum(wins) / abs(sum(losses)) if losses else float('inf')
     }
 
-def test_strategy_on_signal(signal, tp, sl, tsl):
-    """Test a single strategy on a single signal"""
+def load_signal(signal):
+    """I/O stage for one signal: pool, candles, their RangeStats and coin name (None if it failed)"""
     try:
         chain = signal["chain"].upper()
         token = signal["token"]
@@ -88,26 +92,47 @@ def test_strategy_on_signal(signal, tp, sl, tsl):
         pool = get_top_pool(net_map[chain], token)
         candles = fetch_gt_candles(net_map[chain], pool, start_unix=unix, signal_unix=unix)
         
-        # Run trade simulation
-        res = simulate_trade(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc)
-        
-        # Add signal info
-        res.update({
+        return {
             "chain": chain,
             "token": token,
             "coin": fetch_coin_name(chain, token),
             "unix": unix,
-            "entry_mc": entry_mc
-        })
+            "entry_mc": entry_mc,
+            "candles": candles,
+            "stats": RangeStats.from_candles(candles) if candles else None   # shared by every strategy
+        }
         
+    except Exception as e:
+        console.print(f"[red]Error processing signal {signal}: {e}[/red]")
+        return None
+
+def load_signals(signals, concurrency=1):
+    """load_signal for every signal on `concurrency` rate-limited threads, in input order"""
+    with profiling.span("fetch"):
+        return fan_out(load_signal, signals, concurrency)
+
+def test_strategy_on_signal(signal, tp, sl, tsl, loaded=None):
+    """Test a single strategy on a single signal (pass its load_signal result to skip the fetch)"""
+    loaded = load_signal(signal) if loaded is None else loaded
+    if loaded is None:
+        return None
+    
+    try:
+        # Run trade simulation
+        with profiling.span("simulate"):
+            res = simulate_trade(loaded["candles"], loaded["unix"], tp=tp, sl=sl, tsl=tsl, entry_mc=loaded["entry_mc"],
+                                 stats=loaded["stats"])
+        
+        # Add signal info
+        res.update({k: loaded[k] for k in ("chain", "token", "coin", "unix", "entry_mc")})
         return res
         
     except Exception as e:
-        console.print(f"[red]Error processing signal {signal}: {e}[/red]")
+        console.print(f"[red]Error processing signal {signal or loaded['token']}: {e}[/red]")
         return None
 
-def test_strategies(signals, max_strategies=50):
-    """Test multiple strategies on signals"""
+def test_strategies(signals, max_strategies=50, concurrency=1):
+    """Test multiple strategies on signals (each signal is fetched once, then reused by every strategy)"""
     console.print(f"[bold blue]Testing strategies on {len(signals)} signals...[/bold blue]")
     
     # Generate strategy combinations
@@ -118,6 +143,7 @@ def test_strategies(signals, max_strategies=50):
     
     console.print(f"[green]Testing {len(all_combinations)} strategy combinations...[/green]")
     
+    loaded = [x for x in load_signals(signals, concurrency) if x is not None]
     strategy_results = []
     
     for i, (tp, sl, tsl) in enumerate(all_combinations):
@@ -126,8 +152,8 @@ def test_strategies(signals, max_strategies=50):
         # Test this strategy on all signals
         strategy_results_for_combo = []
         
-        for signal in signals:
-            result = test_strategy_on_signal(signal, tp, sl, tsl)
+        for sig in loaded:
+            result = test_strategy_on_signal(None, tp, sl, tsl, loaded=sig)
             if result:
                 strategy_results_for_combo.append(result)
         
@@ -193,7 +219,11 @@ def main():
     parser.add_argument("--input", required=True, help="CSV file with signals")
     parser.add_argument("--max-strategies", type=int, default=50, help="Maximum strategies to test")
     parser.add_argument("--top-n", type=int, default=10, help="Number of top strategies to display")
+    parser.add_argument("--concurrency", type=int, default=1, metavar="N",
+                        help="Threads for fetching signals' pools, candles and names (requests stay rate limited)")
+    profiling.add_profile_args(parser)
     args = parser.parse_args()
+    profiling.start_from_args(args)
     
     # Load signals
     signals = []
@@ -205,7 +235,8 @@ def main():
     console.print(f"[bold]Loaded {len(signals)} signals for testing[/bold]")
     
     # Test strategies
-    strategy_results = test_strategies(signals, args.max_strategies)
+    with profiling.span("test_strategies"):
+        strategy_results = test_strategies(signals, args.max_strategies, args.concurrency)
     
     console.print(f"[green]Tested {len(strategy_results)} strategies[/green]")
     
@@ -215,7 +246,7 @@ def main():
     # Save results
     timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = OUTDIR / f"strategy_test_{timestamp}.csv"
-    with open(output_file, "w", newline="", encoding="utf-8") as f:
+    with profiling.span("csv_write"), atomic_write(output_file, "w", newline="", encoding="utf-8") as f:
         if strategy_results:
             w = csv.DictWriter(f, fieldnames=strategy_results[0].keys())
             w.writeheader()
@@ -1,6 +1,23 @@
-import csv, argparse
+import csv, argparse, pathlib
+
+import profiling
+from trade_results import ExitReason, TradeRecord
+
+ARCHIVE_EXT = ".tbc"
+
+def find_series(path):
+    """A cache file if it exists, else its packed .tbc sibling (candle_archive.py pack), else None"""
+    path = pathlib.Path(path)
+    if path.exists():
+        return path
+    packed = path.with_suffix(ARCHIVE_EXT)
+    return packed if packed.exists() else None
 
 def load_candles(csvfile):
+    """Candles from a cache CSV, or from a .tbc candle archive (picked by extension)"""
+    if pathlib.Path(csvfile).suffix == ARCHIVE_EXT:
+        from candle_archive import read_candles
+        return read_candles(csvfile)
     rows = []
     with open(csvfile,newline="") as f:
         for r in csv.DictReader(f):
@@ -14,7 +31,57 @@ def load_candles(csvfile):
             })
     return rows
 
-def simulate_trade(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=None, slip=0.03, fee=1.0, entry_mc=None):
+def _exit_on_bar(c, entry_price, tp_level, sl_level, trade_ath, tsl, slip):
+    """Return (exit_price, exit_reason) if this bar triggers an exit, else None"""
+    tsl_level = trade_ath * (1-tsl) if tsl else None
+
+    hit_sl = sl_level and c["l"] <= sl_level
+    hit_tp = tp_level and c["h"] >= tp_level
+    hit_tsl = tsl_level and c["l"] <= tsl_level if tsl else False
+
+    # Single trigger
+    if hit_sl and not (hit_tp or hit_tsl):
+        return sl_level * (1-slip), "SL"
+    if hit_tp and not (hit_sl or hit_tsl):
+        return tp_level * (1-slip), "TP"
+    if hit_tsl and not (hit_tp or hit_sl):
+        return tsl_level * (1-slip), "TSL"
+
+    # Multiple triggers same candle
+    if (hit_tp and hit_sl) or (hit_tp and hit_tsl) or (hit_sl and hit_tsl):
+        if c["o"] >= entry_price:
+            if hit_tp:
+                return (tp_level * (1-slip) if tp_level else entry_price*(1-slip)), "TP"
+            return tsl_level * (1-slip), "TSL"
+        elif c["o"] < entry_price:
+            if hit_sl:
+                return sl_level * (1-slip), "SL"
+            return tsl_level * (1-slip), "TSL"
+        return entry_price * (1-slip), "neutral"
+    return None
+
+def _span_can_exit(hi, lo, trade_ath, tp_level, sl_level, tsl):
+    """Whether any bar inside a coarse block with this high/low could trigger an exit.
+
+    The trailing level inside the block is at most max(trade_ath, hi) * (1-tsl),
+    so a block whose low stays above that (and inside TP/SL) is safe to skip.
+    """
+    if tp_level and hi >= tp_level:
+        return True
+    if sl_level and lo <= sl_level:
+        return True
+    if tsl and lo <= max(trade_ath, hi) * (1-tsl):
+        return True
+    return False
+
+def simulate_trade_record(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=None, slip=0.03, fee=1.0, entry_mc=None, pyramid=None, stats=None):
+    """Simulate one trade over ascending 1m candles and return a compact TradeRecord.
+
+    Pass a CandlePyramid (see candle_pyramid.get_pyramid) to skip coarse spans
+    where no exit can trigger; results are identical to the 1m walk. Without one,
+    pass the series' RangeStats when simulating many strategies on the same candles
+    so the post-exit market ATH is a single lookup instead of a scan of the tail.
+    """
     # 1. Smart entry with ±5s tolerance and MC validation
     entry_candle = None
     best_match = None
@@ -35,14 +102,8 @@ def simulate_trade(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=No
             entry_candle = best_match
     
     if not entry_candle:
-        return {
-            "status": "no_entry",
-            "pnl": 0.0,
-            "exit_reason": "no_entry",
-            "trade_ath": None,
-            "market_ath": None,
-            "duration": None
-        }
+        profiling.count("trades_no_entry")
+        return TradeRecord(ExitReason.NO_ENTRY)
 
     # Smart entry price: use candle open (most realistic for signal timing)
     entry_price = entry_candle["o"] * (1+slip)
@@ -59,62 +120,64 @@ def simulate_trade(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=No
     exited = False
 
     # 2. Walk candles forward
-    for c in candles:
-        if c["ts"] <= entry_unix:
-            continue
-
-        # Always update market ATH, regardless of exit
-        market_ath = max(market_ath, c["h"])
+    bars = 0  # candles or coarse blocks touched (profiling)
+    if pyramid is not None:
+        # Coarse pass: skip whole 1h/15m/5m blocks where no exit can trigger
+        n = len(candles)
+        i = pyramid.first_after(entry_unix)
+        while i < n and not exited:
+            bars += 1
+            for k in pyramid.block_sizes:
+                if i % k:
+                    continue
+                hi, lo = pyramid.levels[k][0][i // k], pyramid.levels[k][1][i // k]
+                if _span_can_exit(hi, lo, trade_ath, tp_level, sl_level, tsl):
+                    continue
+                trade_ath = max(trade_ath, hi)
+                trade_atl = min(trade_atl, lo)
+                market_ath = max(market_ath, hi)
+                i = min(i + k, n)
+                break
+            else:
+                c = candles[i]
+                market_ath = max(market_ath, c["h"])
+                trade_ath = max(trade_ath, c["h"])
+                trade_atl = min(trade_atl, c["l"])
+                hit = _exit_on_bar(c, entry_price, tp_level, sl_level, trade_ath, tsl, slip)
+                if hit:
+                    exit_price, exit_reason = hit
+                    exit_ts = c["ts"]
+                    exited = True
+                i += 1
+        if i < n:
+            # Market ATH after the exit: one suffix-max lookup
+            market_ath = max(market_ath, pyramid.stats.suffix_high[i])
+    else:
+        bars = len(candles)
+        for k, c in enumerate(candles):
+            if c["ts"] <= entry_unix:
+                continue
+
+            # Always update market ATH, regardless of exit
+            market_ath = max(market_ath, c["h"])
 
-        if not exited:
             # Only update trade ATH while trade is alive
             trade_ath = max(trade_ath, c["h"])
             # Track all-time low between entry and current ATH
             trade_atl = min(trade_atl, c["l"])
-            tsl_level = trade_ath * (1-tsl) if tsl else None
-
-            hit_sl = sl_level and c["l"] <= sl_level
-            hit_tp = tp_level and c["h"] >= tp_level
-            hit_tsl = tsl_level and c["l"] <= tsl_level if tsl else False
-
-            # Single trigger
-            if hit_sl and not (hit_tp or hit_tsl):
-                exit_price = sl_level * (1-slip)
-                exit_reason = "SL"
-                exit_ts = c["ts"]
-                exited = True
-            elif hit_tp and not (hit_sl or hit_tsl):
-                exit_price = tp_level * (1-slip)
-                exit_reason = "TP"
+            hit = _exit_on_bar(c, entry_price, tp_level, sl_level, trade_ath, tsl, slip)
+            if hit:
+                exit_price, exit_reason = hit
                 exit_ts = c["ts"]
                 exited = True
-            elif hit_tsl and not (hit_tp or hit_sl):
-                exit_price = tsl_level * (1-slip)
-                exit_reason = "TSL"
-                exit_ts = c["ts"]
-                exited = True
-
-            # Multiple triggers same candle
-            elif (hit_tp and hit_sl) or (hit_tp and hit_tsl) or (hit_sl and hit_tsl):
-                if c["o"] >= entry_price:
-                    if hit_tp:
-                        exit_price = tp_level * (1-slip) if tp_level else entry_price*(1-slip)
-                        exit_reason = "TP"
-                    else:
-                        exit_price = tsl_level * (1-slip)
-                        exit_reason = "TSL"
-                elif c["o"] < entry_price:
-                    if hit_sl:
-                        exit_price = sl_level * (1-slip)
-                        exit_reason = "SL"
+                # The rest of the series only moves the market ATH: a suffix-max lookup
+                # when the caller shares the series' RangeStats, a plain scan otherwise
+                if k + 1 < len(candles):
+                    if stats is not None:
+                        market_ath = max(market_ath, stats.suffix_high[k + 1])
                     else:
-                        exit_price = tsl_level * (1-slip)
-                        exit_reason = "TSL"
-                else:
-                    exit_price = entry_price * (1-slip)
-                    exit_reason = "neutral"
-                exit_ts = c["ts"]
-                exited = True
+                        market_ath = max(market_ath, max(b["h"] for b in candles[k + 1:]))
+                break
 
     # If never hit → neutral at last close
     if not exited and candles[-1]["ts"] > entry_unix:
@@ -125,18 +188,26 @@ def simulate_trade(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=No
     proceeds = tokens*exit_price - fee
     pnl = proceeds - invest_usd
 
-    return {
-        "entry_price": entry_price,
-        "exit_price": exit_price,
-        "exit_reason": exit_reason,
-        "pnl": pnl,
-        "return_pct": pnl/invest_usd*100,
-        "trade_ath": trade_ath/entry_price if entry_price else None,
-        "market_ath": market_ath/entry_price if entry_price else None,
-        "trade_atl": trade_atl/entry_price if entry_price else None,  # All-time low multiplier
-        "max_drawdown": (entry_price - trade_atl)/entry_price*100 if entry_price else None,  # Max drawdown %
-        "duration": exit_ts - entry_unix if exit_ts else None
-    }
+    if profiling.enabled():
+        profiling.count("trades_simulated")
+        profiling.count("bars_scanned", bars)
+
+    return TradeRecord(
+        ExitReason.from_label(exit_reason),
+        entry_price=entry_price,
+        exit_price=exit_price,
+        pnl=pnl,
+        return_pct=pnl/invest_usd*100,
+        trade_ath=trade_ath/entry_price if entry_price else None,
+        market_ath=market_ath/entry_price if entry_price else None,
+        trade_atl=trade_atl/entry_price if entry_price else None,  # All-time low multiplier
+        max_drawdown=(entry_price - trade_atl)/entry_price*100 if entry_price else None,  # Max drawdown %
+        duration=exit_ts - entry_unix if exit_ts else None
+    )
+
+def simulate_trade(candles, entry_unix, invest_usd=100, tp=None, sl=None, tsl=None, slip=0.03, fee=1.0, entry_mc=None, pyramid=None, stats=None):
+    """Simulate one trade and return the result as a dict (see simulate_trade_record)"""
+    return simulate_trade_record(candles, entry_unix, invest_usd, tp, sl, tsl, slip, fee, entry_mc, pyramid, stats).to_dict()
 
 
 
@@ -147,7 +218,9 @@ if __name__ == "__main__":
     p.add_argument("--tp", type=float, default=None)
     p.add_argument("--sl", type=float, default=None)
     p.add_argument("--tsl", type=float, default=None)
+    profiling.add_profile_args(p)
     args = p.parse_args()
+    profiling.start_from_args(args)
 
     candles = load_candles(args.csv)
     res = simulate_trade(candles, args.unix, tp=args.tp, sl=args.sl, tsl=args.tsl)
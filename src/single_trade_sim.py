@@ -3,12 +3,16 @@ import sys, time
 from datetime import datetime, timezone, timedelta
 import httpx
 
+import profiling
+
 API_ROOT = "https://api.geckoterminal.com/api/v2"
 NETWORKS = ["solana","bsc","eth","base"]  # use "eth" for Ethereum on GT
 
 def http_get(url, params=None):
     print(f"[HTTP] GET {url} params={params}", flush=True)
-    r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
+    profiling.count("http_requests")
+    with profiling.span("http_get"):
+        r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
     print(f"[HTTP] status={r.status_code}", flush=True)
     r.raise_for_status()
     js = r.json()
@@ -52,7 +56,7 @@ def fetch_ohlcv_1m_last_48h(network: str, pool: str):
         before = oldest
         if oldest <= cutoff:
             break
-        time.sleep(0.25)
+        profiling.sleep(0.25)
     out.sort(key=lambda r: int(r[0]))
     out = [r for r in out if int(r[0]) >= cutoff]
     print(f"[ohlcv] total kept rows (48h): {len(out)}", flush=True)
@@ -116,6 +120,7 @@ def decide_exit_in_bar(bar_open, bar_high, bar_low, tp_px, sl_px, mode, ref_for_
 def fmt_usd(x): return f"${x:,.2f}"
 
 def main():
+    profiling.start_from_argv()
     if len(sys.argv) < 6:
         print("Usage: python src/single_trade_sim.py <mint> <HH:MM_UTC> <invest_usd> <tp_pct_up> <sl_pct_down> [mode]")
         sys.exit(1)
@@ -135,11 +140,14 @@ def main():
         sys.exit(1)
 
     try:
-        net, pool = detect_network_and_pool(mint)
-        candles = fetch_ohlcv_1m_last_48h(net, pool)
+        with profiling.span("pool_detect"):
+            net, pool = detect_network_and_pool(mint)
+        with profiling.span("ohlcv_fetch"):
+            candles = fetch_ohlcv_1m_last_48h(net, pool)
         if not candles:
             print("No candles in last 48h."); sys.exit(2)
-        entry_ts = find_entry_minute(candles, hh, mm)
+        with profiling.span("entry_match"):
+            entry_ts = find_entry_minute(candles, hh, mm)
         if not entry_ts:
             print("No candle found at that HH:MM within last 48h."); sys.exit(3)
         idx = next(i for i, r in enumerate(candles) if int(r[0]) == entry_ts)
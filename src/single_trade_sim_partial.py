@@ -3,14 +3,21 @@ import sys, time, os
 from datetime import datetime, timezone
 import httpx
 
+import profiling
+from singleflight import HTTP, freeze
+
 API_ROOT = "https://api.geckoterminal.com/api/v2"
 NETWORKS = ["solana","bsc","eth","base"]  # use "eth" for Ethereum on GT
 
 # --------- HTTP / data helpers ----------
 def http_get(url, params=None):
-    r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    def fetch():
+        profiling.count("http_requests")
+        with profiling.span("http_get"):
+            r = httpx.get(url, params=params or {}, headers={"accept":"application/json"}, timeout=30)
+        r.raise_for_status()
+        return r.json()
+    return HTTP.do(("GET", url, freeze(params)), fetch)
 
 def detect_network_and_pool(mint: str):
     for net in NETWORKS:
@@ -40,7 +47,7 @@ def fetch_ohlcv_1m_last_48h(network: str, pool: str):
         oldest = int(lst[0][0])  # ascending
         before = oldest
         if oldest <= cutoff: break
-        time.sleep(0.25)
+        profiling.sleep(0.25)
     out.sort(key=lambda r: int(r[0]))
     return [r for r in out if int(r[0]) >= cutoff]
 
@@ -133,10 +140,194 @@ def execute_sell(raw_price, qty, sell_fee, slip, slip_mode, slip_side):
     log = f"raw:{raw_price:.8f}  recv(no slip)"
     return proceeds, raw_price, sell_fee_usd, log
 
+# --------- multi-mode engine ----------
+MODES = ("optimistic", "realistic", "pessimistic")
+
+def entry_shift(cfg):
+    """Price-mode buy slippage moves the paid entry, and with it every TP/SL trigger level"""
+    slip, slip_mode, slip_side, _, _ = cfg
+    return slip if slip_mode == "price" and slip_side in ("both", "buy") else 0.0
+
+def path_outcomes(candles, idx, tp_up, sl_pct, modes=MODES, shift=0.0, max_bars=2000, stats=None):
+    """Cost-independent outcome of the trade entered at candles[idx], for several fill modes in one walk.
+
+    Per mode: raw entry price, exit bar ts, raw exit price, exit reason, running high and
+    the legs sold ([(size, raw price)]; one full-size leg here). Entry fill, TP/SL levels
+    and same-bar TP/SL resolution differ per mode; bar parsing, the running high and the
+    walk are shared, and it stops once every mode has exited. `shift` is the price-mode buy
+    slippage (see entry_shift), the only cost that moves trigger levels. With a RangeStats of
+    the series, the high up to each exit is a lookup instead of a running max.
+    """
+    o, h, l, c = (float(x) for x in candles[idx][1:5])
+    out, live = {}, {}
+    for mode in modes:
+        raw_entry = entry_fill(o, h, l, c, mode)
+        ref = raw_entry * (1 + shift)
+        out[mode] = {"raw_entry": raw_entry}
+        live[mode] = (ref * (1 + tp_up), ref * (1 - sl_pct), ref)
+
+    track = stats is None
+    max_high = h
+    end = min(idx + max_bars, len(candles))
+    for j in range(idx, end):
+        row = candles[j]
+        o2, h2, l2, c2 = float(row[1]), float(row[2]), float(row[3]), float(row[4])
+        if track:
+            max_high = max(max_high, h2)
+        for mode, (tp_px, sl_px, ref) in list(live.items()):
+            reason = decide_exit_in_bar(o2, h2, l2, tp_px, sl_px, mode, ref)
+            if reason:
+                exit_raw = o2 if reason == "TP" and mode == "optimistic" else (h2 if reason == "TP" and mode == "pessimistic" else c2)
+                out[mode].update(exit_reason=reason, exit_raw=exit_raw, exit_ts=int(row[0]),
+                                 max_high=max_high if track else stats.max_high(idx, j + 1))
+                del live[mode]
+        if not live:
+            break
+    # never hit: exit at the last candle close
+    last = candles[-1]
+    if live and not track:
+        max_high = stats.max_high(idx, end)
+    for mode in live:
+        out[mode].update(exit_reason="TIME", exit_raw=float(last[4]), exit_ts=int(last[0]), max_high=max_high)
+    for r in out.values():
+        r["legs"] = [(1.0, r["exit_raw"])]
+    return out
+
+def simulate_modes(candles, idx, invest, tp_up, sl_pct, modes=MODES, cfg=None, max_bars=2000):
+    """path_outcomes plus the configured fills and fees: {mode: result dict} with the fields main() prints"""
+    cfg = cfg or _cfg()
+    slip, slip_mode, slip_side, buy_fee_frac, sell_fee_frac = cfg
+    out = path_outcomes(candles, idx, tp_up, sl_pct, modes, entry_shift(cfg), max_bars)
+    for r in out.values():
+        qty, paid_entry, buy_fee_usd, buy_log = execute_buy(r["raw_entry"], invest, buy_fee_frac, slip, slip_mode, slip_side)
+        proceeds = sell_fee_usd = 0.0
+        logs = []
+        for size, raw_px in r["legs"]:
+            leg_proceeds, _, leg_fee, leg_log = execute_sell(raw_px, qty * size, sell_fee_frac, slip, slip_mode, slip_side)
+            proceeds += leg_proceeds
+            sell_fee_usd += leg_fee
+            logs.append(leg_log)
+        pnl_usd = proceeds - invest - buy_fee_usd
+        r.update(paid_entry=paid_entry, qty=qty, buy_fee_usd=buy_fee_usd, buy_log=buy_log,
+                 proceeds=proceeds, sell_fee_usd=sell_fee_usd, sell_log="; ".join(logs),
+                 pnl_usd=pnl_usd, ret_pct=pnl_usd / invest * 100.0)
+    return out
+
+# --------- cost layer: many fee/slippage settings over shared paths ----------
+def apply_costs(path, invest, costs):
+    """PnL of one path outcome under every cost setting at once (numpy broadcast).
+
+    costs: columns slip, price (bool: price-mode), buy/sell (bool: side slipped),
+    buy_fee, sell_fee. Same formulas as execute_buy/execute_sell, so for the settings
+    that share this path the result equals simulate_modes'.
+    """
+    import numpy as np
+    slip = np.asarray(costs["slip"], dtype=float)
+    price = np.asarray(costs["price"], dtype=bool)
+    buy_slip = np.where(costs["buy"], slip, 0.0)
+    sell_slip = np.where(costs["sell"], slip, 0.0)
+    buy_fee = np.asarray(costs["buy_fee"], dtype=float)
+    sell_fee = np.asarray(costs["sell_fee"], dtype=float)
+    cash = invest * (1 - buy_fee)
+    qty = np.where(price, cash / (path["raw_entry"] * (1 + buy_slip)), cash * (1 - buy_slip) / path["raw_entry"])
+    gross = sum(size * raw_px for size, raw_px in path["legs"])
+    proceeds = qty * gross * (1 - sell_fee) * (1 - sell_slip)
+    return proceeds - invest - invest * buy_fee
+
+def cost_grid(slips=(0.0,), slip_modes=("amount",), slip_sides=("sell",), buy_fees=(0.01,), sell_fees=(0.01,)):
+    """Cartesian grid of (slip, slip_mode, slip_side, buy_fee, sell_fee) settings, in _cfg() order"""
+    import itertools
+    return list(itertools.product(slips, slip_modes, slip_sides, buy_fees, sell_fees))
+
+COST_KEYS = ("slip", "mode", "side", "buy_fee", "sell_fee")
+
+def parse_cost_spec(spec, cfg=None):
+    """'slip=0,0.02;mode=amount,price;buy_fee=0.005,0.01' -> cost_grid settings; keys left out keep the TB_* value"""
+    values = {k: [v] for k, v in zip(COST_KEYS, cfg or _cfg())}
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        key, _, vals = part.partition("=")
+        key = key.strip().lower()
+        vals = [v.strip() for v in vals.split(",") if v.strip()]
+        if key not in COST_KEYS or not vals:
+            raise RuntimeError(f"bad cost grid entry {part!r} (keys: {', '.join(COST_KEYS)})")
+        if (key == "mode" and set(vals) - {"price", "amount"}) or (key == "side" and set(vals) - {"both", "buy", "sell"}):
+            raise RuntimeError(f"bad {key} in {part!r}")
+        values[key] = vals if key in ("mode", "side") else [float(v) for v in vals]
+    return cost_grid(*(values[k] for k in COST_KEYS))
+
+def cost_sensitivity(candles, idx, invest, tp_up, sl_pct, settings, modes=MODES, max_bars=2000):
+    """PnL for every (cost setting, fill mode): a numpy array [len(settings), len(modes)].
+
+    The path is walked once per distinct entry shift (price-mode buy slippage); every other
+    fee/slippage/side/mode combination is broadcast over those shared paths.
+    """
+    import numpy as np
+    from range_stats import RangeStats
+    pnl = np.empty((len(settings), len(modes)))
+    groups = {}
+    for i, cfg in enumerate(settings):
+        groups.setdefault(entry_shift(cfg), []).append(i)
+    stats = RangeStats.from_rows(candles) if len(groups) > 1 else None
+    for shift, rows in groups.items():
+        paths = path_outcomes(candles, idx, tp_up, sl_pct, modes, shift, max_bars, stats)
+        sel = [settings[i] for i in rows]
+        costs = {"slip": [c[0] for c in sel], "price": [c[1] == "price" for c in sel],
+                 "buy": [c[2] in ("both", "buy") for c in sel], "sell": [c[2] in ("both", "sell") for c in sel],
+                 "buy_fee": [c[3] for c in sel], "sell_fee": [c[4] for c in sel]}
+        for m, mode in enumerate(modes):
+            pnl[rows, m] = apply_costs(paths[mode], invest, costs)
+    if profiling.enabled():
+        profiling.count("cost_paths", len(groups))
+        profiling.count("cost_settings", len(settings))
+    return pnl
+
+def parse_modes(arg):
+    """'realistic', 'all' or a comma list -> tuple of fill modes"""
+    modes = MODES if arg == "all" else tuple(m.strip() for m in arg.split(",") if m.strip())
+    bad = [m for m in modes if m not in MODES]
+    if bad or not modes:
+        raise RuntimeError("mode must be optimistic|realistic|pessimistic, a comma list of them, or all")
+    return modes
+
+def _utc(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+def print_cost_table(settings, modes, pnl, invest):
+    """One row per cost setting, PnL per fill mode (cost_sensitivity output)"""
+    print(f"{'slip':>6} {'mode':<7} {'side':<5} {'buy_fee':>8} {'sell_fee':>8} " + " ".join(f"{m:>12}" for m in modes))
+    for (slip, slip_mode, slip_side, buy_fee, sell_fee), row in zip(settings, pnl):
+        print(f"{slip*100:>5.1f}% {slip_mode:<7} {slip_side:<5} {buy_fee*100:>7.2f}% {sell_fee*100:>7.2f}% "
+              + " ".join(f"{fmt_usd(x):>12}" for x in row))
+    print(f"PnL range across {len(settings)} cost settings x {len(modes)} fill modes: "
+          f"{fmt_usd(pnl.min())} .. {fmt_usd(pnl.max())} ({(pnl.max() - pnl.min()) / invest * 100:.2f}% of invest)")
+
+def pop_option(argv, name):
+    """Remove `name VALUE` from argv (positional CLI) and return VALUE, or None if absent"""
+    if name not in argv:
+        return None
+    i = argv.index(name)
+    if i + 1 >= len(argv):
+        raise SystemExit(f"{name} needs a value")
+    value = argv[i + 1]
+    del argv[i:i + 2]
+    return value
+
+def print_sensitivity(results, entry_ts, invest):
+    """One row per fill mode plus the PnL spread between the best and worst assumption"""
+    print(f"{'mode':<12} {'entry_raw':>14} {'exit':<5} {'exit_raw':>14} {'hold':>6} {'pnl':>12} {'return':>9}")
+    for mode, r in results.items():
+        hold = int((r["exit_ts"] - entry_ts) / 60)
+        print(f"{mode:<12} {r['raw_entry']:>14.8f} {r['exit_reason']:<5} {r['exit_raw']:>14.8f} {hold:>5}m "
+              f"{fmt_usd(r['pnl_usd']):>12} {r['ret_pct']:>8.2f}%")
+    pnls = [r["pnl_usd"] for r in results.values()]
+    print(f"PnL spread across fill modes: {fmt_usd(max(pnls) - min(pnls))} ({(max(pnls) - min(pnls)) / invest * 100:.2f}% of invest)")
+
 # --------- main ----------
 def main():
+    profiling.start_from_argv()
+    cost_spec = pop_option(sys.argv, "--cost-grid")
     if len(sys.argv) < 10:
-        print("Usage: python src/single_trade_sim_partial.py <mint> <HH:MM_UTC> <invest_usd> <tp1_up_pct> <tp1_size_pct> <tp2_up_pct> <tp2_size_pct> <sl_down_pct> [mode]")
+        print("Usage: python src/single_trade_sim_partial.py <mint> <HH:MM_UTC> <invest_usd> <tp1_up_pct> <tp1_size_pct> <tp2_up_pct> <tp2_size_pct> <sl_down_pct> [mode|all] [--cost-grid 'slip=0,0.02;mode=amount,price;buy_fee=0.005,0.01']")
         sys.exit(1)
 
     mint = sys.argv[1].strip()
@@ -151,65 +342,57 @@ def main():
 
     hh, mm = [int(x) for x in hhmm.split(":")]
 
-    net, pool = detect_network_and_pool(mint)
-    candles = fetch_ohlcv_1m_last_48h(net, pool)
+    with profiling.span("pool_detect"):
+        net, pool = detect_network_and_pool(mint)
+    with profiling.span("ohlcv_fetch"):
+        candles = fetch_ohlcv_1m_last_48h(net, pool)
     if not candles:
         print("No candles in last 48h."); sys.exit(2)
 
-    entry_ts = find_entry_minute(candles, hh, mm)
+    with profiling.span("entry_match"):
+        entry_ts = find_entry_minute(candles, hh, mm)
     if not entry_ts:
         print("No candle found at that HH:MM within last 48h."); sys.exit(3)
 
     idx = next(i for i, r in enumerate(candles) if int(r[0]) == entry_ts)
-    ts, o,h,l,c = int(candles[idx][0]), float(candles[idx][1]), float(candles[idx][2]), float(candles[idx][3]), float(candles[idx][4])
-    e_dt = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-
-    # entry fill + thresholds
-    raw_entry = entry_fill(o,h,l,c, mode)
-    slip, slip_mode, slip_side, buy_fee_frac, sell_fee_frac = _cfg()
-    qty, paid_entry, buy_fee_usd, buy_log = execute_buy(raw_entry, invest, buy_fee_frac, slip, slip_mode, slip_side)
-    tp1_px = paid_entry * (1 + tp1_up)
-    tp2_px = paid_entry * (1 + tp2_up)
-    sl_px  = paid_entry * (1 - sl_pct)
-
-    # simulate minutes after entry
-    exit_reason = "SL"
-    exit_raw = raw_entry
-    fills = []
-    max_high = float(h)
-    i = idx
-
-    # Decide on exits in subsequent minutes; simple single-exit behavior (sell all on first event)
-    for j in range(i, min(i+2000, len(candles))):
-        ts2, o2,h2,l2,c2 = int(candles[j][0]), float(candles[j][1]), float(candles[j][2]), float(candles[j][3]), float(candles[j][4])
-        max_high = max(max_high, h2)
-        reason = decide_exit_in_bar(o2,h2,l2, tp1_px, sl_px, mode, paid_entry)
-        if reason:
-            exit_reason = "TP" if reason == "TP" else "SL"
-            exit_raw = o2 if reason == "TP" and mode == "optimistic" else (h2 if reason=="TP" and mode=="pessimistic" else c2)
-            x_dt = datetime.fromtimestamp(ts2, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-            break
-    else:
-        # if never hit, exit at last candle close
-        ts2, o2,h2,l2,c2 = int(candles[-1][0]), float(candles[-1][1]), float(candles[-1][2]), float(candles[-1][3]), float(candles[-1][4])
-        exit_reason = "TIME"
-        exit_raw = c2
-        x_dt = datetime.fromtimestamp(ts2, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    ts = int(candles[idx][0])
+    e_dt = _utc(ts)
+
+    modes = parse_modes(mode)
+    if cost_spec:
+        # fee/slippage sensitivity: every cost setting x fill mode over shared paths
+        settings = parse_cost_spec(cost_spec)
+        with profiling.span("cost_grid"):
+            pnl = cost_sensitivity(candles, idx, invest, tp1_up, sl_pct, settings, modes)
+        print(f"Entry @ {e_dt}  invest={fmt_usd(invest)}  tp={tp1_up*100:.1f}%  sl={sl_pct*100:.1f}%")
+        print_cost_table(settings, modes, pnl, invest)
+        return
+
+    with profiling.span("simulate"):
+        results = simulate_modes(candles, idx, invest, tp1_up, sl_pct, modes)
+
+    if len(modes) > 1:
+        # fill-mode sensitivity report: every mode from the same single walk
+        print(f"Entry @ {e_dt}  invest={fmt_usd(invest)}  tp={tp1_up*100:.1f}%  sl={sl_pct*100:.1f}%")
+        print_sensitivity(results, ts, invest)
+        return
 
-    proceeds, recv_px, sell_fee_usd, sell_log = execute_sell(exit_raw, qty, sell_fee_frac, slip, slip_mode, slip_side)
-    pnl_usd = proceeds - invest - buy_fee_usd
-    ret_pct = (pnl_usd / invest) * 100.0
+    r = results[modes[0]]
+    raw_entry, exit_raw, exit_reason = r["raw_entry"], r["exit_raw"], r["exit_reason"]
+    proceeds, pnl_usd, ret_pct = r["proceeds"], r["pnl_usd"], r["ret_pct"]
+    ts2, x_dt = r["exit_ts"], _utc(r["exit_ts"])
 
     # prints (match batch parser expectations)
-    print(f"Entry @ {e_dt}  {buy_log}")
-    print(f"- Exit {exit_reason:<14} @ {x_dt}  {sell_log}  part:100.0%")
-    print(f"Proceeds: {fmt_usd(proceeds)}  | Buy fee: ${buy_fee_usd:.2f}  | Sell fee: ${sell_fee_usd:.2f}")
+    print(f"Entry @ {e_dt}  {r['buy_log']}")
+    print(f"- Exit {exit_reason:<14} @ {x_dt}  {r['sell_log']}  part:100.0%")
+    print(f"Proceeds: {fmt_usd(proceeds)}  | Buy fee: ${r['buy_fee_usd']:.2f}  | Sell fee: ${r['sell_fee_usd']:.2f}")
     print(f"PNL: {fmt_usd(pnl_usd)}   Return: {ret_pct:.2f}%")
     hold_min = 0
     try:
         hold_min = int((ts2 - ts) / 60)
     except Exception:
         pass
+    max_high = r["max_high"]
     ath_mult = max_high / raw_entry if raw_entry > 0 else 0.0
     print(f"STATS: net={net} entry_raw={raw_entry:.8f} exit_raw_avg={exit_raw:.8f} max_high={max_high:.8f} "
           f"ath_mult={ath_mult:.6f} invest={invest} mode={mode} hold_min={hold_min} "
@@ -0,0 +1,76 @@
+# src/singleflight.py — in-process request coalescing with a short-lived response cache
+#
+# Threads asking for the same key at the same time (same URL and params: one pool's OHLCV
+# page, one token's info) share a single in-flight call and its result; successful results
+# are then served from memory for TB_HTTP_TTL seconds. Failures reach every waiter of that
+# flight but are never cached. Shared results are the same object for every caller, so
+# treat them as read-only.
+import os, threading, time
+
+import profiling
+
+HTTP_TTL = float(os.getenv("TB_HTTP_TTL", "30"))     # seconds; 0 = coalesce only
+MAX_ENTRIES = 1024
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """do(key, fn): at most one fn() per key in flight; successful results kept for `ttl` seconds"""
+    def __init__(self, ttl=HTTP_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._cache = {}      # key -> (expires, result), oldest first
+
+    def do(self, key, fn, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                if hit[0] > time.monotonic():
+                    profiling.count("http_cache_hit")
+                    return hit[1]
+                del self._cache[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            profiling.count("http_coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and ttl > 0:
+                    self._cache[key] = (time.monotonic() + ttl, flight.result)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.pop(next(iter(self._cache)))
+            flight.done.set()
+        return flight.result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+def freeze(params):
+    """Hashable form of a params/headers dict (None -> ())"""
+    return tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+# One instance per process: every HTTP helper shares it, so all its callers coalesce
+HTTP = SingleFlight()
@@ -8,7 +8,10 @@ from rich.progress import Progress, TaskID
 import time
 
 from single_trade_from_cache import simulate_trade
+from range_stats import RangeStats
 from fetch_and_cache_candles import get_top_pool, fetch_gt_candles, http_get
+import profiling
+from result_writers import StreamingWriter, write_rows
 
 OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
 OUTDIR.mkdir(exist_ok=True)
@@ -84,8 +87,8 @@ def calculate_strategy_metrics(results):
         "sharpe_ratio": mean(returns) / stdev(returns) if len(returns) > 1 and stdev(returns) > 0 else 0
     }
 
-def optimize_strategy_for_signals(signals, max_combinations=50000):
-    """Optimize strategy parameters for given signals"""
+def optimize_strategy_for_signals(signals, max_combinations=50000, writer=None):
+    """Optimize strategy parameters for given signals (metrics rows are streamed to `writer` if given)"""
     console.print(f"[bold blue]Starting strategy optimization for {len(signals)} signals...[/bold blue]")
     
     # Generate all strategy combinations
@@ -101,6 +104,7 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
     console.print(f"[green]Testing {len(all_combinations)} strategy combinations...[/green]")
     
     strategy_results = []
+    series_stats = {}   # (pool, unix, bars, last ts) -> RangeStats, shared by every combination
     PKT = dt.timezone(dt.timedelta(hours=5))
     
     with Progress() as progress:
@@ -130,9 +134,16 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
                     # Fetch candles with smart caching
                     pool = get_top_pool(net_map[chain], token)
                     candles = fetch_gt_candles(net_map[chain], pool, start_unix=unix, signal_unix=unix)
+                    stats = None
+                    if candles:
+                        key = (pool, unix, len(candles), candles[-1]["ts"])
+                        stats = series_stats.get(key)
+                        if stats is None:
+                            stats = series_stats[key] = RangeStats.from_candles(candles)
                     
                     # Run trade simulation
-                    res = simulate_trade(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc)
+                    with profiling.span("simulate"):
+                        res = simulate_trade(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc, stats=stats)
                     
                     # Add signal info
                     res.update({
@@ -150,7 +161,8 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
                     continue
             
             # Calculate metrics for this strategy
-            metrics = calculate_strategy_metrics(strategy_results_for_combo)
+            with profiling.span("metrics"):
+                metrics = calculate_strategy_metrics(strategy_results_for_combo)
             if metrics:
                 metrics.update({
                     "tp": tp,
@@ -159,6 +171,8 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
                     "strategy_id": f"TP{tp}_SL{sl}_TSL{tsl}"
                 })
                 strategy_results.append(metrics)
+                if writer is not None:
+                    writer.write(metrics)
             
             progress.update(task, advance=1)
     
@@ -218,26 +232,17 @@ def display_optimization_results(best_strategies):
     console.print(table)
 
 def save_optimization_results(strategy_results, best_strategies, output_file):
-    """Save optimization results to CSV"""
+    """Save optimization results to CSV (pass strategy_results=None when they were streamed during the sweep)"""
     # Save all results
-    all_results_file = OUTDIR / f"all_strategies_{output_file}"
-    with open(all_results_file, "w", newline="", encoding="utf-8") as f:
-        if strategy_results:
-            w = csv.DictWriter(f, fieldnames=strategy_results[0].keys())
-            w.writeheader()
-            for r in strategy_results:
-                w.writerow(r)
+    if strategy_results is not None:
+        with profiling.span("csv_write"):
+            all_results_file = write_rows(OUTDIR / f"all_strategies_{output_file}", strategy_results)
+        console.print(f"[green]Saved all results -> {all_results_file}[/green]")
     
     # Save best strategies
-    best_results_file = OUTDIR / f"best_strategies_{output_file}"
-    with open(best_results_file, "w", newline="", encoding="utf-8") as f:
-        if best_strategies:
-            w = csv.DictWriter(f, fieldnames=best_strategies[0].keys())
-            w.writeheader()
-            for r in best_strategies:
-                w.writerow(r)
+    with profiling.span("csv_write"):
+        best_results_file = write_rows(OUTDIR / f"best_strategies_{output_file}", best_strategies)
     
-    console.print(f"[green]Saved all results -> {all_results_file}[/green]")
     console.print(f"[green]Saved best strategies -> {best_results_file}[/green]")
 
 def main():
@@ -245,7 +250,9 @@ def main():
     parser.add_argument("--input", required=True, help="CSV file with signals")
     parser.add_argument("--max-combinations", type=int, default=50000, help="Maximum strategy combinations to test")
     parser.add_argument("--top-n", type=int, default=10, help="Number of top strategies to display")
+    profiling.add_profile_args(parser)
     args = parser.parse_args()
+    profiling.start_from_args(args)
     
     # Load signals
     signals = []
@@ -258,22 +265,25 @@ def main():
     
     # Run optimization
     start_time = time.time()
-    strategy_results = optimize_strategy_for_signals(signals, args.max_combinations)
+    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = f"optimization_{timestamp}.csv"
+    with profiling.span("optimize"), StreamingWriter(OUTDIR / f"all_strategies_{output_file}") as writer:
+        strategy_results = optimize_strategy_for_signals(signals, args.max_combinations, writer=writer)
     optimization_time = time.time() - start_time
     
     console.print(f"[green]Optimization completed in {optimization_time:.1f} seconds[/green]")
     console.print(f"[green]Tested {len(strategy_results)} strategies[/green]")
     
     # Find best strategies
-    best_strategies = find_best_strategies(strategy_results, args.top_n)
+    with profiling.span("rank"):
+        best_strategies = find_best_strategies(strategy_results, args.top_n)
     
     # Display results
     display_optimization_results(best_strategies)
     
-    # Save results
-    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"optimization_{timestamp}.csv"
-    save_optimization_results(strategy_results, best_strategies, output_file)
+    # Save results (all strategies were already streamed to disk during the sweep)
+    console.print(f"[green]Saved all results -> {writer.final_path}[/green]")
+    save_optimization_results(None, best_strategies, output_file)
     
     # Summary
     if best_strategies:
@@ -1,14 +1,20 @@
 import csv, argparse, pathlib, datetime as dt
 import itertools
 import json
-from statistics import mean, median, stdev
 from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, TaskID
 import time
 import os
 
-from single_trade_from_cache import simulate_trade, load_candles
+from single_trade_from_cache import simulate_trade_record, load_candles, find_series
+from trade_results import ResultBatch, TopTrades
+from candle_pyramid import get_pyramid
+import profiling
+import cache_manager
+from result_writers import StreamingWriter, write_rows
+from portfolio_sim import prepare_portfolio, simulate_portfolio, DEFAULT_MAX_CONCURRENT
+from walk_forward import run_walk_forward, DEFAULT_FOLDS, DEFAULT_TRAIN_CHUNKS
 
 OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
 CACHEDIR = pathlib.Path(__file__).resolve().parent.parent / "cache"
@@ -34,54 +40,22 @@ def parse_mc(s):
 def get_cached_candles(chain, token, signal_time):
     """Get cached candles for a signal, create cache if needed"""
     # Create cache filename
-    cache_file = CACHEDIR / f"{chain}_{token[:8]}_{signal_time.replace(':', '')}.csv"
+    cache_file = find_series(CACHEDIR / f"{chain}_{token[:8]}_{signal_time.replace(':', '')}.csv")
     
-    if cache_file.exists():
+    if cache_file is not None:
         console.print(f"[green]Using cached data: {cache_file.name}[/green]")
-        return load_candles(cache_file)
+        profiling.count("cache_hit")
+        cache_manager.touch(cache_file)
+        with profiling.span("load_candles"):
+            return load_candles(cache_file)
     else:
+        profiling.count("cache_miss")
+        cache_manager.miss("candles")
         console.print(f"[yellow]No cache found for {chain} {token[:8]} at {signal_time}[/yellow]")
         return None
 
-def calculate_strategy_metrics(results):
-    """Calculate comprehensive strategy performance metrics"""
-    if not results:
-        return {}
-    
-    pnls = [r.get("pnl", 0) for r in results if r.get("pnl") is not None]
-    returns = [r.get("return_pct", 0) for r in results if r.get("return_pct") is not None]
-    durations = [r.get("duration", 0) for r in results if r.get("duration") is not None]
-    max_dds = [r.get("max_drawdown", 0) for r in results if r.get("max_drawdown") is not None]
-    
-    if not pnls:
-        return {}
-    
-    wins = [p for p in pnls if p > 0]
-    losses = [p for p in pnls if p < 0]
-    
-    return {
-        "total_trades": len(results),
-        "winning_trades": len(wins),
-        "losing_trades": len(losses),
-        "win_rate": len(wins) / len(pnls) * 100 if pnls else 0,
-        "total_pnl": sum(pnls),
-        "avg_pnl": mean(pnls),
-        "median_pnl": median(pnls),
-        "max_pnl": max(pnls),
-        "min_pnl": min(pnls),
-        "avg_return": mean(returns) if returns else 0,
-        "avg_duration": mean(durations) if durations else 0,
-        "avg_max_dd": mean(max_dds) if max_dds else 0,
-        "max_dd": max(max_dds) if max_dds else 0,
-        "profit_factor": sum(wins) / abs(sum(losses)) if losses else float('inf'),
-        "sharpe_ratio": mean(returns) / stdev(returns) if len(returns) > 1 and stdev(returns) > 0 else 0
-    }
-
-def optimize_strategy_for_signals(signals, max_combinations=50000):
-    """Optimize strategy parameters for given signals using cached data"""
-    console.print(f"[bold blue]Starting strategy optimization for {len(signals)} signals...[/bold blue]")
-    
-    # Generate all strategy combinations
+def sample_combinations(max_combinations):
+    """All TP/SL/TSL combinations, randomly sampled down to max_combinations"""
     all_combinations = list(itertools.product(TP_RANGE, SL_RANGE, TSL_RANGE))
     total_combinations = len(all_combinations)
     
@@ -92,60 +66,96 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
         console.print(f"[yellow]Sampling {max_combinations} combinations from {total_combinations} total[/yellow]")
     
     console.print(f"[green]Testing {len(all_combinations)} strategy combinations...[/green]")
+    return all_combinations
+
+def prepare_signals(signals, signal_table):
+    """Load each signal's candles and coarse pyramid once: [(chain, token, unix, entry_mc, candles, pyramid)]"""
+    PKT = dt.timezone(dt.timedelta(hours=5))
+    prepared = []
+    for signal in signals:
+        try:
+            chain = signal["chain"].upper()
+            token = signal["token"]
+            time_str = signal["time"]
+            entry_mc = parse_mc(signal["entry_mc"])
+            
+            # Convert PKT time to unix
+            now_utc = dt.datetime.now(dt.timezone.utc)
+            now_pkt = now_utc.astimezone(PKT)
+            hh, mm = map(int, time_str.split(":"))
+            cand_pkt = now_pkt.replace(hour=hh, minute=mm, second=0, microsecond=0)
+            if cand_pkt > now_pkt:
+                cand_pkt -= dt.timedelta(days=1)
+            cand_utc = cand_pkt.astimezone(dt.timezone.utc)
+            unix = int(cand_utc.timestamp())
+            
+            # Get cached candles
+            candles = get_cached_candles(chain, token, time_str)
+            if not candles:
+                console.print(f"[red]No cached data for {chain} {token[:8]} at {time_str}[/red]")
+                continue
+            candles.sort(key=lambda c: c["ts"])
+            with profiling.span("pyramid"):
+                pyramid = get_pyramid((chain, token, time_str), candles)
+            prepared.append((chain, token, unix, entry_mc, candles, pyramid))
+            signal_table.append({"chain": chain, "token": token, "coin": token[:6], "unix": unix, "entry_mc": entry_mc})
+        except Exception as e:
+            console.print(f"[red]Error processing signal {signal}: {e}[/red]")
+            continue
+    return prepared
+
+def optimize_strategy_for_signals(signals, max_combinations=50000, trades=None, signal_table=None, writer=None, portfolio=None, keep_top=10):
+    """Optimize strategy parameters for given signals using cached data
+
+    Every simulated trade is appended to `trades` (a ResultBatch) with its signal
+    index into `signal_table` and its strategy index into the returned list; each
+    strategy's metrics row is also streamed to `writer` as soon as it is computed.
+    Only the trades of the `keep_top` best-scoring strategies stay in `trades`
+    (keep_top=None keeps every strategy's).
+    With `portfolio` ({"bankroll": ..., "max_concurrent": ...}) each row also gets the
+    portfolio-level metrics of portfolio_sim.simulate_portfolio.
+    """
+    console.print(f"[bold blue]Starting strategy optimization for {len(signals)} signals...[/bold blue]")
+    
+    all_combinations = sample_combinations(max_combinations)
     
     strategy_results = []
-    PKT = dt.timezone(dt.timedelta(hours=5))
+    
+    trades = ResultBatch() if trades is None else trades
+    top = TopTrades(trades, keep_top, strategy_score)
+    signal_table = [] if signal_table is None else signal_table
+    
+    sig_base = len(signal_table)
+    
+    # Load each signal's candles and coarse pyramid once, not once per combination
+    prepared = prepare_signals(signals, signal_table)
+    
+    # Strategy-independent portfolio event stream (entry bars), built once for every combination
+    port_events = None
+    if portfolio:
+        port_events = prepare_portfolio([(unix, entry_mc, candles, pyramid) for _, _, unix, entry_mc, candles, pyramid in prepared])
     
     with Progress() as progress:
         task = progress.add_task("[green]Optimizing strategies...", total=len(all_combinations))
         
         for i, (tp, sl, tsl) in enumerate(all_combinations):
             # Test this strategy on all signals
-            strategy_results_for_combo = []
+            start = len(trades)
             
-            for signal in signals:
+            for sig_idx, (chain, token, unix, entry_mc, candles, pyramid) in enumerate(prepared):
                 try:
-                    chain = signal["chain"].upper()
-                    token = signal["token"]
-                    time_str = signal["time"]
-                    entry_mc = parse_mc(signal["entry_mc"])
-                    
-                    # Convert PKT time to unix
-                    now_utc = dt.datetime.now(dt.timezone.utc)
-                    now_pkt = now_utc.astimezone(PKT)
-                    hh, mm = map(int, time_str.split(":"))
-                    cand_pkt = now_pkt.replace(hour=hh, minute=mm, second=0, microsecond=0)
-                    if cand_pkt > now_pkt:
-                        cand_pkt -= dt.timedelta(days=1)
-                    cand_utc = cand_pkt.astimezone(dt.timezone.utc)
-                    unix = int(cand_utc.timestamp())
-                    
-                    # Get cached candles
-                    candles = get_cached_candles(chain, token, time_str)
-                    if not candles:
-                        console.print(f"[red]No cached data for {chain} {token[:8]} at {time_str}[/red]")
-                        continue
-                    
-                    # Run trade simulation
-                    res = simulate_trade(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc)
-                    
-                    # Add signal info
-                    res.update({
-                        "chain": chain,
-                        "token": token,
-                        "coin": token[:6],  # Use token prefix as coin name
-                        "unix": unix,
-                        "entry_mc": entry_mc
-                    })
-                    
-                    strategy_results_for_combo.append(res)
+                    # Run trade simulation (compact record; signal info lives in signal_table)
+                    with profiling.span("simulate"):
+                        rec = simulate_trade_record(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc, pyramid=pyramid)
+                    trades.append(sig_base + sig_idx, rec, len(strategy_results))
                     
                 except Exception as e:
-                    console.print(f"[red]Error processing signal {signal}: {e}[/red]")
+                    console.print(f"[red]Error processing signal {token}: {e}[/red]")
                     continue
             
             # Calculate metrics for this strategy
-            metrics = calculate_strategy_metrics(strategy_results_for_combo)
+            with profiling.span("metrics"):
+                metrics = trades.metrics(start)
             if metrics:
                 metrics.update({
                     "tp": tp,
@@ -153,27 +163,34 @@ def optimize_strategy_for_signals(signals, max_combinations=50000):
                     "tsl": tsl,
                     "strategy_id": f"TP{tp}_SL{sl}_TSL{tsl}"
                 })
+                if port_events is not None:
+                    with profiling.span("portfolio"):
+                        metrics.update(simulate_portfolio(port_events, tp, sl, tsl, **portfolio))
                 strategy_results.append(metrics)
+                top.add(len(strategy_results) - 1, metrics, start)
+                if writer is not None:
+                    writer.write(metrics)
+            else:
+                trades.truncate(start)
             
             progress.update(task, advance=1)
     
     return strategy_results
 
+def strategy_score(metrics):
+    """Weighted scoring: 40% total PnL, 30% win rate, 20% profit factor, 10% Sharpe ratio"""
+    pnl_score = metrics.get("total_pnl", 0) / 100  # Normalize PnL
+    win_rate_score = metrics.get("win_rate", 0) / 100
+    pf_score = min(metrics.get("profit_factor", 0), 10) / 10  # Cap profit factor at 10
+    sharpe_score = min(metrics.get("sharpe_ratio", 0), 5) / 5  # Cap Sharpe at 5
+    
+    return (0.4 * pnl_score + 0.3 * win_rate_score + 0.2 * pf_score + 0.1 * sharpe_score)
+
 def find_best_strategies(strategy_results, top_n=10):
     """Find the best performing strategies"""
     if not strategy_results:
         return []
     
-    # Sort by multiple criteria (weighted score)
-    def strategy_score(metrics):
-        # Weighted scoring: 40% total PnL, 30% win rate, 20% profit factor, 10% Sharpe ratio
-        pnl_score = metrics.get("total_pnl", 0) / 100  # Normalize PnL
-        win_rate_score = metrics.get("win_rate", 0) / 100
-        pf_score = min(metrics.get("profit_factor", 0), 10) / 10  # Cap profit factor at 10
-        sharpe_score = min(metrics.get("sharpe_ratio", 0), 5) / 5  # Cap Sharpe at 5
-        
-        return (0.4 * pnl_score + 0.3 * win_rate_score + 0.2 * pf_score + 0.1 * sharpe_score)
-    
     # Sort by score
     sorted_strategies = sorted(strategy_results, key=strategy_score, reverse=True)
     return sorted_strategies[:top_n]
@@ -213,34 +230,86 @@ def display_optimization_results(best_strategies):
     console.print(table)
 
 def save_optimization_results(strategy_results, best_strategies, output_file):
-    """Save optimization results to CSV"""
+    """Save optimization results to CSV (pass strategy_results=None when they were streamed during the sweep)"""
     # Save all results
-    all_results_file = OUTDIR / f"all_strategies_{output_file}"
-    with open(all_results_file, "w", newline="", encoding="utf-8") as f:
-        if strategy_results:
-            w = csv.DictWriter(f, fieldnames=strategy_results[0].keys())
-            w.writeheader()
-            for r in strategy_results:
-                w.writerow(r)
+    if strategy_results is not None:
+        with profiling.span("csv_write"):
+            all_results_file = write_rows(OUTDIR / f"all_strategies_{output_file}", strategy_results)
+        console.print(f"[green]Saved all results -> {all_results_file}[/green]")
     
     # Save best strategies
-    best_results_file = OUTDIR / f"best_strategies_{output_file}"
-    with open(best_results_file, "w", newline="", encoding="utf-8") as f:
-        if best_strategies:
-            w = csv.DictWriter(f, fieldnames=best_strategies[0].keys())
-            w.writeheader()
-            for r in best_strategies:
-                w.writerow(r)
-    
-    console.print(f"[green]Saved all results -> {all_results_file}[/green]")
+    with profiling.span("csv_write"):
+        best_results_file = write_rows(OUTDIR / f"best_strategies_{output_file}", best_strategies)
+    
     console.print(f"[green]Saved best strategies -> {best_results_file}[/green]")
 
+def run_cost_grid(prepared, args):
+    """Cost-grid mode: every strategy under every slippage/fee scenario, ranked by its worst-case score"""
+    from cost_sweep import parse_cost_grid, sweep_costs, robustness
+    try:
+        scenarios = parse_cost_grid(args.cost_grid)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        return
+    combinations = sample_combinations(args.max_combinations)
+    console.print(f"[bold blue]Cost grid: {len(combinations)} strategies x {len(scenarios)} scenarios "
+                  f"over {len(prepared)} signals[/bold blue]")
+    
+    start_time = time.time()
+    with profiling.span("cost_grid"):
+        rows = sweep_costs(prepared, combinations, scenarios, strategy_score)
+    console.print(f"[green]Cost grid completed in {time.time() - start_time:.1f} seconds[/green]")
+    ranked = robustness(rows)
+    
+    table = Table(title=f"💸 Most Cost-Robust Strategies ({len(scenarios)} scenarios)")
+    table.add_column("Rank", style="bold")
+    table.add_column("Strategy", style="cyan")
+    table.add_column("Worst Score", justify="right", style="green")
+    table.add_column("Median Score", justify="right")
+    table.add_column("Worst PnL", justify="right")
+    table.add_column("Best PnL", justify="right")
+    for i, r in enumerate(ranked[:args.top_n], 1):
+        table.add_row(f"#{i}", r["strategy_id"], f"{r['worst_score']:.3f}", f"{r['median_score']:.3f}",
+                      f"${r['worst_pnl']:.2f}", f"${r['best_pnl']:.2f}")
+    console.print(table)
+    
+    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    with profiling.span("csv_write"):
+        grid_file = write_rows(OUTDIR / f"cost_grid_optimization_{timestamp}.csv", rows)
+        robust_file = write_rows(OUTDIR / f"cost_robust_optimization_{timestamp}.csv", ranked)
+    console.print(f"[green]Saved cost grid -> {grid_file}[/green]")
+    console.print(f"[green]Saved worst-case ranking -> {robust_file}[/green]")
+
 def main():
     parser = argparse.ArgumentParser(description="Strategy Optimization Engine (Cached)")
     parser.add_argument("--input", required=True, help="CSV file with signals")
     parser.add_argument("--max-combinations", type=int, default=1000, help="Maximum strategy combinations to test")
     parser.add_argument("--top-n", type=int, default=10, help="Number of top strategies to display")
+    parser.add_argument("--monte-carlo", type=int, default=0, metavar="N",
+                        help="Run N bootstrap/permutation/cost Monte Carlo sims on each top strategy (0 = off)")
+    parser.add_argument("--mc-seed", type=int, default=None, help="Random seed for the Monte Carlo stage")
+    parser.add_argument("--pareto", action="store_true",
+                        help="Also report the Pareto frontier over pnl, max drawdown, win rate and avg duration")
+    parser.add_argument("--weights", default="", help="With --pareto, re-rank the frontier, e.g. total_pnl=0.5,max_dd=0.5")
+    parser.add_argument("--interactive", action="store_true", help="With --pareto, prompt for weights after the run")
+    parser.add_argument("--walk-forward", action="store_true",
+                        help="Optimize on rolling chronological train windows and report out-of-sample pnl")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="Walk-forward test windows")
+    parser.add_argument("--train-folds", type=int, default=DEFAULT_TRAIN_CHUNKS, help="Chunks per walk-forward train window")
+    parser.add_argument("--workers", type=int, default=None, help="Walk-forward worker processes (default: CPU count)")
+    parser.add_argument("--bankroll", type=float, default=None,
+                        help="Also simulate each strategy as one portfolio with this starting bankroll ($100 per trade)")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="With --bankroll, maximum simultaneously open positions")
+    parser.add_argument("--cost-grid", default=None, metavar="SPEC",
+                        help="Sweep every strategy over cost scenarios, e.g. 'slip=0.01,0.03,0.05;fee=0.5,1,2', and rank by worst case")
+    parser.add_argument("--db", nargs="?", const="", default=None, metavar="PATH",
+                        help="Record the run in the SQLite results warehouse (default out/results.db or TB_RESULTS_DB)")
+    parser.add_argument("--db-all-trades", action="store_true",
+                        help="With --db, store every strategy's trades (default: only the --top-n strategies')")
+    profiling.add_profile_args(parser)
     args = parser.parse_args()
+    profiling.start_from_args(args)
     
     # Load signals
     signals = []
@@ -259,37 +328,86 @@ def main():
         token = signal["token"]
         time_str = signal["time"]
         
-        cache_file = CACHEDIR / f"{chain}_{token[:8]}_{time_str.replace(':', '')}.csv"
-        if cache_file.exists():
+        cache_file = find_series(CACHEDIR / f"{chain}_{token[:8]}_{time_str.replace(':', '')}.csv")
+        if cache_file is not None:
             cached_signals.append(signal)
             console.print(f"[green]✓ Found cache: {chain} {token[:8]} at {time_str}[/green]")
         else:
             console.print(f"[red]✗ No cache: {chain} {token[:8]} at {time_str}[/red]")
     
     if not cached_signals:
-        console.print("[red]No cached data found! Please run batch_trade_runner.py first to create cache.[/red]")
+        console.print(f"[red]No cached data found! Run `python src/tsb.py prefetch --input {args.input}` first to create cache.[/red]")
         return
     
     console.print(f"[green]Using {len(cached_signals)} signals with cached data[/green]")
     
+    if args.walk_forward:
+        run_walk_forward([(unix, entry_mc, candles) for _, _, unix, entry_mc, candles, _ in prepare_signals(cached_signals, [])],
+                         sample_combinations(args.max_combinations), strategy_score, args)
+        return
+    
+    if args.cost_grid:
+        run_cost_grid(prepare_signals(cached_signals, []), args)
+        return
+    
     # Run optimization
+    portfolio = {"bankroll": args.bankroll, "max_concurrent": args.max_concurrent} if args.bankroll else None
+    trades = ResultBatch()
+    trades_kept = None if args.db_all_trades else args.top_n   # --db and Monte Carlo only read the top strategies' trades
+    signal_table = []
     start_time = time.time()
-    strategy_results = optimize_strategy_for_signals(cached_signals, args.max_combinations)
+    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = f"optimization_{timestamp}.csv"
+    with profiling.span("optimize"), StreamingWriter(OUTDIR / f"all_strategies_{output_file}") as writer:
+        strategy_results = optimize_strategy_for_signals(cached_signals, args.max_combinations,
+                                                         trades=trades, signal_table=signal_table, writer=writer,
+                                                         portfolio=portfolio, keep_top=trades_kept)
     optimization_time = time.time() - start_time
     
     console.print(f"[green]Optimization completed in {optimization_time:.1f} seconds[/green]")
     console.print(f"[green]Tested {len(strategy_results)} strategies[/green]")
     
     # Find best strategies
-    best_strategies = find_best_strategies(strategy_results, args.top_n)
+    with profiling.span("rank"):
+        best_strategies = find_best_strategies(strategy_results, args.top_n)
     
     # Display results
     display_optimization_results(best_strategies)
     
-    # Save results
-    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"optimization_{timestamp}.csv"
-    save_optimization_results(strategy_results, best_strategies, output_file)
+    # Save results (all strategies were already streamed to disk during the sweep)
+    console.print(f"[green]Saved all results -> {writer.final_path}[/green]")
+    save_optimization_results(None, best_strategies, output_file)
+    
+    # Results warehouse (every strategy's metrics and score; trades of the top strategies)
+    if args.db is not None:
+        import results_db
+        with profiling.span("db_write"):
+            conn = results_db.connect(args.db or None)
+            run_id = results_db.record_optimization(conn, "strategy_optimizer_cached", vars(args), signal_table, strategy_results,
+                                                    trades, strategy_score, output=writer.final_path,
+                                                    all_trades=args.db_all_trades, top_n=args.top_n)
+            conn.close()
+        console.print(f"[green]Recorded run {run_id} -> {args.db or results_db.DB_PATH}[/green]")
+    
+    # Pareto frontier (multi-objective view of every evaluated strategy)
+    if args.pareto:
+        from pareto import pareto_front, reweight, parse_weights, pareto_table, save_front, interactive_reweight
+        with profiling.span("pareto"):
+            front = pareto_front(strategy_results)
+        console.print(pareto_table(reweight(front, parse_weights(args.weights)) if args.weights else front))
+        pareto_file = save_front(front, OUTDIR / f"pareto_{output_file}")
+        console.print(f"[green]Saved Pareto frontier -> {pareto_file}[/green]")
+        if args.interactive:
+            interactive_reweight(front)
+    
+    # Monte Carlo robustness of the top strategies
+    if args.monte_carlo > 0 and best_strategies:
+        from monte_carlo import monte_carlo_for_strategies, monte_carlo_table, save_monte_carlo_results
+        with profiling.span("monte_carlo"):
+            mc_rows = monte_carlo_for_strategies(trades, strategy_results, best_strategies,
+                                                 n_sims=args.monte_carlo, signal_table=signal_table, seed=args.mc_seed)
+        console.print(monte_carlo_table(mc_rows, args.monte_carlo))
+        save_monte_carlo_results(mc_rows, output_file)
     
     # Summary
     if best_strategies:
@@ -298,6 +416,12 @@ def main():
         console.print(f"TP: {best['tp']*100:.0f}% | SL: {best['sl']*100:.0f}% | TSL: {best['tsl']*100:.0f}%")
         console.print(f"Total PnL: ${best['total_pnl']:.2f} | Win Rate: {best['win_rate']:.1f}%")
         console.print(f"Profit Factor: {best['profit_factor']:.2f} | Sharpe Ratio: {best['sharpe_ratio']:.2f}")
+        if "portfolio_pnl" in best:
+            console.print(f"Portfolio (${args.bankroll:,.0f}, max {args.max_concurrent} open): "
+                          f"PnL ${best['portfolio_pnl']:.2f} | Taken {best['trades_taken']} | "
+                          f"Skipped {best['skipped_concurrency'] + best['skipped_capital']} | "
+                          f"Peak exposure ${best['peak_exposure']:.0f} | Max DD {best['portfolio_max_dd']:.1f}% | "
+                          f"Realized DD {best['realized_dd']:.1f}%")
 
 if __name__ == "__main__":
     main()
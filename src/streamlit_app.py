@@ -1,15 +1,10 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import time
 import os
 from pathlib import Path
 import csv
 import datetime as dt
-from rich.console import Console
-from rich.table import Table
 import sys
 import os
 import random
@@ -18,7 +13,7 @@ sys.path.append(os.path.dirname(__file__))
 # Import our modules
 from single_trade_from_cache import simulate_trade
 from fetch_and_cache_candles import get_top_pool, fetch_gt_candles, http_get
-from strategy_optimizer_smart import optimize_strategies_on_cached_data, calculate_strategy_metrics
+from strategy_optimizer_smart import optimize_strategies_on_cached_data
 
 # Page config
 st.set_page_config(
@@ -144,9 +139,32 @@ def load_signals_from_upload(uploaded_file):
         st.error(f"Error loading uploaded file: {e}")
         return None
 
+def run_batch_on_server(signals_df, tp, sl, tsl):
+    """Backtest on a running daemon (tsb serve); None if no daemon is reachable"""
+    from backtest_server import BacktestClient
+    from streamlit_cache import cost_model, results_frame
+    client = BacktestClient(timeout=300)
+    if not client.available():
+        return None
+    signals = signals_df[['chain', 'token', 'time', 'entry_mc']].astype(str).to_dict('records')
+    slip, fee, invest_usd = cost_model(st.session_state)
+    results = client.simulate(signals, tp, sl, tsl, cost={"slip": slip, "fee": fee, "invest_usd": invest_usd})
+    return results_frame(signals, results)
+
 def run_batch_analysis(signals_df, tp, sl, tsl):
     """Run batch analysis on signals"""
     try:
+        server_df = run_batch_on_server(signals_df, tp, sl, tsl)
+        if server_df is not None:
+            st.success("⚡ Results from the backtest daemon (resident candle cache)")
+            return server_df
+        
+        from streamlit_cache import batch_frame
+        local_df = batch_frame(signals_df, tp, sl, tsl, st.session_state)
+        if local_df is not None:
+            return local_df
+        st.warning("No candle data available for these signals, showing demo results")
+
         st.info("🔄 Running batch analysis... This may take a few minutes due to API rate limits.")
         
         # Simulate some results for demo - in production you'd call the actual batch runner
@@ -234,6 +252,12 @@ def run_strategy_optimization(batch_results, max_combinations=100):
     try:
         st.info("🧠 Running strategy optimization...")
         
+        # Real sweep over the shared candle store when the signals are known (cached per signals/cost)
+        from streamlit_cache import optimization_results
+        strategies = optimization_results(st.session_state.signals_data, max_combinations, st.session_state)
+        if strategies:
+            return strategies
+        
         # Calculate current performance
         current_pnl = batch_results['pnl_numeric'].sum()
         current_win_rate = (batch_results['pnl_numeric'] > 0).mean() * 100
@@ -426,6 +450,32 @@ def display_results_table(results_df):
     </div>
     """, unsafe_allow_html=True)
 
+def display_charts(results_df, strategy_results, signals_df):
+    """Downsampled charts; figures are rebuilt only when their inputs change (chart_data cache)"""
+    from chart_data import line_figure, strategy_scatter, candle_figure
+    
+    if results_df is not None and not results_df.empty:
+        cum_pnl = results_df['pnl_numeric'].cumsum().tolist()
+        st.plotly_chart(line_figure(list(range(1, len(cum_pnl) + 1)), cum_pnl, title="Cumulative PnL",
+                                    x_title="Signal #", y_title="PnL ($)"), use_container_width=True)
+    
+    if strategy_results:
+        st.plotly_chart(strategy_scatter(strategy_results, x="win_rate", y="total_pnl", title="Strategies"),
+                        use_container_width=True)
+    
+    if signals_df is not None and not signals_df.empty:
+        labels = [f"{r['chain']} {str(r['token'])[:8]} @ {r['time']}" for _, r in signals_df.iterrows()]
+        choice = st.selectbox("Signal candles (from cache/)", range(len(labels)), format_func=lambda i: labels[i])
+        row = signals_df.iloc[choice]
+        from streamlit_cache import shared_store
+        from signal_utils import signal_unix
+        chain, token, time_str = str(row['chain']).upper(), str(row['token']), str(row['time'])
+        candles, _ = shared_store().candles(chain, token, time_str, signal_unix(time_str), fetch=False)
+        if candles:
+            st.plotly_chart(candle_figure(candles, title=labels[choice]), use_container_width=True)
+        else:
+            st.caption("No cached candles for this signal yet")
+
 def main():
     # Header
     st.markdown("""
@@ -717,6 +767,10 @@ def main():
             # Display results in the exact format from your image
             display_results_table(st.session_state.batch_results)
             
+            with st.expander("📉 Charts", expanded=False):
+                display_charts(st.session_state.batch_results, st.session_state.strategy_results,
+                               st.session_state.signals_data)
+            
             # Strategy optimization
             if st.button("🧠 Run Strategy Optimization", type="primary"):
                 with st.spinner("Optimizing strategies..."):
@@ -758,6 +812,9 @@ def main():
                     """, unsafe_allow_html=True)
         else:
             st.info("📊 Please run batch analysis first to see results")
+        
+        from streamlit_cache import display_warehouse
+        display_warehouse()
     
     with tab4:
         st.header("⚡ Quick Actions")
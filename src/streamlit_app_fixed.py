@@ -1,15 +1,10 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import time
 import os
 from pathlib import Path
 import csv
 import datetime as dt
-from rich.console import Console
-from rich.table import Table
 import sys
 import os
 import random
@@ -18,7 +13,7 @@ sys.path.append(os.path.dirname(__file__))
 # Import our modules
 from single_trade_from_cache import simulate_trade
 from fetch_and_cache_candles import get_top_pool, fetch_gt_candles, http_get
-from strategy_optimizer_smart import optimize_strategies_on_cached_data, calculate_strategy_metrics
+from strategy_optimizer_smart import optimize_strategies_on_cached_data
 
 # Page config
 st.set_page_config(
@@ -149,6 +144,13 @@ def run_batch_analysis(signals_df, tp, sl, tsl):
     try:
         st.info("🔄 Running batch analysis... This may take a few minutes due to API rate limits.")
         
+        # Real backtest through the shared cache (warm across sessions); demo data only without candles
+        from streamlit_cache import batch_frame
+        local_df = batch_frame(signals_df, tp, sl, tsl, st.session_state)
+        if local_df is not None:
+            return local_df
+        st.warning("No candle data available for these signals, showing demo results")
+        
         # Simulate some results for demo - in production you'd call the actual batch runner
         results = []
         for idx, row in signals_df.iterrows():
@@ -210,6 +212,11 @@ def run_strategy_optimization(batch_results, max_combinations=100):
     try:
         st.info("🧠 Running strategy optimization...")
         
+        from streamlit_cache import optimization_results
+        strategies = optimization_results(st.session_state.signals_data, max_combinations, st.session_state)
+        if strategies:
+            return strategies
+        
         # Simulate strategy optimization results
         strategies = []
         for i in range(20):
@@ -546,6 +553,9 @@ def main():
                     """, unsafe_allow_html=True)
         else:
             st.info("📊 Please run batch analysis first to see results")
+        
+        from streamlit_cache import display_warehouse
+        display_warehouse()
     
     with tab4:
         st.header("⚡ Quick Actions")
@@ -0,0 +1,138 @@
+# src/streamlit_cache.py — Streamlit cache layer: one shared candle store per server, memoized backtests per input
+#
+# st.cache_resource holds the CandleStore (pools, token names, candle series), so every browser
+# session of the same `streamlit run` process shares warm data. Backtest and optimization
+# outputs go through st.cache_data, keyed by the signal set (with each call's unix time),
+# the strategy parameters and the cost model, bounded by TTL and entry count.
+import os
+
+import pandas as pd
+import streamlit as st
+
+from signal_utils import normalize_signal
+
+CACHE_TTL = int(os.getenv("TB_ST_CACHE_TTL", "3600"))         # seconds
+CACHE_ENTRIES = int(os.getenv("TB_ST_CACHE_ENTRIES", "64"))
+
+SIGNAL_FIELDS = ("chain", "token", "time", "entry_mc", "unix")
+
+@st.cache_resource(show_spinner=False)
+def shared_store():
+    """The CandleStore shared by every session of this Streamlit process"""
+    from candle_store import CandleStore
+    return CandleStore()
+
+def signals_key(signals_df):
+    """Hashable, order-preserving signal set: ((chain, token, time, entry_mc, unix), ...).
+
+    The unix time is resolved now, so an HH:MM call that rolls over to a new day is a new key.
+    """
+    key = []
+    for row in signals_df[["chain", "token", "time", "entry_mc"]].astype(str).to_dict("records"):
+        sig = normalize_signal(row)
+        key.append(tuple(sig[f] for f in SIGNAL_FIELDS))
+    return tuple(key)
+
+def cost_model(session_state):
+    """(slip, fee, invest_usd) from the Gas and Slippage / Investment widgets, with the simulator defaults"""
+    return (
+        float(session_state.get("slippage_value", 3.0)) / 100,
+        float(session_state.get("gas_value", 1.0)),
+        float(session_state.get("amount_per_call", 100.0)),
+    )
+
+def _cost_dict(cost):
+    slip, fee, invest_usd = cost
+    return {"slip": slip, "fee": fee, "invest_usd": invest_usd}
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_batch(signals, tp, sl, tsl, cost):
+    """batch_rows over the shared store; one cache entry per (signals, tp, sl, tsl, cost)"""
+    from backtest_server import batch_rows
+    rows = [dict(zip(SIGNAL_FIELDS, s)) for s in signals]
+    return list(batch_rows(shared_store(), rows, tp, sl, tsl, cost=_cost_dict(cost)))
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_optimization(signals, max_combinations, cost):
+    """Every strategy's metrics (best first) for a signal set, cached per (signals, max_combinations, cost)"""
+    from backtest_server import grid_rows
+    from strategy_optimizer_cached import sample_combinations, strategy_score
+    rows = [dict(zip(SIGNAL_FIELDS, s)) for s in signals]
+    results = list(grid_rows(shared_store(), rows, sample_combinations(max_combinations), cost=_cost_dict(cost)))
+    results.sort(key=strategy_score, reverse=True)
+    return results
+
+@st.cache_data(ttl=60, show_spinner=False)
+def warehouse_top(limit=20, days=30):
+    """Top strategies across recent runs in the results warehouse (None when no run was recorded yet)"""
+    import results_db
+    if not results_db.DB_PATH.is_file():
+        return None
+    conn = results_db.connect()
+    try:
+        rows = results_db.top_strategies(conn, limit, days or None)
+    finally:
+        conn.close()
+    return pd.DataFrame(rows) if rows else None
+
+# --- Display helpers shared by streamlit_app.py and streamlit_app_fixed.py ---
+def _format_duration(duration_sec):
+    if duration_sec < 60:
+        return f"{duration_sec}s"
+    if duration_sec < 3600:
+        minutes, seconds = divmod(duration_sec, 60)
+        return f"{minutes}m {seconds}s" if seconds else f"{minutes}m"
+    hours, minutes = duration_sec // 3600, (duration_sec % 3600) // 60
+    return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+
+def results_frame(signals, results):
+    """Results-table rows from raw backtest result dicts (one per signal, same order)"""
+    rows = []
+    for row, res in zip(signals, results):
+        pnl = res.get('pnl') or 0.0
+        rows.append({
+            'coin': res.get('coin') or row['token'][:6],
+            'token': row['token'][:8] + "..." if len(row['token']) > 8 else row['token'],
+            'chain': row['chain'],
+            'time': row['time'],
+            'entry_mc': row['entry_mc'],
+            'trade_ath': f"{res['trade_ath']:.2f}x" if res.get('trade_ath') else "N/A",
+            'market_ath': f"{res['market_ath']:.2f}x" if res.get('market_ath') else "N/A",
+            'trade_atl': f"{res['trade_atl']:.2f}x" if res.get('trade_atl') else "N/A",
+            'max_dd': f"{res['max_drawdown']:.1f}%" if res.get('max_drawdown') is not None else "N/A",
+            'exit_mc': f"{res['exit_mc']/1000:.1f}k" if res.get('exit_mc') else "N/A",
+            'pnl': f"${pnl:.2f}",
+            'duration': _format_duration(int(res['duration'])) if res.get('duration') else "0s",
+            'exit_reason': res.get('exit_reason', 'no_entry'),
+            'pnl_numeric': pnl
+        })
+    return pd.DataFrame(rows)
+
+def batch_frame(signals_df, tp, sl, tsl, session_state):
+    """Cached local backtest as a results table; None if no signal had candle data"""
+    results = cached_batch(signals_key(signals_df), tp, sl, tsl, cost_model(session_state))
+    if not any(r.get('status') not in ('no_data', 'error') for r in results):
+        return None
+    signals = signals_df[['chain', 'token', 'time', 'entry_mc']].astype(str).to_dict('records')
+    return results_frame(signals, results)
+
+def display_warehouse():
+    """Results-tab expander: best strategies recorded by `--db` optimizer runs"""
+    with st.expander("🗄️ Results Warehouse", expanded=False):
+        c1, c2 = st.columns(2)
+        limit = c1.number_input("Top N", 5, 200, 20, 5, key="warehouse_limit")
+        days = c2.number_input("Last N days (0 = all)", 0, 3650, 30, 1, key="warehouse_days")
+        df = warehouse_top(int(limit), int(days))
+        if df is None:
+            st.info("No recorded runs yet — run an optimizer with --db to fill out/results.db")
+            return
+        df["started"] = pd.to_datetime(df["started"], unit="s")
+        for col in ("tp", "sl", "tsl"):
+            df[col] = (df[col] * 100).round(0)
+        st.dataframe(df.drop(columns=["strategy_id"]), use_container_width=True, hide_index=True)
+
+def optimization_results(signals_df, max_combinations, session_state):
+    """Cached strategy sweep for the loaded signals ([] when there are none or no data)"""
+    if signals_df is None or signals_df.empty:
+        return []
+    return cached_optimization(signals_key(signals_df), int(max_combinations), cost_model(session_state))
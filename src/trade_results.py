@@ -0,0 +1,206 @@
+# src/trade_results.py — compact trade result records (slots record + struct-of-arrays batch)
+import heapq
+import math
+from array import array
+from enum import IntEnum
+from statistics import mean, median, stdev
+
+class ExitReason(IntEnum):
+    NO_ENTRY = 0
+    TP = 1
+    SL = 2
+    TSL = 3
+    NEUTRAL = 4
+
+    @property
+    def label(self):
+        return _LABELS[self]
+
+    @classmethod
+    def from_label(cls, label):
+        return _BY_LABEL[label]
+
+_LABELS = {ExitReason.NO_ENTRY: "no_entry", ExitReason.TP: "TP", ExitReason.SL: "SL",
+           ExitReason.TSL: "TSL", ExitReason.NEUTRAL: "neutral"}
+_BY_LABEL = {v: k for k, v in _LABELS.items()}
+
+class TradeRecord:
+    """One simulated trade; to_dict() gives the dict simulate_trade has always returned"""
+    __slots__ = ("reason", "entry_price", "exit_price", "pnl", "return_pct",
+                 "trade_ath", "market_ath", "trade_atl", "max_drawdown", "duration")
+
+    def __init__(self, reason, entry_price=None, exit_price=None, pnl=0.0, return_pct=None,
+                 trade_ath=None, market_ath=None, trade_atl=None, max_drawdown=None, duration=None):
+        self.reason = reason
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.pnl = pnl
+        self.return_pct = return_pct
+        self.trade_ath = trade_ath
+        self.market_ath = market_ath
+        self.trade_atl = trade_atl
+        self.max_drawdown = max_drawdown
+        self.duration = duration
+
+    def to_dict(self):
+        if self.reason == ExitReason.NO_ENTRY:
+            return {
+                "status": "no_entry",
+                "pnl": 0.0,
+                "exit_reason": "no_entry",
+                "trade_ath": None,
+                "market_ath": None,
+                "duration": None
+            }
+        return {
+            "entry_price": self.entry_price,
+            "exit_price": self.exit_price,
+            "exit_reason": self.reason.label,
+            "pnl": self.pnl,
+            "return_pct": self.return_pct,
+            "trade_ath": self.trade_ath,
+            "market_ath": self.market_ath,
+            "trade_atl": self.trade_atl,
+            "max_drawdown": self.max_drawdown,
+            "duration": self.duration
+        }
+
+def _f(v):
+    return math.nan if v is None else v
+
+def _opt(v):
+    return None if v != v else v  # NaN -> None
+
+class ResultBatch:
+    """Struct-of-arrays store for many trades (~45 bytes/trade instead of a dict each).
+
+    Signal identity is an index into the caller's signal table and strategy identity
+    an index into its strategy list, so token strings are never repeated per trade.
+    Missing values (no entry / never exited) are stored as NaN or -1.
+    """
+    def __init__(self):
+        self.signal_idx = array("I")
+        self.strategy_idx = array("I")
+        self.reason = array("b")
+        self.pnl = array("d")
+        self.return_pct = array("d")
+        self.trade_ath = array("f")
+        self.market_ath = array("f")
+        self.trade_atl = array("f")
+        self.max_drawdown = array("d")
+        self.duration = array("i")
+
+    def __len__(self):
+        return len(self.pnl)
+
+    def _columns(self):
+        return (self.signal_idx, self.strategy_idx, self.reason, self.pnl, self.return_pct,
+                self.trade_ath, self.market_ath, self.trade_atl, self.max_drawdown, self.duration)
+
+    def append(self, signal_idx, rec, strategy_idx=0):
+        no_entry = rec.reason == ExitReason.NO_ENTRY
+        self.signal_idx.append(signal_idx)
+        self.strategy_idx.append(strategy_idx)
+        self.reason.append(int(rec.reason))
+        self.pnl.append(rec.pnl)
+        self.return_pct.append(math.nan if no_entry else _f(rec.return_pct))
+        self.trade_ath.append(_f(rec.trade_ath))
+        self.market_ath.append(_f(rec.market_ath))
+        self.trade_atl.append(_f(rec.trade_atl))
+        self.max_drawdown.append(math.nan if no_entry else _f(rec.max_drawdown))
+        self.duration.append(-1 if rec.duration is None else int(rec.duration))
+
+    def truncate(self, n):
+        """Drop every trade from position n on (e.g. a strategy that produced no metrics)"""
+        for col in self._columns():
+            del col[n:]
+
+    def clear(self):
+        self.truncate(0)
+
+    def retain(self, strategies):
+        """Keep only the trades of the given strategy indices (order preserved)"""
+        rows = [i for i, s in enumerate(self.strategy_idx) if s in strategies]
+        for col in self._columns():
+            col[:] = array(col.typecode, [col[i] for i in rows])
+
+    def row(self, i, signals=None):
+        """Trade i as a result dict, joined with signals[signal_idx] when a table is given"""
+        reason = ExitReason(self.reason[i])
+        out = {
+            "exit_reason": reason.label,
+            "pnl": self.pnl[i],
+            "return_pct": _opt(self.return_pct[i]),
+            "trade_ath": _opt(self.trade_ath[i]),
+            "market_ath": _opt(self.market_ath[i]),
+            "trade_atl": _opt(self.trade_atl[i]),
+            "max_drawdown": _opt(self.max_drawdown[i]),
+            "duration": self.duration[i] if self.duration[i] >= 0 else None,
+        }
+        if signals is not None:
+            out.update(signals[self.signal_idx[i]])
+        return out
+
+    def metrics(self, start=0, end=None):
+        """Metrics row of trades [start, end) (the optimizers' per-strategy CSV columns)"""
+        end = len(self) if end is None else end
+        if end <= start:
+            return {}
+        pnls = list(self.pnl[start:end])
+        returns = [x for x in self.return_pct[start:end] if x == x]
+        durations = [x for x in self.duration[start:end] if x >= 0]
+        max_dds = [x for x in self.max_drawdown[start:end] if x == x]
+
+        wins = [p for p in pnls if p > 0]
+        losses = [p for p in pnls if p < 0]
+
+        return {
+            "total_trades": len(pnls),
+            "winning_trades": len(wins),
+            "losing_trades": len(losses),
+            "win_rate": len(wins) / len(pnls) * 100 if pnls else 0,
+            "total_pnl": sum(pnls),
+            "avg_pnl": mean(pnls),
+            "median_pnl": median(pnls),
+            "max_pnl": max(pnls),
+            "min_pnl": min(pnls),
+            "avg_return": mean(returns) if returns else 0,
+            "avg_duration": mean(durations) if durations else 0,
+            "avg_max_dd": mean(max_dds) if max_dds else 0,
+            "max_dd": max(max_dds) if max_dds else 0,
+            "profit_factor": sum(wins) / abs(sum(losses)) if losses else float('inf'),
+            "sharpe_ratio": mean(returns) / stdev(returns) if len(returns) > 1 and stdev(returns) > 0 else 0
+        }
+
+    def nbytes(self):
+        return sum(len(c) * c.itemsize for c in self._columns())
+
+class TopTrades:
+    """Bounds a sweep's ResultBatch to the trades of its n best-scoring strategies so far.
+
+    Call add() after each strategy's trades [start, len(trades)) are appended: they are
+    dropped at once unless the strategy enters the running top n, and strategies pushed
+    out of it are compacted away once they make up half the batch. Ties keep the earlier
+    strategy, as a stable sort by score does. n=None keeps every trade.
+    """
+    def __init__(self, trades, n, score):
+        self.trades = trades
+        self.n = n
+        self.score = score
+        self._heap = []       # (score, -strategy_idx, rows), worst on top
+        self._dead = 0        # rows of evicted strategies still in the batch
+
+    def add(self, strategy_idx, metrics, start):
+        if self.n is None:
+            return
+        entry = (self.score(metrics), -strategy_idx, len(self.trades) - start)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+            return
+        if self.n == 0 or entry[:2] <= self._heap[0][:2]:
+            self.trades.truncate(start)
+            return
+        self._dead += heapq.heapreplace(self._heap, entry)[2]
+        if 2 * self._dead > len(self.trades):
+            self.trades.retain({-e[1] for e in self._heap})
+            self._dead = 0
@@ -0,0 +1,103 @@
+# src/tsb.py — unified CLI: python src/tsb.py <command> [args...]
+# Only the module behind the chosen command is imported, so `tsb report` or `tsb --help`
+# never pays for rich/httpx/numpy. Each command's own flags are parsed by its module.
+import os, sys, time
+from importlib import import_module
+
+_T0 = time.perf_counter()
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+# command -> (module, entry function, help, import budget in ms)
+COMMANDS = {
+    "fetch":    ("fetch_and_cache_candles", "main", "Fetch 1m candles for one call and save them to out/", 250),
+    "prefetch": ("prefetch", "main", "Download every signal's candles into cache/ for `optimize` (resumable)", 300),
+    "batch":    ("batch_trade_runner", "main", "Backtest every signal in a CSV with one TP/SL/TSL", 300),
+    "sweep":    ("param_sweep", "main", "Partial-TP grid sweep over src/batch_lines.txt", 100),
+    "optimize": ("strategy_optimizer_cached", "main", "TP/SL/TSL optimizer (--engine cached|smart|live)", 500),
+    "report":   ("report_from_csv", "main", "Print the trade table and summary of out/batch_results.csv", 100),
+    "serve":    ("backtest_server", "main", "Run the backtest daemon (HTTP API, resident candle cache)", 300),
+    "ingest":   ("signal_ingest", "main", "Ingest live calls (Telegram or --source fake), pre-warm and backtest", 200),
+    "cache":    ("cache_manager", "main", "Cache hit rates and bytes per tier (stats) or LRU eviction to a budget (gc)", 100),
+    "ui":       (None, None, "Launch the Streamlit UI", 100),
+}
+
+OPTIMIZE_ENGINES = {
+    "cached": "strategy_optimizer_cached",
+    "smart": "strategy_optimizer_smart",
+    "live": "strategy_optimizer",
+}
+
+def usage():
+    lines = ["usage: tsb [--timings] <command> [args...]", "", "commands:"]
+    for name, (_, _, help_, _) in COMMANDS.items():
+        lines.append(f"  {name:<9} {help_}")
+    lines += ["", "Run `tsb <command> --help` for the command's options.",
+              "--timings (or TB_TIMINGS=1) prints import time against each command's budget."]
+    return "\n".join(lines)
+
+def _pop_option(args, name, default=None):
+    """Remove `name value` / `name=value` from args and return value"""
+    for i, a in enumerate(args):
+        if a == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if a.startswith(name + "="):
+            del args[i]
+            return a.split("=", 1)[1]
+    return default
+
+def ui(args):
+    import subprocess
+    app = os.path.join(SRC, "streamlit_app.py")
+    cmd = [sys.executable, "-m", "streamlit", "run", app,
+           "--server.port", "8501", "--server.address", "localhost",
+           "--browser.gatherUsageStats", "false", *args]
+    try:
+        return subprocess.run(cmd).returncode
+    except KeyboardInterrupt:
+        return 0
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    timings = os.getenv("TB_TIMINGS", "0") == "1"
+    if argv and argv[0] == "--timings":
+        timings = True
+        argv.pop(0)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"tsb: unknown command '{name}'\n\n{usage()}", file=sys.stderr)
+        return 2
+    module_name, func, _, budget_ms = COMMANDS[name]
+    if name == "ui":
+        return ui(rest)
+    if name == "optimize":
+        engine = _pop_option(rest, "--engine", "cached")
+        if engine not in OPTIMIZE_ENGINES:
+            print(f"tsb optimize: unknown engine '{engine}' (choose from {', '.join(OPTIMIZE_ENGINES)})", file=sys.stderr)
+            return 2
+        module_name = OPTIMIZE_ENGINES[engine]
+
+    t = time.perf_counter()
+    module = import_module(module_name)
+    import_ms = (time.perf_counter() - t) * 1000
+    if timings:
+        startup_ms = (time.perf_counter() - _T0) * 1000
+        flag = "" if import_ms <= budget_ms else "  OVER BUDGET"
+        print(f"[tsb] import {module_name}: {import_ms:.1f} ms (budget {budget_ms} ms), "
+              f"startup {startup_ms:.1f} ms{flag}", file=sys.stderr)
+
+    # hand the remaining args to the command's own argv-based parser
+    sys.argv = [f"tsb {name}", *rest]
+    result = getattr(module, func)()
+    return result if isinstance(result, int) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
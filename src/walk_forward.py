@@ -0,0 +1,169 @@
+# src/walk_forward.py — chronological walk-forward TP/SL/TSL optimization over rolling train/test folds
+import os, pathlib, time, datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+
+from rich.console import Console
+from rich.table import Table
+
+import profiling
+from result_writers import write_rows
+from single_trade_from_cache import simulate_trade_record
+from trade_results import ResultBatch
+from candle_pyramid import CandlePyramid
+
+OUTDIR = pathlib.Path(__file__).resolve().parent.parent / "out"
+
+DEFAULT_FOLDS = 4
+DEFAULT_TRAIN_CHUNKS = 2
+
+console = Console()
+
+# Per-worker series, set once by the pool initializer and reused by every fold task
+_SERIES = None
+
+def make_folds(n, folds=DEFAULT_FOLDS, train_chunks=DEFAULT_TRAIN_CHUNKS):
+    """Rolling folds over n time-ordered signals: [(train_start, train_end, test_end), ...].
+
+    The signals are cut into folds + train_chunks equal chunks; fold k trains on
+    train_chunks consecutive chunks and tests on the chunk right after them.
+    """
+    chunks = folds + train_chunks
+    if n < chunks:
+        return []
+    bounds = [round(i * n / chunks) for i in range(chunks + 1)]
+    return [(bounds[k], bounds[k + train_chunks], bounds[k + train_chunks + 1]) for k in range(folds)]
+
+def _init_worker(series):
+    global _SERIES
+    # candles arrive once per worker process; pyramids are rebuilt locally
+    _SERIES = [(unix, entry_mc, candles, CandlePyramid(candles)) for unix, entry_mc, candles in series]
+
+def _simulate(lo, hi, tp, sl, tsl, trades, strategy_idx):
+    for sig_idx in range(lo, hi):
+        unix, entry_mc, candles, pyramid = _SERIES[sig_idx]
+        rec = simulate_trade_record(candles, unix, tp=tp, sl=sl, tsl=tsl, entry_mc=entry_mc, pyramid=pyramid)
+        trades.append(sig_idx, rec, strategy_idx)
+
+def run_fold(fold_no, train_start, train_end, test_end, combinations, score):
+    """Sweep every combination on the train window, then replay the winner on the test window"""
+    trades = ResultBatch()
+    best, best_score = None, None
+    for tp, sl, tsl in combinations:
+        trades.clear()
+        _simulate(train_start, train_end, tp, sl, tsl, trades, 0)
+        metrics = trades.metrics()
+        if not metrics:
+            continue
+        s = score(metrics)
+        if best_score is None or s > best_score:
+            best, best_score = dict(metrics, tp=tp, sl=sl, tsl=tsl), s
+
+    if best is None:
+        return None
+    trades.clear()
+    _simulate(train_end, test_end, best["tp"], best["sl"], best["tsl"], trades, 0)
+    test_pnls = list(trades.pnl)
+    return {
+        "fold": fold_no,
+        "train_signals": train_end - train_start,
+        "test_signals": test_end - train_end,
+        "tp": best["tp"],
+        "sl": best["sl"],
+        "tsl": best["tsl"],
+        "train": best,
+        "test": trades.metrics(),
+        "test_pnls": test_pnls,
+    }
+
+def walk_forward(series, combinations, score, folds=DEFAULT_FOLDS, train_chunks=DEFAULT_TRAIN_CHUNKS, workers=None):
+    """Run all folds on a process pool; series is [(unix, entry_mc, candles)] sorted by unix"""
+    plan = make_folds(len(series), folds, train_chunks)
+    if not plan:
+        return []
+    workers = min(len(plan), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        _init_worker(series)
+        results = [run_fold(k + 1, *bounds, combinations, score) for k, bounds in enumerate(plan)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(series,)) as ex:
+            futures = [ex.submit(run_fold, k + 1, *bounds, combinations, score) for k, bounds in enumerate(plan)]
+            results = [f.result() for f in futures]
+    return [r for r in results if r]
+
+def out_of_sample_summary(fold_results):
+    """Aggregate metrics over the concatenated test windows"""
+    pnls = [p for r in fold_results for p in r["test_pnls"]]
+    if not pnls:
+        return {}
+    wins = [p for p in pnls if p > 0]
+    train_pnl = sum(r["train"]["total_pnl"] for r in fold_results)
+    return {
+        "folds": len(fold_results),
+        "test_trades": len(pnls),
+        "oos_total_pnl": sum(pnls),
+        "oos_win_rate": len(wins) / len(pnls) * 100,
+        "oos_avg_pnl": sum(pnls) / len(pnls),
+        "is_total_pnl": train_pnl,
+    }
+
+def fold_rows(fold_results):
+    """Flat per-fold rows for CSV output"""
+    rows = []
+    for r in fold_results:
+        train, test = r["train"], r["test"]
+        rows.append({
+            "fold": r["fold"],
+            "train_signals": r["train_signals"],
+            "test_signals": r["test_signals"],
+            "tp": r["tp"],
+            "sl": r["sl"],
+            "tsl": r["tsl"],
+            "train_total_pnl": train.get("total_pnl", 0),
+            "train_win_rate": train.get("win_rate", 0),
+            "test_total_pnl": test.get("total_pnl", 0),
+            "test_win_rate": test.get("win_rate", 0),
+            "test_max_dd": test.get("max_dd", 0),
+        })
+    return rows
+
+def run_walk_forward(series, combinations, score, args):
+    """Optimizer --walk-forward mode: run the folds, print them and save them to out/.
+
+    series is [(unix, entry_mc, candles)] in any order; args carries folds, train_folds and workers.
+    """
+    series = sorted(series, key=lambda x: x[0])
+    console.print(f"[bold blue]Walk-forward over {len(series)} signals: {args.folds} folds x {args.train_folds} train chunks[/bold blue]")
+    
+    start_time = time.time()
+    with profiling.span("walk_forward"):
+        fold_results = walk_forward(series, combinations, score, folds=args.folds,
+                                    train_chunks=args.train_folds, workers=args.workers)
+    console.print(f"[green]Walk-forward completed in {time.time() - start_time:.1f} seconds[/green]")
+    if not fold_results:
+        console.print(f"[red]Not enough signals for {args.folds} folds (need at least {args.folds + args.train_folds})[/red]")
+        return
+    
+    rows = fold_rows(fold_results)
+    table = Table(title="🚶 Walk-Forward Folds")
+    table.add_column("Fold", style="bold")
+    table.add_column("Train/Test", justify="right")
+    table.add_column("TP%", justify="right")
+    table.add_column("SL%", justify="right")
+    table.add_column("TSL%", justify="right")
+    table.add_column("IS PnL", justify="right")
+    table.add_column("OOS PnL", justify="right", style="green")
+    table.add_column("OOS Win%", justify="right")
+    for r in rows:
+        table.add_row(f"#{r['fold']}", f"{r['train_signals']}/{r['test_signals']}",
+                      f"{r['tp']*100:.0f}%", f"{r['sl']*100:.0f}%", f"{r['tsl']*100:.0f}%",
+                      f"${r['train_total_pnl']:.2f}", f"${r['test_total_pnl']:.2f}", f"{r['test_win_rate']:.1f}%")
+    console.print(table)
+    
+    summary = out_of_sample_summary(fold_results)
+    console.print(f"[bold]Out-of-sample:[/bold] {summary['test_trades']} trades | PnL ${summary['oos_total_pnl']:.2f} | "
+                  f"Win Rate {summary['oos_win_rate']:.1f}% | in-sample PnL of picks ${summary['is_total_pnl']:.2f}")
+    
+    timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
+    with profiling.span("csv_write"):
+        wf_file = write_rows(OUTDIR / f"walk_forward_optimization_{timestamp}.csv", rows)
+    console.print(f"[green]Saved walk-forward folds -> {wf_file}[/green]")